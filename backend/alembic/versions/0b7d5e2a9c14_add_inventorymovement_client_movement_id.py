@@ -0,0 +1,29 @@
+"""add_inventorymovement_client_movement_id
+
+Revision ID: 0b7d5e2a9c14
+Revises: f41b8d2e6c93
+Create Date: 2026-10-17 17:08:55.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7d5e2a9c14'
+down_revision: Union[str, None] = 'f41b8d2e6c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('inventorymovement', sa.Column('client_movement_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.create_index(op.f('ix_inventorymovement_client_movement_id'), 'inventorymovement', ['client_movement_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_inventorymovement_client_movement_id'), table_name='inventorymovement')
+    op.drop_column('inventorymovement', 'client_movement_id')
@@ -0,0 +1,46 @@
+"""unique_stockitem_product_location
+
+Revision ID: 3c9e5f1a7d20
+Revises: 0b7d5e2a9c14
+Create Date: 2026-10-17 18:02:41.530862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e5f1a7d20'
+down_revision: Union[str, None] = '0b7d5e2a9c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fold duplicate (product_id, location) rows into the lowest id first
+    op.execute("""
+        UPDATE stockitem AS keep
+        SET quantity = dup.total, last_updated = dup.last_updated
+        FROM (
+            SELECT MIN(id) AS id, SUM(quantity) AS total, MAX(last_updated) AS last_updated
+            FROM stockitem
+            GROUP BY product_id, location
+            HAVING COUNT(*) > 1
+        ) AS dup
+        WHERE keep.id = dup.id
+    """)
+    op.execute("""
+        DELETE FROM stockitem AS extra
+        USING stockitem AS keep
+        WHERE extra.product_id = keep.product_id
+          AND extra.location = keep.location
+          AND extra.id > keep.id
+    """)
+    op.create_unique_constraint('uq_stockitem_product_location', 'stockitem', ['product_id', 'location'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_stockitem_product_location', 'stockitem', type_='unique')
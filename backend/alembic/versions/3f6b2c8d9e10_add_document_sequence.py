@@ -0,0 +1,40 @@
+"""add_document_sequence
+
+Revision ID: 3f6b2c8d9e10
+Revises: 929009d00a10
+Create Date: 2026-10-17 09:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b2c8d9e10'
+down_revision: Union[str, None] = '929009d00a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # New numbers include the business id (INV-{business_id}-YYYYMMDD-XXXX),
+    # so they can't collide with previously issued numbers and the counters
+    # start from zero.
+    op.create_table('documentsequence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('doc_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('period', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id', 'doc_type', 'period', name='uq_document_sequence')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('documentsequence')
@@ -0,0 +1,36 @@
+"""changelog_seq_at_commit
+
+Revision ID: 5e2a7c9d4b16
+Revises: 8d4b2f6e1a39
+Create Date: 2026-10-17 21:06:37.418592
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2a7c9d4b16'
+down_revision: Union[str, None] = '8d4b2f6e1a39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Entries are inserted unnumbered and get their seq right before commit
+    op.alter_column('changelog', 'seq', existing_type=sa.Integer(), nullable=True)
+    op.create_index(
+        'ix_changelog_business_id_unsequenced',
+        'changelog',
+        ['business_id'],
+        unique=False,
+        postgresql_where=sa.text('seq IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_changelog_business_id_unsequenced', table_name='changelog')
+    op.alter_column('changelog', 'seq', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,45 @@
+"""add_outbox_message
+
+Revision ID: 7c4e1a9b2d35
+Revises: 3f6b2c8d9e10
+Create Date: 2026-10-17 10:02:47.815230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e1a9b2d35'
+down_revision: Union[str, None] = '3f6b2c8d9e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outboxmessage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('topic', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outboxmessage_business_id'), 'outboxmessage', ['business_id'], unique=False)
+    op.create_index(op.f('ix_outboxmessage_topic'), 'outboxmessage', ['topic'], unique=False)
+    op.create_index('ix_outboxmessage_status_available_at', 'outboxmessage', ['status', 'available_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outboxmessage_status_available_at', table_name='outboxmessage')
+    op.drop_index(op.f('ix_outboxmessage_topic'), table_name='outboxmessage')
+    op.drop_index(op.f('ix_outboxmessage_business_id'), table_name='outboxmessage')
+    op.drop_table('outboxmessage')
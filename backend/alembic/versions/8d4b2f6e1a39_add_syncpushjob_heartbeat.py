@@ -0,0 +1,29 @@
+"""add_syncpushjob_heartbeat
+
+Revision ID: 8d4b2f6e1a39
+Revises: 3c9e5f1a7d20
+Create Date: 2026-10-17 18:42:51.204317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4b2f6e1a39'
+down_revision: Union[str, None] = '3c9e5f1a7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('syncpushjob', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    # Jobs already running when this lands have only started_at to go by
+    op.execute("UPDATE syncpushjob SET heartbeat_at = started_at WHERE status = 'running'")
+
+
+def downgrade() -> None:
+    op.drop_column('syncpushjob', 'heartbeat_at')
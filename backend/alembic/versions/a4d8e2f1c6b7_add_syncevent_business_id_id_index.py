@@ -0,0 +1,27 @@
+"""add_syncevent_business_id_id_index
+
+Revision ID: a4d8e2f1c6b7
+Revises: 7c4e1a9b2d35
+Create Date: 2026-10-17 11:24:09.301562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8e2f1c6b7'
+down_revision: Union[str, None] = '7c4e1a9b2d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_syncevent_business_id_id', 'syncevent', ['business_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_syncevent_business_id_id', table_name='syncevent')
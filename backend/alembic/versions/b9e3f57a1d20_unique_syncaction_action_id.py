@@ -0,0 +1,40 @@
+"""unique_syncaction_action_id
+
+Revision ID: b9e3f57a1d20
+Revises: a4d8e2f1c6b7
+Create Date: 2026-10-17 12:08:51.447019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e3f57a1d20'
+down_revision: Union[str, None] = 'a4d8e2f1c6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep one row per action_id: the processed one if any, else the newest
+    op.execute("""
+        DELETE FROM syncaction a
+        USING syncaction b
+        WHERE a.action_id = b.action_id
+          AND a.id <> b.id
+          AND (
+            (a.status <> 'processed' AND b.status = 'processed')
+            OR ((a.status = 'processed') = (b.status = 'processed') AND a.id < b.id)
+          )
+    """)
+    op.drop_index(op.f('ix_syncaction_action_id'), table_name='syncaction')
+    op.create_index(op.f('ix_syncaction_action_id'), 'syncaction', ['action_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_syncaction_action_id'), table_name='syncaction')
+    op.create_index(op.f('ix_syncaction_action_id'), 'syncaction', ['action_id'], unique=False)
@@ -0,0 +1,61 @@
+"""add_change_log
+
+Revision ID: c5a1d7e94f02
+Revises: b9e3f57a1d20
+Create Date: 2026-10-17 13:15:32.580114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a1d7e94f02'
+down_revision: Union[str, None] = 'b9e3f57a1d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('changelog',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('action', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id', 'seq', name='uq_changelog_business_seq')
+    )
+    op.add_column('syncstate', sa.Column('last_pull_seq', sa.Integer(), nullable=True))
+    
+    # Seed the log with the current catalog so a first cursor pull is a full load
+    op.execute("""
+        INSERT INTO changelog (business_id, seq, entity_type, entity_id, action, created_at)
+        SELECT business_id,
+               ROW_NUMBER() OVER (PARTITION BY business_id ORDER BY entity_id, entity_type),
+               entity_type, entity_id, 'created', NOW() AT TIME ZONE 'utc'
+        FROM (
+            SELECT business_id, 'product' AS entity_type, id AS entity_id FROM product WHERE is_active
+            UNION ALL
+            SELECT business_id, 'stock' AS entity_type, id AS entity_id FROM product WHERE is_active
+        ) AS catalog
+    """)
+    op.execute("""
+        INSERT INTO documentsequence (business_id, doc_type, period, last_value, updated_at)
+        SELECT business_id, 'changelog', '', MAX(seq), NOW() AT TIME ZONE 'utc'
+        FROM changelog
+        GROUP BY business_id
+        ON CONFLICT ON CONSTRAINT uq_document_sequence DO UPDATE SET last_value = EXCLUDED.last_value
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM documentsequence WHERE doc_type = 'changelog'")
+    op.drop_column('syncstate', 'last_pull_seq')
+    op.drop_table('changelog')
@@ -0,0 +1,27 @@
+"""add_changelog_fields
+
+Revision ID: d2f86b0c3a41
+Revises: c5a1d7e94f02
+Create Date: 2026-10-17 14:02:16.903372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f86b0c3a41'
+down_revision: Union[str, None] = 'c5a1d7e94f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('changelog', sa.Column('fields', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('changelog', 'fields')
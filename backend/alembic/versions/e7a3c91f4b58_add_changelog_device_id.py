@@ -0,0 +1,27 @@
+"""add_changelog_device_id
+
+Revision ID: e7a3c91f4b58
+Revises: d2f86b0c3a41
+Create Date: 2026-10-17 15:11:42.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c91f4b58'
+down_revision: Union[str, None] = 'd2f86b0c3a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('changelog', sa.Column('device_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('changelog', 'device_id')
@@ -0,0 +1,59 @@
+"""add_sync_push_job
+
+Revision ID: f41b8d2e6c93
+Revises: e7a3c91f4b58
+Create Date: 2026-10-17 16:24:09.731045
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f41b8d2e6c93'
+down_revision: Union[str, None] = 'e7a3c91f4b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('syncpushjob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('idempotency_key', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('fingerprint', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('actions', sa.JSON(), nullable=True),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('total_actions', sa.Integer(), nullable=False),
+    sa.Column('completed_actions', sa.Integer(), nullable=False),
+    sa.Column('processed_ids', sa.JSON(), nullable=True),
+    sa.Column('failed_ids', sa.JSON(), nullable=True),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'idempotency_key', name='uq_syncpushjob_user_idempotency_key')
+    )
+    op.create_index(op.f('ix_syncpushjob_job_id'), 'syncpushjob', ['job_id'], unique=True)
+    op.create_index(op.f('ix_syncpushjob_business_id'), 'syncpushjob', ['business_id'], unique=False)
+    op.create_index(op.f('ix_syncpushjob_fingerprint'), 'syncpushjob', ['fingerprint'], unique=False)
+    op.create_index('ix_syncpushjob_status_id', 'syncpushjob', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_syncpushjob_status_id', table_name='syncpushjob')
+    op.drop_index(op.f('ix_syncpushjob_fingerprint'), table_name='syncpushjob')
+    op.drop_index(op.f('ix_syncpushjob_business_id'), table_name='syncpushjob')
+    op.drop_index(op.f('ix_syncpushjob_job_id'), table_name='syncpushjob')
+    op.drop_table('syncpushjob')
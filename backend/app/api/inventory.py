@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+import hashlib
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Header, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import Session
 from typing import List, Optional
 from datetime import datetime
 from app.api.dependencies import get_db, get_current_user
 from app.models.user import User
 from app.services.business import get_business_by_user_id
-from app.services.permissions import can_view_cost_prices, filter_sensitive_data
+from app.services.permissions import can_view_cost_prices, filter_sensitive_data, SENSITIVE_FIELDS
 from app.services.inventory_service import (
     add_product,
     record_movement,
+    record_movements,
     calculate_stock,
-    list_stock,
+    iter_stock_listing,
     get_product_movements,
+    get_catalog_version,
+    list_product_page,
+    PRODUCT_FIELDS,
 )
 from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
 from app.schemas.inventory_stock import StockItemResponse, StockItemWithProduct, StockAdjustmentRequest
@@ -19,35 +27,77 @@ from app.schemas.inventory_movement import InventoryMovementCreate, InventoryMov
 from app.models.product import Product
 from app.models.inventory_stock import StockItem
 from app.models.inventory_movement import InventoryMovement
+from app.services.change_log_service import record_change, CHANGE_PRODUCT
+from app.services.event_service import EVENT_PRODUCT_UPDATED
+from app.services.outbox_service import enqueue_product_events, notify_outbox
+from app.db.session import engine
 
 router = APIRouter()
 
+# Rows per chunk written to a streamed /stock response
+STREAM_CHUNK_ROWS = 500
 
-@router.get("/products", response_model=List[ProductResponse])
+
+def _catalog_fields(fields: Optional[str], user: User) -> List[str]:
+    """Requested product columns (all by default), minus cost columns the user may not see"""
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in requested if field not in PRODUCT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown product fields: {', '.join(unknown)}")
+    else:
+        requested = list(PRODUCT_FIELDS)
+    
+    if not can_view_cost_prices(user):
+        requested = [field for field in requested if field not in SENSITIVE_FIELDS]
+    return requested
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]
+
+
+@router.get("/products")
 async def get_products(
+    after: Optional[int] = Query(None, description="Return products with id greater than this (keyset cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for the whole catalog"),
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return"),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all products for user's business"""
+    """
+    Get the products of the user's business
+    
+    Paged by id with `after` / `limit` (the next cursor is returned in the
+    X-Next-Cursor header) and projected to `fields` in SQL; cost fields are
+    never selected for users who may not see them. The weak ETag changes
+    whenever a product is added, edited or removed, so an unchanged catalog
+    answers If-None-Match with 304 after a single aggregate query.
+    """
     business = get_business_by_user_id(db, current_user.id)
     if not business:
         return []
     
-    from sqlmodel import select
-    statement = select(Product).where(Product.business_id == business.id)
-    products = db.exec(statement).all()
+    selected = _catalog_fields(fields, current_user)
+    count, last_updated = get_catalog_version(db, business.id)
+    variant = hashlib.sha1(f"{business.id}|{','.join(selected)}|{after}|{limit}".encode()).hexdigest()[:16]
+    etag = f'W/"{count}-{last_updated.timestamp() if last_updated else 0}-{variant}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
     
-    # Filter sensitive data based on permissions
-    show_sensitive = business.show_sensitive_data if business else False
-    
-    result = []
-    for product in products:
-        product_dict = product.model_dump()
-        if not can_view_cost_prices(current_user):
-            product_dict = filter_sensitive_data(product_dict, current_user, show_sensitive)
-        result.append(product_dict)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
     
-    return result
+    rows, next_after = list_product_page(db, business.id, selected, after=after, limit=limit)
+    if next_after is not None:
+        headers["X-Next-Cursor"] = str(next_after)
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
 
 
 @router.post("/products", response_model=ProductResponse)
@@ -85,42 +135,59 @@ async def create_product(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _stock_json(row: dict) -> str:
+    row["last_updated"] = row["last_updated"].isoformat()
+    return json.dumps(row, separators=(",", ":"))
+
+
 @router.get("/stock", response_model=List[StockItemWithProduct])
 async def get_stock(
     location: Optional[str] = Query(None, description="Filter by location"),
+    low_stock: Optional[bool] = Query(None, description="Only rows at or below (true) / above (false) the low-stock threshold"),
+    after: Optional[int] = Query(None, description="Return stock items with id greater than this (keyset cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to stream every row"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all stock items for user's business"""
-    try:
-        business = get_business_by_user_id(db, current_user.id)
-        if not business:
-            return []
-        
-        stock_items = list_stock(db, business.id, location)
-        
-        # Enrich with product information
-        result = []
-        for item in stock_items:
-            product = db.get(Product, item.product_id)
-            if product:
-                result.append(StockItemWithProduct(
-                    id=item.id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    location=item.location,
-                    last_updated=item.last_updated,
-                    product_name=product.name,
-                    product_sku=product.sku,
-                    unit_of_measure=product.unit_of_measure,
-                ))
-        
-        return result
-    except Exception as e:
-        import traceback
-        print(f"Error in get_stock: {e}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
+    """
+    Get stock items of the user's business with their product details
+    
+    A single joined query. With `limit` one page is returned and the next
+    cursor is in the X-Next-Cursor header; without it every row is streamed
+    through a server-side cursor as a JSON array.
+    """
+    business = get_business_by_user_id(db, current_user.id)
+    if not business:
+        return []
+    
+    filters = {"location": location, "low_stock": low_stock, "after": after}
+    if limit:
+        rows = list(iter_stock_listing(db, business.id, limit=limit + 1, **filters))
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = str(rows[-1]["id"])
+        return JSONResponse(content=jsonable_encoder(rows), headers=headers)
+    
+    business_id = business.id
+    
+    def stream():
+        # Own session: the response outlives the request's dependencies
+        with Session(engine) as session:
+            yield "["
+            first = True
+            chunk = []
+            for row in iter_stock_listing(session, business_id, **filters):
+                chunk.append(_stock_json(row))
+                if len(chunk) == STREAM_CHUNK_ROWS:
+                    yield ("" if first else ",") + ",".join(chunk)
+                    first = False
+                    chunk = []
+            if chunk:
+                yield ("" if first else ",") + ",".join(chunk)
+            yield "]"
+    
+    return StreamingResponse(stream(), media_type="application/json")
 
 
 @router.post("/stock/movement", response_model=InventoryMovementResponse)
@@ -151,6 +218,34 @@ async def create_movement(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/stock/movements", response_model=List[InventoryMovementResponse])
+async def create_movements(
+    movements: List[InventoryMovementCreate],
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record many inventory movements at once (e.g. a supplier delivery)"""
+    business = get_business_by_user_id(db, current_user.id)
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    
+    try:
+        records = record_movements(
+            db,
+            business.id,
+            [movement.model_dump() for movement in movements],
+            user_id=current_user.id,
+            commit=False
+        )
+        # Ids are assigned by the flush; build the response before the commit expires them
+        response = [InventoryMovementResponse.model_validate(record) for record in records]
+        db.commit()
+        notify_outbox()
+        return response
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
@@ -209,7 +304,12 @@ async def update_product(
     
     product.updated_at = datetime.utcnow()
     db.add(product)
+    record_change(db, business.id, CHANGE_PRODUCT, product.id, fields=list(update_data))
+    enqueue_product_events(db, business.id, EVENT_PRODUCT_UPDATED, [
+        {"product_id": product.id, "fields": sorted(update_data)}
+    ], user_id=current_user.id)
     db.commit()
+    notify_outbox()
     db.refresh(product)
     
     # Log price changes
@@ -258,6 +358,7 @@ async def delete_product(
     product.is_active = False
     product.updated_at = datetime.utcnow()
     db.add(product)
+    record_change(db, business.id, CHANGE_PRODUCT, product.id, "deleted")
     db.commit()
     
     return None
@@ -287,12 +388,13 @@ async def adjust_stock(
     # Record movement
     movement_type = "adjustment_up" if adjustment_data.adjustment > 0 else "adjustment_down"
     movement_data = InventoryMovementCreate(
+        product_id=stock_item.product_id,
         movement_type=movement_type,
         quantity=abs(adjustment_data.adjustment),
         reference=adjustment_data.reference or f"Manual adjustment by user {current_user.id}",
     )
     
-    record_movement(db, stock_item.product_id, movement_data, current_user.id)
+    record_movement(db, stock_item.product_id, movement_data, current_user.id, location=stock_item.location)
     
     # Refresh stock item
     db.refresh(stock_item)
@@ -2,13 +2,15 @@
 POS API endpoints for fast checkout
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from sqlmodel import Session
 from typing import List, Optional
 from app.api.dependencies import get_db, get_current_user
 from app.models.user import User
 from app.models.product import Product
 from app.models.business import Business
 from app.services.business import get_business_by_user_id
+from app.services.inventory_service import get_stock_levels
+from app.services.stock_search import search_products as search_catalog
 from app.services.pos_service import (
     checkout,
     get_active_pos_session,
@@ -39,34 +41,20 @@ async def search_products(
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    # Search by name or SKU/barcode
-    search_term = f"%{q.lower()}%"
-    statement = (
-        select(Product)
-        .where(
-            Product.business_id == business.id,
-            (
-                (Product.name.ilike(search_term)) |
-                (Product.sku.ilike(search_term)) |
-                (Product.barcode.ilike(search_term))
-            )
-        )
-        .limit(limit)
-    )
-    
-    products = db.exec(statement).all()
+    # Ranked name/SKU/barcode search, served from the in-memory index
+    results = search_catalog(db, business.id, q, limit)
     
     return [
         {
-            "id": p.id,
-            "name": p.name,
-            "price": p.sale_price or 0.0,
-            "stock": p.current_stock,
-            "sku": p.sku,
-            "barcode": p.barcode,
-            "unit": p.unit or "pcs"
+            "id": p["id"],
+            "name": p["name"],
+            "price": p["selling_price"] or 0.0,
+            "stock": p["current_stock"],
+            "sku": p["sku"],
+            "barcode": p["barcode"],
+            "unit": p["unit"] or "pcs"
         }
-        for p in products
+        for p in results
     ]
 
 
@@ -83,6 +71,7 @@ async def validate_cart(
     
     validated_items = []
     errors = []
+    stock_levels = get_stock_levels(db, [item.product_id for item in cart_data.items], location="main")
     
     for item in cart_data.items:
         product = db.get(Product, item.product_id)
@@ -94,8 +83,9 @@ async def validate_cart(
             errors.append(f"Product {item.product_id} does not belong to your business")
             continue
         
-        if product.current_stock < item.quantity:
-            errors.append(f"Insufficient stock for {product.name}. Available: {product.current_stock}")
+        available = stock_levels.get(product.id, 0.0)
+        if available < item.quantity:
+            errors.append(f"Insufficient stock for {product.name}. Available: {available}")
             continue
         
         validated_items.append({
@@ -104,7 +94,7 @@ async def validate_cart(
             "quantity": item.quantity,
             "unit_price": item.unit_price,
             "subtotal": item.quantity * item.unit_price,
-            "stock_available": product.current_stock
+            "stock_available": available
         })
     
     return {
@@ -143,8 +133,8 @@ async def pos_checkout(
                 detail="customer_id is required for credit payments"
             )
         
-        # Process checkout (atomic stock deduction)
-        sale = checkout(
+        # Process checkout (atomic stock deduction, single commit)
+        sale, invoice = checkout(
             session=db,
             user_id=current_user.id,
             business_id=business.id,
@@ -157,26 +147,15 @@ async def pos_checkout(
             notes=checkout_data.notes
         )
         
-        # Get invoice ID (created during checkout)
-        from app.models.invoice import Invoice
-        invoice_statement = select(Invoice).where(
-            Invoice.business_id == business.id
-        ).order_by(Invoice.id.desc()).limit(1)
-        invoice = db.exec(invoice_statement).first()
-        
         # Send notification (async, don't wait)
-        if invoice:
-            # In production, use background task
-            # await send_pos_notification(db, sale, invoice.id, current_user.telegram_id)
-            pass
+        # In production, use background task
+        # await send_pos_notification(db, sale, invoice.id, current_user.telegram_id)
         
-        # Return sale with items
-        db.refresh(sale)
         return {
             "success": True,
             "sale_id": sale.id,
-            "invoice_id": invoice.id if invoice else None,
-            "invoice_number": invoice.invoice_number if invoice else None,
+            "invoice_id": invoice.id,
+            "invoice_number": invoice.invoice_number,
             "total": sale.total,
             "payment_method": sale.payment_method
         }
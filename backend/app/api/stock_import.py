@@ -12,6 +12,9 @@ from app.models.product import Product
 from app.models.inventory_stock import StockItem
 from app.services.business import get_business_by_user_id
 from app.services.inventory_service import add_product
+from app.services.change_log_service import record_changes, CHANGE_PRODUCT, CHANGE_STOCK
+from app.services.event_service import EVENT_PRODUCT_CREATED
+from app.services.outbox_service import enqueue_product_events, notify_outbox
 
 router = APIRouter(prefix="/stock", tags=["stock-import"])
 
@@ -90,8 +93,9 @@ async def import_stock_csv(
                 is_active=True
             )
             db.add(product)
-            db.commit()
-            db.refresh(product)
+            db.flush()
+            
+            changes = [(CHANGE_PRODUCT, product.id, "created")]
             
             # Create stock item
             if stock > 0:
@@ -101,7 +105,14 @@ async def import_stock_csv(
                     location="main"
                 )
                 db.add(stock_item)
-                db.commit()
+                changes.append((CHANGE_STOCK, product.id, "created"))
+            
+            # Product, stock, change-log entries and the (coalesced) event commit together
+            record_changes(db, business.id, changes)
+            enqueue_product_events(db, business.id, EVENT_PRODUCT_CREATED, [
+                {"product_id": product.id, "stock": stock if stock > 0 else 0.0}
+            ], user_id=current_user.id)
+            db.commit()
             
             results["success"].append({
                 "row": row_num,
@@ -109,19 +120,23 @@ async def import_stock_csv(
                 "name": product.name
             })
             results["total"] += 1
-            
+        
         except ValueError as e:
+            db.rollback()
             results["errors"].append({
                 "row": row_num,
                 "error": f"Invalid number format: {str(e)}",
                 "data": row
             })
         except Exception as e:
+            db.rollback()
             results["errors"].append({
                 "row": row_num,
                 "error": str(e),
                 "data": row
             })
     
+    # One wakeup for the whole import; its events reach clients as batch frames
+    notify_outbox()
     return results
 
@@ -1,7 +1,9 @@
 """
 Sync API endpoints for offline-first multi-device synchronization
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse
 from sqlmodel import Session
 from typing import Optional
 from datetime import datetime
@@ -13,31 +15,52 @@ from app.services.sync_service import (
     get_or_create_sync_state,
     update_sync_state,
     process_sync_actions,
-    get_sync_changes
+    get_sync_changes,
+    get_sync_changes_page
 )
 from app.schemas.sync import (
     SyncPushRequest,
     SyncPushResponse,
     SyncPullResponse,
+    SyncPushJobResponse,
     SyncChange
 )
+from app.services.snapshot_service import get_latest_snapshot, write_snapshot
+from app.services.sync_job_service import create_push_job, get_push_job, push_job_status
 from app.api.middleware.subscription import require_active_subscription
 from app.core.config import settings
+from app.core.sync_encoding import SyncRoute, encode_sync_response
 
-router = APIRouter(tags=["sync"])
+# SyncRoute: push bodies may be gzip/zstd compressed and/or MessagePack
+router = APIRouter(tags=["sync"], route_class=SyncRoute)
 
 
-@router.post("/push", response_model=SyncPushResponse)
+@router.post("/push", response_model=SyncPushResponse, responses={202: {"model": SyncPushJobResponse}})
 async def sync_push(
+    request: Request,
     push_data: SyncPushRequest,
+    mode: str = Query("sync", regex="^(sync|async)$", description="async: queue as a job and return 202"),
+    prefer: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    x_device_id: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Push sync actions from client to server
     
-    Processes actions in order and returns processed/failed IDs
+    Processes actions in order and returns processed/failed IDs. Changes are
+    tagged with the device (body device_id or X-Device-ID header) so they
+    are not echoed back on that device's pulls.
+    
+    With ?mode=async (or Prefer: respond-async) the push is queued as a job
+    and 202 is returned with the job id; poll the Location URL
+    (/sync/push/jobs/{job_id}) for per-action results. Send an
+    Idempotency-Key header so that retries return the same job. Without
+    one, a retry of a push that is still queued or running is matched by
+    its action ids.
     """
+    device_id = push_data.device_id or x_device_id
     business = get_business_by_user_id(db, current_user.id)
     if not business:
         # Auto-create business for user if it doesn't exist
@@ -66,28 +89,65 @@ async def sync_push(
         for action in push_data.actions
     ]
     
+    if mode == "async" or "respond-async" in (prefer or "").lower():
+        job, _ = create_push_job(
+            db,
+            current_user.id,
+            business.id,
+            actions,
+            device_id=device_id,
+            idempotency_key=idempotency_key
+        )
+        return encode_sync_response(
+            request,
+            SyncPushJobResponse(**push_job_status(job)).model_dump(),
+            status_code=202,
+            headers={"Location": str(request.url_for("get_sync_push_job", job_id=job.job_id))}
+        )
+    
     # Process actions
     processed_ids, failed_ids, errors = process_sync_actions(
         session=db,
         user_id=current_user.id,
         business_id=business.id,
-        actions=actions
+        actions=actions,
+        device_id=device_id
     )
     
     # Update sync state
-    update_sync_state(db, current_user.id, push_data.device_id)
+    update_sync_state(db, current_user.id, device_id)
     
-    return SyncPushResponse(
+    response = SyncPushResponse(
         success=len(failed_ids) == 0,
         processed_ids=processed_ids,
         failed_ids=failed_ids,
         errors=errors
     )
+    return encode_sync_response(request, response.model_dump())
+
+
+@router.get("/push/jobs/{job_id}", response_model=SyncPushJobResponse)
+async def get_sync_push_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Status and per-action results of an async push"""
+    job = get_push_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync push job not found")
+    
+    return SyncPushJobResponse(**push_job_status(job))
 
 
 @router.get("/pull", response_model=SyncPullResponse)
 async def sync_pull(
-    since: Optional[str] = Query(None, description="ISO timestamp of last sync"),
+    request: Request,
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous pull"),
+    limit: int = Query(settings.SYNC_PULL_PAGE_SIZE, ge=1, le=settings.SYNC_PULL_MAX_PAGE_SIZE),
+    since: Optional[str] = Query(None, description="Legacy: ISO timestamp of last sync"),
+    device_id: Optional[str] = Query(None, description="Pulling device (or X-Device-ID header)"),
+    x_device_id: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -95,6 +155,18 @@ async def sync_pull(
     Pull changes from server since last sync
     
     Returns delta of changes (products, stock, sales, invoices)
+    
+    Cursor mode (default): pages through the business change log. Start
+    without a cursor, then send back the returned cursor and keep pulling
+    while has_more is true. New devices should load /sync/snapshot first
+    and start from its cursor. Clients still sending `since` get the legacy
+    timestamp scan.
+    
+    With a device id, the checkpoint is kept per device and changes that
+    device pushed itself are left out (cursor pulls only).
+    
+    The body is encoded per Accept (application/msgpack for columnar
+    MessagePack) and Accept-Encoding (zstd, gzip).
     """
     business = get_business_by_user_id(db, current_user.id)
     if not business:
@@ -113,21 +185,32 @@ async def sync_pull(
             )
         )
     
-    # Parse since timestamp
-    since_dt = None
-    if since:
+    device_id = device_id or x_device_id
+    next_cursor = None
+    pull_seq = None
+    has_more = False
+    
+    if since is None:
+        try:
+            page = get_sync_changes_page(db, business.id, cursor=cursor, limit=limit, device_id=device_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        changes_data = page["changes"]
+        next_cursor, pull_seq, has_more = page["cursor"], page["seq"], page["has_more"]
+    else:
+        # Parse since timestamp
         try:
             since_dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
         except:
             raise HTTPException(status_code=400, detail="Invalid since timestamp format")
-    
-    # Get changes
-    changes_data = get_sync_changes(
-        session=db,
-        user_id=current_user.id,
-        business_id=business.id,
-        since=since_dt
-    )
+        
+        # Get changes
+        changes_data = get_sync_changes(
+            session=db,
+            user_id=current_user.id,
+            business_id=business.id,
+            since=since_dt
+        )
     
     # Convert to SyncChange objects
     changes = [
@@ -136,36 +219,100 @@ async def sync_pull(
             entity_id=change["entity_id"],
             data=change["data"],
             updated_at=change["updated_at"],
-            action=change["action"]
+            action=change["action"],
+            seq=change.get("seq"),
+            fields=change.get("fields")
         )
         for change in changes_data
     ]
     
-    # Update sync state
-    sync_state = get_or_create_sync_state(db, current_user.id)
+    # Update this device's sync state
+    sync_state = get_or_create_sync_state(db, current_user.id, device_id)
     sync_state.last_pull_at = datetime.utcnow()
+    if pull_seq is not None:
+        sync_state.last_pull_seq = pull_seq
     sync_state.updated_at = datetime.utcnow()
     db.add(sync_state)
     db.commit()
     
-    return SyncPullResponse(
+    response = SyncPullResponse(
         server_time=datetime.utcnow(),
         changes=changes,
-        has_more=False  # Could implement pagination if needed
+        has_more=has_more,
+        cursor=next_cursor
+    )
+    return encode_sync_response(request, response.model_dump(), columnar_key="changes")
+
+
+def _snapshot_manifest(db: Session, business_id: int) -> dict:
+    """Latest snapshot manifest, writing the first one on demand"""
+    manifest = get_latest_snapshot(business_id)
+    if manifest is None:
+        manifest = write_snapshot(db, business_id)
+    return manifest
+
+
+@router.get("/snapshot/manifest")
+async def sync_snapshot_manifest(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Version, cursor, size and checksum of the current bootstrap snapshot"""
+    business = get_business_by_user_id(db, current_user.id)
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    
+    manifest = await asyncio.to_thread(_snapshot_manifest, db, business.id)
+    return {key: value for key, value in manifest.items() if key != "path"}
+
+
+@router.get("/snapshot")
+async def sync_snapshot(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download the bootstrap snapshot for a new device
+    
+    A gzipped JSON file: {format_version, business_id, generated_at, seq,
+    cursor, products, stock, customers}. Load it, then call /sync/pull with
+    its cursor to catch up. Snapshots are refreshed in the background every
+    SYNC_SNAPSHOT_INTERVAL_MINUTES; the cursor is also sent as the
+    X-Snapshot-Cursor header.
+    """
+    business = get_business_by_user_id(db, current_user.id)
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    
+    manifest = await asyncio.to_thread(_snapshot_manifest, db, business.id)
+    return FileResponse(
+        manifest["path"],
+        media_type="application/gzip",
+        filename=manifest["file"],
+        headers={
+            "X-Snapshot-Version": str(manifest["format_version"]),
+            "X-Snapshot-Seq": str(manifest["seq"]),
+            "X-Snapshot-Cursor": manifest["cursor"],
+            "Cache-Control": "private, no-cache"
+        }
     )
 
 
 @router.get("/state")
 async def get_sync_state(
+    device_id: Optional[str] = Query(None),
+    x_device_id: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get current sync state for user"""
-    sync_state = get_or_create_sync_state(db, current_user.id)
+    """Get current sync state for user/device"""
+    sync_state = get_or_create_sync_state(db, current_user.id, device_id or x_device_id)
     
     return {
+        "device_id": sync_state.device_id,
         "last_sync_at": sync_state.last_sync_at.isoformat() if sync_state.last_sync_at else None,
         "last_pull_at": sync_state.last_pull_at.isoformat() if sync_state.last_pull_at else None,
+        "last_pull_seq": sync_state.last_pull_seq,
         "sync_version": sync_state.sync_version
     }
 
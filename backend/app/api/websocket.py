@@ -2,101 +2,706 @@
 WebSocket endpoints for real-time sync
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from typing import Dict, Set, List
+from sqlmodel import Session
+from typing import Any, Dict, Optional, Set, List, Tuple
 import json
 import asyncio
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.db.session import engine
+from app.core.pubsub import InMemoryBroker, RedisBroker, business_channel, channel_business_id
+from app.api.admin.stats import require_admin
 from app.models.user import User
 from app.models.sync_event import SyncEvent
-from app.services.event_service import emit_sync_event
+from app.services.event_service import (
+    emit_sync_event,
+    get_events_after,
+    get_latest_event_id,
+    EVENT_STOCK_UPDATED,
+    EVENT_PRODUCT_CREATED,
+    EVENT_PRODUCT_UPDATED
+)
 
 router = APIRouter(tags=["websocket"])
 
 # Store active connections per business
 business_connections: Dict[int, Set[WebSocket]] = {}
 
+# Close code sent to clients that cannot keep up (RFC 6455 "try again later")
+WS_CLOSE_SLOW_CONSUMER = 1013
+
+# Per-entity events merged within WS_COALESCE_WINDOW_MS (latest value wins).
+# Checkout, quick sell, movements, purchases and stock takes enqueue one
+# STOCK_UPDATED per product, CSV import one PRODUCT_CREATED per row
+# (outbox_service.enqueue_product_events)
+COALESCED_EVENT_TYPES = {EVENT_STOCK_UPDATED, EVENT_PRODUCT_CREATED, EVENT_PRODUCT_UPDATED}
+
+
+class ClientConnection:
+    """
+    A local WebSocket with its own bounded outgoing queue
+    
+    All frames to the client go through the queue and are written by a
+    dedicated task, so a slow client only ever delays itself. Frames are
+    queued as already-serialized text.
+    """
+    
+    def __init__(self, websocket: WebSocket, business_id: int, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.business_id = business_id
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.resync_pending = False
+        self._resync_frame: Optional[str] = None
+        self.closed = False
+        self.dropped = 0
+        self._writer: Optional[asyncio.Task] = None
+        
+        # Live frames held back while missed events are replayed: (event_id, text)
+        self._held: Optional[List[Tuple[Optional[int], str]]] = None
+        self._held_overflow = False
+        
+        # Subscription filters; None means "everything"
+        self.event_types: Optional[Set[str]] = None
+        self.branch_ids: Optional[Set[int]] = None
+        self.product_ids: Optional[Set[int]] = None
+    
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+    
+    async def stop(self):
+        self.closed = True
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+    
+    def wants(self, event_type: str, branch_id: Optional[int], product_ids: Optional[List[int]]) -> bool:
+        """
+        Whether an event passes this client's subscription filters
+        
+        Business-wide events (no branch_id) reach every branch filter, and
+        events that don't concern specific products pass any product filter.
+        """
+        if self.event_types is not None and event_type not in self.event_types:
+            return False
+        if self.branch_ids is not None and branch_id is not None and branch_id not in self.branch_ids:
+            return False
+        if self.product_ids is not None and product_ids and self.product_ids.isdisjoint(product_ids):
+            return False
+        return True
+    
+    def has_filters(self) -> bool:
+        return self.event_types is not None or self.branch_ids is not None or self.product_ids is not None
+    
+    def update_subscription(self, data: Dict[str, Any], unsubscribe: bool = False):
+        """
+        Apply a subscribe / unsubscribe message
+        
+        subscribe replaces each filter it names ("events", "branch_ids",
+        "product_ids"); unsubscribe removes the listed values from a filter.
+        Either way a filter left empty (or given as [] / null) resets to
+        everything. Unsubscribing from a filter that is already "everything"
+        is rejected, as there is no list to remove from.
+        
+        Every key is validated before any filter changes, so a bad message
+        raises TypeError / ValueError and leaves the subscription untouched.
+        """
+        updates = {}
+        for key, attr, cast in (
+            ("events", "event_types", str),
+            ("branch_ids", "branch_ids", int),
+            ("product_ids", "product_ids", int)
+        ):
+            if key not in data:
+                continue
+            if data[key] is not None and not isinstance(data[key], list):
+                raise TypeError(f"{key} must be a list")
+            values = {cast(v) for v in (data[key] or [])}
+            if unsubscribe:
+                current = getattr(self, attr)
+                if current is None:
+                    if values:
+                        raise ValueError(f"Not subscribed to specific {key}; subscribe to a list first")
+                    continue
+                values = current - values
+            updates[attr] = values or None
+        
+        for attr, values in updates.items():
+            setattr(self, attr, values)
+    
+    def subscription(self) -> Dict[str, Any]:
+        """Current filters, as echoed back to the client"""
+        return {
+            "events": sorted(self.event_types) if self.event_types is not None else None,
+            "branch_ids": sorted(self.branch_ids) if self.branch_ids is not None else None,
+            "product_ids": sorted(self.product_ids) if self.product_ids is not None else None
+        }
+    
+    def send_json(self, message: Dict[str, Any]) -> bool:
+        """Queue a message for this client only"""
+        return self.enqueue(json.dumps(message))
+    
+    def enqueue(self, text: str, event_id: Optional[int] = None) -> bool:
+        """
+        Queue a serialized frame without waiting on the client
+        
+        On overflow the backlog is discarded and replaced by a single
+        resync_required notice - the client reloads state instead of
+        replaying stale deltas. A client that is still full while that notice
+        is pending is disconnected. Returns False if the frame was dropped.
+        """
+        if self.closed:
+            return False
+        
+        if self._held is not None:
+            if len(self._held) >= settings.WS_SEND_QUEUE_SIZE:
+                self._held_overflow = True
+                return False
+            self._held.append((event_id, text))
+            return True
+        
+        try:
+            self.queue.put_nowait(text)
+            self.manager.metrics["messages_enqueued"] += 1
+            return True
+        except asyncio.QueueFull:
+            pass
+        
+        if self.resync_pending:
+            self.dropped += 1
+            self.manager.metrics["messages_dropped"] += 1
+            self.manager.metrics["slow_consumers_disconnected"] += 1
+            asyncio.create_task(self.manager.close_connection(self, WS_CLOSE_SLOW_CONSUMER))
+            self.closed = True
+            return False
+        
+        self.dropped += 1
+        self.manager.metrics["messages_dropped"] += 1
+        self.request_resync("slow_consumer")
+        return False
+    
+    def request_resync(self, reason: str, **extra: Any):
+        """Replace everything still queued with a resync_required notice"""
+        discarded = 0
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            discarded += 1
+        self.dropped += discarded
+        self.manager.metrics["messages_dropped"] += discarded
+        self.manager.metrics["resyncs_requested"] += 1
+        
+        self.resync_pending = True
+        self._resync_frame = json.dumps({
+            "type": "resync_required",
+            "reason": reason,
+            "timestamp": datetime.utcnow().isoformat(),
+            **extra
+        })
+        self.queue.put_nowait(self._resync_frame)
+    
+    def hold(self):
+        """Buffer live frames until release() (used while replaying)"""
+        self._held = []
+        self._held_overflow = False
+    
+    async def put(self, text: str):
+        """Queue a frame, waiting for room (replay is paced by the client)"""
+        await self.queue.put(text)
+        self.manager.metrics["messages_enqueued"] += 1
+    
+    def release(self, after_event_id: Optional[int]):
+        """
+        Resume live delivery after a replay
+        
+        Held frames already covered by the replay (event_id <= after_event_id)
+        are skipped so the client sees every event exactly once, in order.
+        """
+        held, overflow = self._held or [], self._held_overflow
+        self._held = None
+        self._held_overflow = False
+        
+        if overflow:
+            self.request_resync("replay_backlog_overflow")
+            return
+        
+        for event_id, text in held:
+            if event_id is not None and after_event_id is not None and event_id <= after_event_id:
+                continue
+            self.enqueue(text, event_id=event_id)
+    
+    async def _write_loop(self):
+        """Drain the queue to the socket; a stuck or failed send closes the client"""
+        try:
+            while True:
+                text = await self.queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_text(text),
+                    timeout=settings.WS_SEND_TIMEOUT_SECONDS
+                )
+                if text is self._resync_frame:
+                    self.resync_pending = False
+                    self._resync_frame = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"WebSocket send failed for business {self.business_id}: {e}")
+            await self.manager.close_connection(self)
+
 
 class ConnectionManager:
-    """Manages WebSocket connections per business"""
+    """
+    Manages WebSocket connections per business
+    
+    Connections are local to this worker. Broadcasts go through the pub/sub
+    broker (Redis across workers, in-memory otherwise) and every worker
+    relays them to its own sockets.
+    """
     
-    def __init__(self):
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
+    def __init__(self, broker=None):
+        self.active_connections: Dict[int, Set[ClientConnection]] = {}
+        self.broker = broker
+        self.instance_id = uuid.uuid4().hex
+        self._started = False
+        self.metrics: Dict[str, int] = {
+            "messages_enqueued": 0,
+            "messages_dropped": 0,
+            "resyncs_requested": 0,
+            "slow_consumers_disconnected": 0,
+            "messages_filtered": 0,
+            "events_coalesced": 0,
+            "batches_sent": 0
+        }
+        
+        # Coalescing window per business room:
+        # entity key -> (meta, serialized message, excluded websocket)
+        self._pending: Dict[int, Dict[Tuple, Tuple[Dict[str, Any], str, Optional[WebSocket]]]] = {}
+        self._flush_handles: Dict[int, asyncio.TimerHandle] = {}
     
-    async def connect(self, websocket: WebSocket, business_id: int):
-        """Connect a client to a business room"""
+    async def start(self):
+        """Subscribe to the broker (call once per worker at startup)"""
+        if self._started:
+            return
+        
+        if self.broker is None:
+            if settings.REALTIME_BROKER == "redis":
+                self.broker = RedisBroker(settings.REDIS_URL)
+            else:
+                self.broker = InMemoryBroker()
+        
+        try:
+            await self.broker.start(self._on_broker_message)
+        except Exception as e:
+            # Still serve this worker's own sockets if Redis is unavailable
+            print(f"Realtime broker unavailable, falling back to in-process fan-out: {e}")
+            self.broker = InMemoryBroker()
+            await self.broker.start(self._on_broker_message)
+        
+        self._started = True
+    
+    async def stop(self):
+        """Unsubscribe from the broker (call at shutdown)"""
+        if self._started:
+            await self.broker.stop()
+            self._started = False
+        
+        for handle in self._flush_handles.values():
+            handle.cancel()
+        self._flush_handles.clear()
+        self._pending.clear()
+    
+    async def connect(self, websocket: WebSocket, business_id: int, hold: bool = False) -> ClientConnection:
+        """
+        Connect a client to a business room
+        
+        With hold=True live broadcasts are buffered until the caller releases
+        the connection (see replay_missed_events).
+        """
         await websocket.accept()
         
+        connection = ClientConnection(websocket, business_id, self)
+        if hold:
+            connection.hold()
+        connection.start()
+        
         if business_id not in self.active_connections:
             self.active_connections[business_id] = set()
         
-        self.active_connections[business_id].add(websocket)
+        self.active_connections[business_id].add(connection)
+        return connection
     
-    def disconnect(self, websocket: WebSocket, business_id: int):
+    async def disconnect(self, connection: ClientConnection):
         """Disconnect a client from a business room"""
+        business_id = connection.business_id
         if business_id in self.active_connections:
-            self.active_connections[business_id].discard(websocket)
+            self.active_connections[business_id].discard(connection)
             if not self.active_connections[business_id]:
                 del self.active_connections[business_id]
+        await connection.stop()
+    
+    async def close_connection(self, connection: ClientConnection, code: int = 1000):
+        """Drop a client from its room and close the socket"""
+        await self.disconnect(connection)
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
     
     async def broadcast_to_business(
         self,
         business_id: int,
         event_type: str,
         payload: dict,
-        exclude_websocket: WebSocket = None
+        exclude_websocket: WebSocket = None,
+        branch_id: Optional[int] = None,
+        event_id: Optional[int] = None
     ):
-        """Broadcast an event to all clients in a business room"""
-        if business_id not in self.active_connections:
-            return
-        
+        """Broadcast an event to all clients in a business room, on every worker"""
+        # Routing data for subscription filters, kept outside the serialized
+        # frame so relays never have to parse it
+        meta = {
+            "event_type": event_type,
+            "branch_id": branch_id,
+            "product_ids": event_product_ids(payload),
+            "event_id": event_id
+        }
         message = {
             "type": event_type,
             "payload": payload,
             "timestamp": datetime.utcnow().isoformat()
         }
+        if event_id is not None:
+            # Clients keep the last one to resume with ?last_event_id=
+            message["event_id"] = event_id
+        # Serialized once; every connection queues the same string
+        text = json.dumps(message)
+        
+        if not self._started:
+            # No broker (scripts, tests without startup) - local sockets only
+            self._deliver_local(business_id, text, meta, exclude_websocket)
+            return
+        
+        envelope = {
+            "origin": self.instance_id,
+            "exclude": id(exclude_websocket) if exclude_websocket is not None else None,
+            "meta": meta,
+            "message": text
+        }
+        await self.broker.publish(business_channel(business_id), json.dumps(envelope))
+    
+    async def _on_broker_message(self, channel: str, data: str):
+        """Relay a broadcast received from the broker to local sockets"""
+        business_id = channel_business_id(channel)
+        if business_id not in self.active_connections:
+            return
+        
+        envelope = json.loads(data)
+        exclude_websocket = None
+        if envelope.get("origin") == self.instance_id and envelope.get("exclude") is not None:
+            exclude_websocket = next(
+                (
+                    conn.websocket for conn in self.active_connections[business_id]
+                    if id(conn.websocket) == envelope["exclude"]
+                ),
+                None
+            )
         
-        disconnected = set()
-        for websocket in self.active_connections[business_id]:
-            if websocket == exclude_websocket:
+        self._deliver_local(business_id, envelope["message"], envelope.get("meta") or {}, exclude_websocket)
+    
+    def _deliver_local(
+        self,
+        business_id: int,
+        text: str,
+        meta: Dict[str, Any],
+        exclude_websocket: WebSocket = None
+    ):
+        """
+        Queue a serialized message for this worker's subscribed sockets in a business room
+        
+        Per-entity stock/product updates are held for the room's coalescing
+        window instead. Any other event flushes the window first, so a room
+        always sees events in order.
+        """
+        key = self._coalesce_key(meta)
+        if key is not None:
+            room = self._pending.setdefault(business_id, {})
+            if room.pop(key, None) is not None:
+                self.metrics["events_coalesced"] += 1
+            room[key] = (meta, text, exclude_websocket)
+            
+            if business_id not in self._flush_handles:
+                self._flush_handles[business_id] = asyncio.get_running_loop().call_later(
+                    settings.WS_COALESCE_WINDOW_MS / 1000,
+                    self._flush_room,
+                    business_id
+                )
+            return
+        
+        self._flush_room(business_id)
+        self._send_to_room(business_id, text, meta, exclude_websocket)
+    
+    def _coalesce_key(self, meta: Dict[str, Any]) -> Optional[Tuple]:
+        """Entity key for coalescible events (one product), None to send immediately"""
+        if settings.WS_COALESCE_WINDOW_MS <= 0 or meta.get("event_type") not in COALESCED_EVENT_TYPES:
+            return None
+        product_ids = meta.get("product_ids") or []
+        if len(product_ids) != 1:
+            return None
+        return (meta["event_type"], product_ids[0], meta.get("branch_id"))
+    
+    def _flush_room(self, business_id: int):
+        """
+        Send a room's coalesced events as one batch frame
+        
+        Unfiltered clients share one serialized frame; clients with
+        subscription filters (or that sent one of the events) get their own
+        subset.
+        """
+        handle = self._flush_handles.pop(business_id, None)
+        if handle:
+            handle.cancel()
+        
+        room = self._pending.pop(business_id, None)
+        if not room:
+            return
+        
+        entries = list(room.values())
+        if len(entries) == 1:
+            meta, text, exclude_websocket = entries[0]
+            self._send_to_room(business_id, text, meta, exclude_websocket)
+            return
+        
+        messages = [json.loads(text) for _, text, _ in entries]
+        excluded = {id(exclude) for _, _, exclude in entries if exclude is not None}
+        shared = None
+        self.metrics["batches_sent"] += 1
+        
+        for connection in list(self.active_connections.get(business_id, ())):
+            if not connection.has_filters() and id(connection.websocket) not in excluded:
+                if shared is None:
+                    shared = batch_frame(messages)
+                connection.enqueue(shared[1], event_id=shared[0])
                 continue
             
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                # Mark for removal if connection is dead
-                disconnected.add(websocket)
+            selected = [
+                message
+                for (meta, _, exclude), message in zip(entries, messages)
+                if exclude is not connection.websocket
+                and connection.wants(meta.get("event_type"), meta.get("branch_id"), meta.get("product_ids"))
+            ]
+            self.metrics["messages_filtered"] += len(entries) - len(selected)
+            if selected:
+                event_id, text = batch_frame(selected)
+                connection.enqueue(text, event_id=event_id)
+    
+    def _send_to_room(
+        self,
+        business_id: int,
+        text: str,
+        meta: Dict[str, Any],
+        exclude_websocket: WebSocket = None
+    ):
+        """Queue one frame for every subscribed socket in a room"""
+        event_type = meta.get("event_type")
+        branch_id = meta.get("branch_id")
+        product_ids = meta.get("product_ids")
         
-        # Remove disconnected websockets
-        for ws in disconnected:
-            self.active_connections[business_id].discard(ws)
+        for connection in list(self.active_connections.get(business_id, ())):
+            if connection.websocket is exclude_websocket:
+                continue
+            if not connection.wants(event_type, branch_id, product_ids):
+                self.metrics["messages_filtered"] += 1
+                continue
+            connection.enqueue(text, event_id=meta.get("event_id"))
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Connection count, queue depth and drop counters for this worker"""
+        depths = [
+            connection.queue.qsize()
+            for connections in self.active_connections.values()
+            for connection in connections
+        ]
+        return {
+            "instance_id": self.instance_id,
+            "businesses": len(self.active_connections),
+            "connections": len(depths),
+            "queue_capacity": settings.WS_SEND_QUEUE_SIZE,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "connections_resync_pending": sum(
+                1
+                for connections in self.active_connections.values()
+                for connection in connections
+                if connection.resync_pending
+            ),
+            **self.metrics
+        }
+
+
+def event_product_ids(payload: Optional[Dict[str, Any]]) -> Optional[List[int]]:
+    """
+    Products an event concerns, for product subscriptions
+    
+    Looks at product_id, product_ids and items[].product_id; returns None
+    for events that aren't about specific products.
+    """
+    if not isinstance(payload, dict):
+        return None
+    
+    ids: Set[int] = set()
+    if payload.get("product_id") is not None:
+        ids.add(payload["product_id"])
+    for product_id in payload.get("product_ids") or []:
+        ids.add(product_id)
+    for item in payload.get("items") or []:
+        if isinstance(item, dict) and item.get("product_id") is not None:
+            ids.add(item["product_id"])
+    
+    try:
+        return sorted(int(product_id) for product_id in ids) or None
+    except (TypeError, ValueError):
+        return None
 
 
 manager = ConnectionManager()
 
 
+def batch_frame(messages: List[Dict[str, Any]]) -> Tuple[Optional[int], str]:
+    """
+    Serialize coalesced events as {"type": "batch", "events": [...]}
+    
+    Returns (highest event_id, text); the frame's event_id is what a client
+    should resume from after receiving it.
+    """
+    event_id = max(
+        (message["event_id"] for message in messages if message.get("event_id") is not None),
+        default=None
+    )
+    frame = {
+        "type": "batch",
+        "events": messages,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if event_id is not None:
+        frame["event_id"] = event_id
+    return event_id, json.dumps(frame)
+
+
+def sync_event_frame(event: SyncEvent) -> Dict[str, Any]:
+    """A stored SyncEvent in the same shape as a live broadcast"""
+    return {
+        "type": event.event_type,
+        "payload": event.payload,
+        "timestamp": event.created_at.isoformat(),
+        "event_id": event.id,
+        "replayed": True
+    }
+
+
+def _load_missed_events(business_id: int, last_event_id: int) -> Dict[str, Any]:
+    """
+    Read what a resuming client missed (runs in a worker thread)
+    
+    Returns the serialized frames, or a resync reason when the gap is too
+    large or too old to replay.
+    """
+    with Session(engine) as session:
+        events = get_events_after(session, business_id, last_event_id, settings.WS_REPLAY_MAX_EVENTS + 1)
+        latest_event_id = events[-1].id if events else get_latest_event_id(session, business_id)
+        
+        if last_event_id > latest_event_id:
+            return {"resync": "unknown_event_id", "latest_event_id": latest_event_id}
+        if len(events) > settings.WS_REPLAY_MAX_EVENTS:
+            return {"resync": "too_many_missed_events", "latest_event_id": get_latest_event_id(session, business_id)}
+        
+        oldest_allowed = datetime.utcnow() - timedelta(minutes=settings.WS_REPLAY_MAX_AGE_MINUTES)
+        if events and events[0].created_at < oldest_allowed:
+            return {"resync": "missed_events_expired", "latest_event_id": latest_event_id}
+        
+        return {
+            "frames": [json.dumps(sync_event_frame(event)) for event in events],
+            "latest_event_id": latest_event_id
+        }
+
+
+async def replay_missed_events(connection: ClientConnection, last_event_id: int):
+    """
+    Stream SyncEvents after last_event_id to a resuming client, then go live
+    
+    The connection was registered with hold=True, so broadcasts committed
+    during the replay are buffered and released afterwards without
+    duplicates. If the gap can't be replayed the client is told to resync
+    (full /sync/pull) and then receives live events as usual.
+    """
+    try:
+        result = await asyncio.to_thread(_load_missed_events, connection.business_id, last_event_id)
+    except Exception as e:
+        print(f"WebSocket replay failed for business {connection.business_id}: {e}")
+        result = {"resync": "replay_unavailable", "latest_event_id": None}
+    
+    latest_event_id = result["latest_event_id"]
+    if "resync" in result:
+        connection.request_resync(result["resync"], latest_event_id=latest_event_id)
+        # Everything up to latest_event_id is covered by the client's resync
+        connection.release(latest_event_id)
+        return
+    
+    for text in result["frames"]:
+        await connection.put(text)
+    connection.release(latest_event_id)
+    
+    connection.send_json({
+        "type": "replay_complete",
+        "replayed": len(result["frames"]),
+        "last_event_id": latest_event_id
+    })
+
+
+@router.get("/ws/metrics")
+async def websocket_metrics(current_user: User = Depends(require_admin)):
+    """Real-time delivery metrics for this worker"""
+    return manager.get_metrics()
+
+
 @router.websocket("/ws/{business_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     business_id: int,
     user_id: int = Query(...),
-    device_id: str = Query(None)
+    device_id: str = Query(None),
+    last_event_id: Optional[int] = Query(None)
 ):
     """
     WebSocket endpoint for real-time sync
     
     Clients connect to: ws://host/ws/{business_id}?user_id={id}&device_id={id}
+    
+    Reconnecting clients add &last_event_id={id} (the event_id of the last
+    event they received) to get missed events replayed before live ones.
+    
+    Bursts of STOCK_UPDATED / PRODUCT_UPDATED arrive as one
+    {"type": "batch", "events": [...]} frame holding the latest event per
+    product.
+    
+    Optional filters (all business events by default):
+    {"type": "subscribe", "events": [...], "branch_ids": [...], "product_ids": [...]}
+    {"type": "unsubscribe", "product_ids": [...]}
     """
-    await manager.connect(websocket, business_id)
+    connection = await manager.connect(websocket, business_id, hold=last_event_id is not None)
     
     try:
         # Send welcome message
-        await websocket.send_json({
+        connection.send_json({
             "type": "connected",
             "message": "Connected to real-time sync",
             "business_id": business_id,
             "timestamp": datetime.utcnow().isoformat()
         })
         
+        if last_event_id is not None:
+            await replay_missed_events(connection, last_event_id)
+        
         # Listen for incoming messages
         while True:
             data = await websocket.receive_json()
@@ -106,7 +711,7 @@ async def websocket_endpoint(
             
             if msg_type == "ping":
                 # Heartbeat
-                await websocket.send_json({
+                connection.send_json({
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat()
                 })
@@ -121,28 +726,46 @@ async def websocket_endpoint(
                     business_id,
                     event_type,
                     payload,
-                    exclude_websocket=websocket
+                    exclude_websocket=websocket,
+                    branch_id=data.get("branch_id")
                 )
             
-            elif msg_type == "subscribe":
-                # Client can be extended for specific event subscriptions
-                await websocket.send_json({
+            elif msg_type in ("subscribe", "unsubscribe"):
+                # Narrow (or widen) what this client receives
+                try:
+                    connection.update_subscription(data, unsubscribe=msg_type == "unsubscribe")
+                except (TypeError, ValueError) as e:
+                    connection.send_json({
+                        "type": "error",
+                        "message": f"Invalid subscription filter: {e}"
+                    })
+                    continue
+                
+                connection.send_json({
                     "type": "subscribed",
-                    "events": data.get("events", [])
+                    **connection.subscription()
                 })
     
     except WebSocketDisconnect:
-        manager.disconnect(websocket, business_id)
+        await manager.disconnect(connection)
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, business_id)
+        await manager.disconnect(connection)
 
 
 async def broadcast_sync_event(
     business_id: int,
     event_type: str,
-    payload: dict
+    payload: dict,
+    branch_id: Optional[int] = None,
+    event_id: Optional[int] = None
 ):
     """Helper function to broadcast sync events via WebSocket"""
-    await manager.broadcast_to_business(business_id, event_type, payload)
+    await manager.broadcast_to_business(
+        business_id,
+        event_type,
+        payload,
+        branch_id=branch_id,
+        event_id=event_id
+    )
 
@@ -10,12 +10,70 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
     
+    # Real-time fan-out across workers: "redis" or "memory" (single process / tests)
+    REALTIME_BROKER: str = "redis"
+    
+    # Per-connection outgoing WebSocket queue; a client that falls this far
+    # behind is told to resync, and dropped if it still can't keep up
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+    
+    # WebSocket resume (?last_event_id=): larger or older gaps get resync_required
+    WS_REPLAY_MAX_EVENTS: int = 1000
+    WS_REPLAY_MAX_AGE_MINUTES: int = 60
+    
+    # Stock/product updates for the same entity within this window are merged
+    # into one "batch" frame per room (0 disables)
+    WS_COALESCE_WINDOW_MS: int = 150
+    
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     DEBUG: bool = True  # Development mode - allows optional auth
     
+    # Outbox workers (post-commit side effects)
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    
+    # Done outbox messages are deleted after this many days (0 keeps them), checked hourly
+    OUTBOX_RETENTION_DAYS: int = 7
+    OUTBOX_PRUNE_INTERVAL_MINUTES: int = 60
+    
+    # Sync push: actions applied per transaction
+    SYNC_PUSH_CHUNK_SIZE: int = 100
+    
+    # Async sync push jobs: worker pool size, idle poll, and minutes without a heartbeat before a running job counts as abandoned
+    SYNC_PUSH_WORKERS: int = 2
+    SYNC_PUSH_POLL_INTERVAL_SECONDS: float = 2.0
+    SYNC_PUSH_JOB_STALE_MINUTES: int = 15
+    SYNC_PUSH_JOB_MAX_ATTEMPTS: int = 3
+    
+    # Sync pull: change-log entries per page (clients may ask for up to the max)
+    SYNC_PULL_PAGE_SIZE: int = 500
+    SYNC_PULL_MAX_PAGE_SIZE: int = 2000
+    
+    # Assembled pull pages shared by a business's devices: "memory", "redis" (across workers) or "off"
+    SYNC_DELTA_CACHE: str = "memory"
+    SYNC_DELTA_CACHE_TTL_SECONDS: float = 30.0
+    SYNC_DELTA_CACHE_MAX_ENTRIES: int = 2000
+    
+    # Product search index: "memory", "redis" (invalidations shared across workers) or "off" (SQL search)
+    SEARCH_INDEX: str = "memory"
+    SEARCH_INDEX_TTL_SECONDS: float = 600.0
+    SEARCH_INDEX_MAX_BUSINESSES: int = 200
+    
+    # Sync wire encoding: compress responses from this size; cap inflated request bodies
+    SYNC_COMPRESS_MIN_BYTES: int = 1024
+    SYNC_MAX_REQUEST_BYTES: int = 20 * 1024 * 1024
+    
+    # Sync bootstrap snapshots: where they are written, how often (0 = never), how many kept
+    SYNC_SNAPSHOT_DIR: str = "/snapshots"
+    SYNC_SNAPSHOT_INTERVAL_MINUTES: int = 30
+    SYNC_SNAPSHOT_KEEP: int = 2
+    
     # Telegram
     TELEGRAM_BOT_TOKEN: str = ""
     
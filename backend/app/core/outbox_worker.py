@@ -0,0 +1,70 @@
+"""
+Background worker pool that drains the transactional outbox (and prunes
+messages that were applied long ago)
+"""
+import asyncio
+from typing import List, Optional
+from app.core.config import settings
+from app.services.outbox_service import process_outbox_batch, prune_outbox, set_outbox_wake_callback
+
+_workers: List[asyncio.Task] = []
+_wake_event: Optional[asyncio.Event] = None
+
+
+async def outbox_worker(worker_id: int):
+    """Apply outbox batches until cancelled; sleeps when the outbox is empty"""
+    while True:
+        try:
+            # DB work is blocking - keep it off the event loop
+            claimed = await asyncio.to_thread(process_outbox_batch)
+            if claimed:
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Outbox worker {worker_id} error: {e}")
+        
+        _wake_event.clear()
+        try:
+            await asyncio.wait_for(_wake_event.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def outbox_pruner():
+    """Delete old "done" messages every OUTBOX_PRUNE_INTERVAL_MINUTES until cancelled"""
+    while True:
+        try:
+            deleted = await asyncio.to_thread(prune_outbox)
+            if deleted:
+                print(f"Outbox pruned: {deleted} done messages")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Outbox pruner error: {e}")
+        
+        await asyncio.sleep(settings.OUTBOX_PRUNE_INTERVAL_MINUTES * 60)
+
+
+def start_outbox_workers():
+    """Start the worker pool (call from app startup, inside the event loop)"""
+    global _wake_event
+    loop = asyncio.get_running_loop()
+    _wake_event = asyncio.Event()
+    
+    # Enqueuers may run in threadpool threads, so wake the loop thread-safely
+    set_outbox_wake_callback(lambda: loop.call_soon_threadsafe(_wake_event.set))
+    
+    for worker_id in range(settings.OUTBOX_WORKERS):
+        _workers.append(asyncio.create_task(outbox_worker(worker_id)))
+    if settings.OUTBOX_RETENTION_DAYS > 0:
+        _workers.append(asyncio.create_task(outbox_pruner()))
+
+
+async def stop_outbox_workers():
+    """Cancel the worker pool (call from app shutdown)"""
+    set_outbox_wake_callback(None)
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,107 @@
+"""
+Pub/sub brokers for cross-worker real-time fan-out
+
+Every uvicorn worker publishes business-room broadcasts to the broker and
+relays whatever it receives to its own local WebSocket connections, so a
+sale on worker A reaches terminals connected to worker B.
+
+RedisBroker is used in production (REDIS_URL). InMemoryBroker is a
+drop-in stand-in for tests and single-process setups: brokers sharing an
+InMemoryHub behave like workers sharing one Redis.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+# Called with (channel, data) for every message received on the broker
+MessageHandler = Callable[[str, str], Awaitable[None]]
+
+CHANNEL_PREFIX = "sosy:business:"
+
+
+def business_channel(business_id: int) -> str:
+    """Pub/sub channel for a business room"""
+    return f"{CHANNEL_PREFIX}{business_id}"
+
+
+def channel_business_id(channel: str) -> int:
+    """Business id from a business room channel name"""
+    return int(channel[len(CHANNEL_PREFIX):])
+
+
+class InMemoryHub:
+    """Shared in-process 'server' that InMemoryBroker instances publish through"""
+    
+    def __init__(self):
+        self.brokers: List["InMemoryBroker"] = []
+
+
+class InMemoryBroker:
+    """Process-local broker with the same interface as RedisBroker"""
+    
+    def __init__(self, hub: Optional[InMemoryHub] = None):
+        self.hub = hub or InMemoryHub()
+        self._handler: Optional[MessageHandler] = None
+    
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+        self.hub.brokers.append(self)
+    
+    async def stop(self):
+        if self in self.hub.brokers:
+            self.hub.brokers.remove(self)
+        self._handler = None
+    
+    async def publish(self, channel: str, data: str):
+        for broker in list(self.hub.brokers):
+            if broker._handler:
+                await broker._handler(channel, data)
+
+
+class RedisBroker:
+    """Redis pub/sub broker (one pattern subscription per worker)"""
+    
+    def __init__(self, url: str):
+        self.url = url
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def start(self, handler: MessageHandler):
+        import redis.asyncio as aioredis
+        
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        # Fail fast so the caller can fall back to in-memory fan-out
+        await self._redis.ping()
+        self._listener = asyncio.create_task(self._listen(handler))
+    
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+    
+    async def publish(self, channel: str, data: str):
+        await self._redis.publish(channel, data)
+    
+    async def _listen(self, handler: MessageHandler):
+        """Relay messages to the handler, resubscribing after connection loss"""
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    try:
+                        await handler(message["channel"], message["data"])
+                    except Exception as e:
+                        print(f"Realtime relay error: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis pub/sub connection lost, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
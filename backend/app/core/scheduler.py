@@ -1,11 +1,14 @@
 """
-Background task scheduler for daily backups
+Background task scheduler for daily backups and sync snapshots
 """
 import asyncio
 from datetime import datetime, time
+from typing import Optional
 from sqlmodel import Session
+from app.core.config import settings
 from app.db.session import get_session
 from app.services.backup import create_backup, cleanup_old_backups
+from app.services.snapshot_service import generate_all_snapshots
 from app.models.business import Business
 from sqlmodel import select
 
@@ -57,3 +60,38 @@ def start_background_tasks():
     # For now, we'll use asyncio background task
     asyncio.create_task(daily_backup_task())
 
+
+
+_snapshot_task: Optional[asyncio.Task] = None
+
+
+async def sync_snapshot_task():
+    """Refresh every business's bootstrap snapshot each SYNC_SNAPSHOT_INTERVAL_MINUTES"""
+    while True:
+        try:
+            # DB and file work is blocking - keep it off the event loop
+            written = await asyncio.to_thread(generate_all_snapshots)
+            if written:
+                print(f"Sync snapshots written: {written}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error in sync snapshot task: {e}")
+        
+        await asyncio.sleep(settings.SYNC_SNAPSHOT_INTERVAL_MINUTES * 60)
+
+
+def start_snapshot_task():
+    """Start the snapshot refresher (call from app startup; disabled when the interval is 0)"""
+    global _snapshot_task
+    if settings.SYNC_SNAPSHOT_INTERVAL_MINUTES > 0:
+        _snapshot_task = asyncio.create_task(sync_snapshot_task())
+
+
+async def stop_snapshot_task():
+    """Cancel the snapshot refresher (call from app shutdown)"""
+    global _snapshot_task
+    if _snapshot_task:
+        _snapshot_task.cancel()
+        await asyncio.gather(_snapshot_task, return_exceptions=True)
+        _snapshot_task = None
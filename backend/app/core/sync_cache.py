@@ -0,0 +1,137 @@
+"""
+Short-lived cache of assembled sync delta pages
+
+Terminals of the same business pulling from the same cursor need the same
+page, so the first one builds it and the rest read it from here. Keys are
+chosen by the caller (sync_service keys pages by cursor, limit and the
+business's change-log head, so a new change never serves a stale page);
+invalidate() additionally drops a business's pages after sync writes.
+
+RedisDeltaCache shares pages across workers (SYNC_DELTA_CACHE=redis);
+InMemoryDeltaCache is per process. Values must be JSON-serializable.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+KEY_PREFIX = "sosy:sync:delta:"
+
+
+class InMemoryDeltaCache:
+    """Process-local LRU with a TTL, safe to share between threadpool threads"""
+    
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, business_id: int, key: str) -> str:
+        return f"{business_id}:{self._generations.get(business_id, 0)}:{key}"
+    
+    def get(self, business_id: int, key: str) -> Optional[Any]:
+        with self._lock:
+            full_key = self._key(business_id, key)
+            entry = self._entries.get(full_key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(full_key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.stats["hits"] += 1
+            return entry[1]
+    
+    def set(self, business_id: int, key: str, value: Any):
+        with self._lock:
+            full_key = self._key(business_id, key)
+            self._entries[full_key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, business_id: int):
+        """Forget every page of a business (old entries age out of the LRU)"""
+        with self._lock:
+            self._generations[business_id] = self._generations.get(business_id, 0) + 1
+            self.stats["invalidations"] += 1
+
+
+class RedisDeltaCache:
+    """
+    Cache shared by all workers through Redis
+    
+    A per-business generation counter is part of every key, so invalidate()
+    is a single INCR; orphaned pages expire with their TTL. Redis errors are
+    treated as misses - the cache never fails a pull.
+    """
+    
+    def __init__(self, url: str, ttl_seconds: float):
+        import redis
+        
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+        self._redis = redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.5)
+    
+    def _generation(self, business_id: int) -> str:
+        return self._redis.get(f"{KEY_PREFIX}gen:{business_id}") or "0"
+    
+    def get(self, business_id: int, key: str) -> Optional[Any]:
+        try:
+            data = self._redis.get(f"{KEY_PREFIX}{business_id}:{self._generation(business_id)}:{key}")
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Delta cache read failed: {e}")
+            return None
+        
+        if data is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return json.loads(data)
+    
+    def set(self, business_id: int, key: str, value: Any):
+        try:
+            self._redis.set(
+                f"{KEY_PREFIX}{business_id}:{self._generation(business_id)}:{key}",
+                json.dumps(value, separators=(",", ":"), default=str),
+                ex=self.ttl_seconds
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Delta cache write failed: {e}")
+    
+    def invalidate(self, business_id: int):
+        try:
+            self._redis.incr(f"{KEY_PREFIX}gen:{business_id}")
+            self.stats["invalidations"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Delta cache invalidation failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_delta_cache():
+    """The configured cache, or None when SYNC_DELTA_CACHE is "off" """
+    global _cache
+    if settings.SYNC_DELTA_CACHE == "off":
+        return None
+    
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if settings.SYNC_DELTA_CACHE == "redis":
+                    _cache = RedisDeltaCache(settings.REDIS_URL, settings.SYNC_DELTA_CACHE_TTL_SECONDS)
+                else:
+                    _cache = InMemoryDeltaCache(
+                        settings.SYNC_DELTA_CACHE_TTL_SECONDS,
+                        settings.SYNC_DELTA_CACHE_MAX_ENTRIES
+                    )
+    return _cache
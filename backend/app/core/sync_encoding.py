@@ -0,0 +1,229 @@
+"""
+Negotiated wire encodings for sync payloads
+
+Responses are encoded per the request headers:
+
+* Accept: application/msgpack -> MessagePack, with the change list packed
+  into columnar blocks (field names sent once per block instead of once per
+  entity). Falls back to JSON if msgpack isn't installed.
+* Accept-Encoding: zstd / gzip -> compressed body (zstd preferred when the
+  zstandard package is installed).
+
+Request bodies may likewise be gzip/zstd compressed (Content-Encoding) and
+MessagePack encoded (Content-Type) - see SyncRoute.
+
+msgpack and zstandard are in requirements.txt but imported optionally, so a
+trimmed install still serves plain JSON + gzip.
+"""
+import gzip
+import io
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from app.core.config import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+
+# Server preference among equally weighted codings
+CODING_PREFERENCE = ["zstd", "gzip"]
+
+# Fixed leading columns of a columnar change block
+CHANGE_COLUMNS = ["entity_id", "action", "seq", "updated_at", "fields"]
+
+
+def parse_accept(header: Optional[str]) -> List[Tuple[str, float]]:
+    """(value, q) pairs of an Accept / Accept-Encoding header"""
+    ranked = []
+    for part in (header or "").split(","):
+        value, *params = [piece.strip() for piece in part.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranked.append((value.lower(), q))
+    return ranked
+
+
+def available_codings() -> List[str]:
+    return [coding for coding in CODING_PREFERENCE if coding != "zstd" or zstandard]
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """MessagePack only when asked for (and installed); JSON otherwise"""
+    for media_type, q in sorted(parse_accept(accept), key=lambda item: -item[1]):
+        if q <= 0:
+            continue
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack:
+            return MEDIA_MSGPACK
+        if media_type in (MEDIA_JSON, "application/*", "*/*"):
+            return MEDIA_JSON
+    return MEDIA_JSON
+
+
+def negotiate_content_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported coding the client accepts, or None for identity"""
+    weights = dict(parse_accept(accept_encoding))
+    if "x-gzip" in weights:
+        weights.setdefault("gzip", weights["x-gzip"])
+    
+    candidates = []
+    for coding in available_codings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > 0:
+            candidates.append((-q, CODING_PREFERENCE.index(coding), coding))
+    return min(candidates)[2] if candidates else None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    raise ValueError(f"Unsupported content encoding: {coding}")
+
+
+def decompress(body: bytes, coding: str, max_size: int) -> bytes:
+    """Decompress a request body, refusing to inflate past max_size"""
+    if coding in ("gzip", "x-gzip"):
+        reader = gzip.GzipFile(fileobj=io.BytesIO(body))
+    elif coding == "zstd" and zstandard:
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+    else:
+        raise ValueError(f"Unsupported content encoding: {coding}")
+    
+    data = reader.read(max_size + 1)
+    if len(data) > max_size:
+        raise ValueError("Decompressed body too large")
+    return data
+
+
+def columnar_changes(changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Pack changes into blocks of rows sharing an entity type and field set
+    
+    {"type": "product", "columns": [entity_id, action, seq, updated_at,
+    fields, name, sale_price, ...], "rows": [[...], ...]}
+    """
+    blocks: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+    for change in changes:
+        data = change.get("data") or {}
+        key = (change["type"], tuple(data))
+        block = blocks.get(key)
+        if block is None:
+            block = blocks[key] = {
+                "type": change["type"],
+                "columns": CHANGE_COLUMNS + list(data),
+                "rows": []
+            }
+        block["rows"].append(
+            [change.get(column) for column in CHANGE_COLUMNS] + list(data.values())
+        )
+    return list(blocks.values())
+
+
+def encode_sync_response(
+    request: Request,
+    content: Dict[str, Any],
+    columnar_key: Optional[str] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Encode a sync payload as negotiated by the request
+    
+    columnar_key names the change list to pack into columnar blocks when
+    MessagePack is used (the response then carries "layout": "columnar").
+    """
+    content = jsonable_encoder(content)
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    
+    if media_type == MEDIA_MSGPACK:
+        if columnar_key and columnar_key in content:
+            content[columnar_key] = columnar_changes(content[columnar_key])
+            content["layout"] = "columnar"
+        body = msgpack.packb(content, use_bin_type=True)
+    else:
+        body = json.dumps(content, separators=(",", ":")).encode()
+    
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    coding = negotiate_content_encoding(request.headers.get("accept-encoding"))
+    if coding and len(body) >= settings.SYNC_COMPRESS_MIN_BYTES:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+async def decode_request_body(request: Request) -> Request:
+    """
+    Rewrite a compressed and/or MessagePack request as plain JSON
+    
+    The endpoint then validates the body with its usual Pydantic schema.
+    Raises HTTPException 413/415 for oversized or unsupported bodies.
+    """
+    coding = (request.headers.get("content-encoding") or "identity").strip().lower()
+    media_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    body = await request.body()
+    
+    if coding != "identity":
+        try:
+            body = decompress(body, coding, settings.SYNC_MAX_REQUEST_BYTES)
+        except ValueError as e:
+            status_code = 413 if "too large" in str(e) else 415
+            raise HTTPException(status_code=status_code, detail=str(e))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Corrupt compressed body")
+    
+    if media_type in MSGPACK_MEDIA_TYPES:
+        if not msgpack:
+            raise HTTPException(status_code=415, detail="MessagePack is not supported by this server")
+        try:
+            body = json.dumps(jsonable_encoder(msgpack.unpackb(body, raw=False, timestamp=3))).encode()
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid MessagePack body")
+    
+    headers = [
+        (name, value) for name, value in request.scope["headers"]
+        if name not in (b"content-encoding", b"content-type", b"content-length")
+    ]
+    headers += [(b"content-type", MEDIA_JSON.encode()), (b"content-length", str(len(body)).encode())]
+    
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    return Request(dict(request.scope, headers=headers), receive)
+
+
+class SyncRoute(APIRoute):
+    """Route class accepting gzip/zstd compressed and MessagePack request bodies"""
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        
+        async def route_handler(request: Request) -> Response:
+            coding = (request.headers.get("content-encoding") or "identity").strip().lower()
+            media_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+            if coding != "identity" or media_type in MSGPACK_MEDIA_TYPES:
+                request = await decode_request_body(request)
+            return await handler(request)
+        
+        return route_handler
@@ -0,0 +1,52 @@
+"""
+Background worker pool that runs queued sync push jobs
+"""
+import asyncio
+from typing import List, Optional
+from app.core.config import settings
+from app.services.sync_job_service import process_next_push_job, set_sync_push_wake_callback
+
+_workers: List[asyncio.Task] = []
+_wake_event: Optional[asyncio.Event] = None
+
+
+async def sync_push_worker(worker_id: int):
+    """Run push jobs until cancelled; sleeps when there are none"""
+    while True:
+        try:
+            # DB work is blocking - keep it off the event loop
+            ran = await asyncio.to_thread(process_next_push_job)
+            if ran:
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Sync push worker {worker_id} error: {e}")
+        
+        _wake_event.clear()
+        try:
+            await asyncio.wait_for(_wake_event.wait(), timeout=settings.SYNC_PUSH_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_sync_push_workers():
+    """Start the worker pool (call from app startup, inside the event loop)"""
+    global _wake_event
+    loop = asyncio.get_running_loop()
+    _wake_event = asyncio.Event()
+    
+    # Jobs are created in threadpool threads, so wake the loop thread-safely
+    set_sync_push_wake_callback(lambda: loop.call_soon_threadsafe(_wake_event.set))
+    
+    for worker_id in range(settings.SYNC_PUSH_WORKERS):
+        _workers.append(asyncio.create_task(sync_push_worker(worker_id)))
+
+
+async def stop_sync_push_workers():
+    """Cancel the worker pool (call from app shutdown)"""
+    set_sync_push_wake_callback(None)
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -3,7 +3,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api import auth, stock, invoice, business, inventory, supplier, purchase, dashboard, quick_sell, activity, profile, analytics, backup, stock_search, stock_analytics, stock_import, payment, expense, cashbook, credit, reports, permissions, invite, staff, branch, pos, sync, stock_take, subscription, customers
 from app.api.admin import businesses as admin_businesses, stats as admin_stats, subscriptions as admin_subscriptions
 from app.api import websocket
+from app.api.websocket import manager as realtime_manager
 from app.core.config import settings
+from app.core.outbox_worker import start_outbox_workers, stop_outbox_workers
+from app.core.scheduler import start_snapshot_task, stop_snapshot_task
+from app.core.sync_push_worker import start_sync_push_workers, stop_sync_push_workers
+from app.services.event_service import bind_event_loop
+import asyncio
 
 app = FastAPI(
     title="SOSY API",
@@ -57,6 +63,23 @@ app.include_router(admin_subscriptions.router, prefix="", tags=["admin"])
 app.include_router(websocket.router, prefix="", tags=["websocket"])
 
 
+@app.on_event("startup")
+async def startup():
+    bind_event_loop(asyncio.get_running_loop())
+    await realtime_manager.start()
+    start_outbox_workers()
+    start_sync_push_workers()
+    start_snapshot_task()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_snapshot_task()
+    await stop_sync_push_workers()
+    await stop_outbox_workers()
+    await realtime_manager.stop()
+
+
 @app.get("/")
 async def root():
     return {"message": "SOSY API", "version": "0.1.0"}
@@ -17,7 +17,7 @@ from app.models.branch import Branch
 from app.models.invite import Invite
 from app.models.subscription import SubscriptionPlan, UserSubscription, PaymentTransaction
 from app.models.pos import Sale, SaleItem, POSSession
-from app.models.sync import SyncState, SyncAction
+from app.models.sync import SyncState, SyncAction, SyncPushJob
 from app.models.stock_take import StockTakeSession, StockTakeLine, StockAdjustment
 from app.models.customer import Customer
 from app.models.customer_credit import CustomerCreditEntry
@@ -27,6 +27,9 @@ from app.models.sync_event import SyncEvent
 from app.models.sync_error import SyncError
 from app.models.business_metrics import BusinessMetricsDaily
 from app.models.system_health import SystemHealth
+from app.models.document_sequence import DocumentSequence
+from app.models.outbox import OutboxMessage
+from app.models.change_log import ChangeLog
 
 __all__ = [
     "User",
@@ -57,6 +60,7 @@ __all__ = [
     "POSSession",
     "SyncState",
     "SyncAction",
+    "SyncPushJob",
     "StockTakeSession",
     "StockTakeLine",
     "StockAdjustment",
@@ -68,5 +72,8 @@ __all__ = [
     "SyncError",
     "BusinessMetricsDaily",
     "SystemHealth",
+    "DocumentSequence",
+    "OutboxMessage",
+    "ChangeLog",
 ]
 
@@ -0,0 +1,29 @@
+"""
+Per-business change log behind cursor-based /sync/pull
+"""
+from sqlalchemy import text
+from sqlmodel import SQLModel, Field, UniqueConstraint, Column, JSON, Index
+from typing import Optional, List
+from datetime import datetime
+
+
+class ChangeLog(SQLModel, table=True):
+    """One row per entity change, numbered by a gapless per-business sequence"""
+    __tablename__ = "changelog"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    seq: Optional[int] = None  # Monotonic per business, assigned at commit; pull cursors point at a seq
+    entity_type: str  # product, stock, sale
+    entity_id: int  # Product id for product/stock, sale id for sale
+    action: str = Field(default="updated")  # created, updated, deleted
+    fields: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))  # Changed model fields; None = all
+    device_id: Optional[str] = None  # Device whose sync push made the change; its own pulls skip it
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Pulls read "seq > cursor" per business in order; the commit hook finds
+    # its transaction's entries that are still unnumbered
+    __table_args__ = (
+        UniqueConstraint("business_id", "seq", name="uq_changelog_business_seq"),
+        Index("ix_changelog_business_id_unsequenced", "business_id", postgresql_where=text("seq IS NULL")),
+    )
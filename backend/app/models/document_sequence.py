@@ -0,0 +1,23 @@
+"""
+Document number sequences (invoices, purchases, quick-sell receipts)
+"""
+from sqlmodel import SQLModel, Field, UniqueConstraint
+from typing import Optional
+from datetime import datetime
+
+
+class DocumentSequence(SQLModel, table=True):
+    """Last issued number per business, document type and period"""
+    __tablename__ = "documentsequence"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    doc_type: str  # invoice, purchase
+    period: str  # YYYYMMDD for daily sequences
+    last_value: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Upsert target for atomic increments
+    __table_args__ = (
+        UniqueConstraint("business_id", "doc_type", "period", name="uq_document_sequence"),
+    )
@@ -16,6 +16,7 @@ class InventoryMovement(SQLModel, table=True):
     reference: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    client_movement_id: Optional[str] = Field(default=None, unique=True, index=True)  # Offline client's id; a delta applies once
     
     product: Optional["Product"] = Relationship(back_populates="movements")
     user: Optional["User"] = Relationship()
@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 
@@ -8,6 +8,12 @@ if TYPE_CHECKING:
 
 class StockItem(SQLModel, table=True):
     __tablename__ = "stockitem"
+    # One row per product and location: the authoritative stock level,
+    # changed only by atomic UPDATE / upsert (see inventory_service)
+    __table_args__ = (
+        UniqueConstraint("product_id", "location", name="uq_stockitem_product_location"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     product_id: int = Field(foreign_key="product.id", index=True)
     quantity: float = Field(default=0.0)
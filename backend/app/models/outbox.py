@@ -0,0 +1,35 @@
+"""
+Transactional outbox for side effects of business transactions
+"""
+from sqlmodel import SQLModel, Field, Column, JSON, Index
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+
+class OutboxMessage(SQLModel, table=True):
+    """
+    Side effect recorded in the same transaction as the change that caused it
+    
+    Background workers drain pending messages (see app/core/outbox_worker.py).
+    """
+    __tablename__ = "outboxmessage"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(index=True)
+    topic: str = Field(index=True)  # activity_log, credit_entry, loyalty_accrual, sync_event
+    payload: Dict[str, Any] = Field(default={}, sa_column=Column(JSON))
+    
+    # Delivery state
+    status: str = Field(default="pending")  # pending, done, failed
+    attempts: int = Field(default=0)
+    available_at: datetime = Field(default_factory=datetime.utcnow)  # Not retried before this time
+    last_error: Optional[str] = None
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
+    
+    # Workers poll pending messages that are due
+    __table_args__ = (
+        Index("ix_outboxmessage_status_available_at", "status", "available_at"),
+    )
@@ -1,8 +1,8 @@
 """
 Sync models for offline-first multi-device synchronization
 """
-from sqlmodel import SQLModel, Field, Relationship, Column, JSON
-from typing import Optional, Dict, Any, TYPE_CHECKING
+from sqlmodel import SQLModel, Field, Relationship, Column, JSON, Index, UniqueConstraint
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
 from datetime import datetime
 
 if TYPE_CHECKING:
@@ -17,6 +17,7 @@ class SyncState(SQLModel, table=True):
     device_id: Optional[str] = None  # Optional device identifier
     last_sync_at: Optional[datetime] = None
     last_pull_at: Optional[datetime] = None
+    last_pull_seq: Optional[int] = None  # Change-log position of the last cursor pull
     sync_version: int = Field(default=1)  # Increment on schema changes
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -28,8 +29,8 @@ class SyncAction(SQLModel, table=True):
     """Server-side log of sync actions (for debugging and recovery)"""
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
-    action_id: str = Field(index=True)  # Client-generated UUID
-    action_type: str  # sale, stock_update, product_update, invoice
+    action_id: str = Field(index=True, unique=True)  # Client-generated UUID (idempotency key)
+    action_type: str  # sale, stock_delta, stock_update, product_update, invoice
     payload: Dict[str, Any] = Field(default={}, sa_column=Column(JSON))
     status: str = Field(default="pending")  # pending, processed, failed
     error_message: Optional[str] = None
@@ -38,3 +39,44 @@ class SyncAction(SQLModel, table=True):
     
     user: Optional["User"] = Relationship()
 
+
+class SyncPushJob(SQLModel, table=True):
+    """
+    A /sync/push accepted for background processing
+    
+    Workers claim queued jobs (see app/core/sync_push_worker.py) and apply
+    the actions with process_sync_actions; clients poll the job for
+    per-action results.
+    """
+    __tablename__ = "syncpushjob"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: str = Field(index=True, unique=True)  # Public id returned to the client
+    user_id: int = Field(foreign_key="user.id")
+    business_id: int = Field(foreign_key="business.id", index=True)
+    device_id: Optional[str] = None
+    idempotency_key: Optional[str] = None  # Idempotency-Key header, unique per user
+    fingerprint: str = Field(index=True)  # Hash of the action ids; dedupes retries of an unfinished push
+    actions: List[Dict[str, Any]] = Field(default=[], sa_column=Column(JSON))
+    
+    # Progress and results
+    status: str = Field(default="queued")  # queued, running, done, failed
+    total_actions: int = Field(default=0)
+    completed_actions: int = Field(default=0)
+    processed_ids: List[str] = Field(default=[], sa_column=Column(JSON))
+    failed_ids: List[str] = Field(default=[], sa_column=Column(JSON))
+    errors: Dict[str, str] = Field(default={}, sa_column=Column(JSON))
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None  # Refreshed by the worker after each chunk; stale = abandoned
+    finished_at: Optional[datetime] = None
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_syncpushjob_user_idempotency_key"),
+        # Workers poll the oldest queued job
+        Index("ix_syncpushjob_status_id", "status", "id"),
+    )
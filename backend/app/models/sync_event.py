@@ -1,7 +1,7 @@
 """
 Real-time sync events for event-driven architecture
 """
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlmodel import SQLModel, Field, Column, JSON, Index
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -23,4 +23,8 @@ class SyncEvent(SQLModel, table=True):
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     processed_at: Optional[datetime] = None
-
+    
+    # WebSocket resume reads "events after id N" per business
+    __table_args__ = (
+        Index("ix_syncevent_business_id_id", "business_id", "id"),
+    )
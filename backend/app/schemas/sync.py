@@ -8,7 +8,7 @@ from datetime import datetime
 
 class SyncActionRequest(BaseModel):
     id: str  # Client-generated UUID
-    type: str  # sale, stock_update, product_update, invoice
+    type: str  # sale, stock_delta, stock_update, product_update, invoice
     payload: Dict[str, Any]
     created_at: datetime
 
@@ -25,16 +25,35 @@ class SyncPushResponse(BaseModel):
     errors: Dict[str, str] = {}
 
 
+class SyncPushJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, done, failed
+    success: Optional[bool] = None  # Set once the job has finished
+    total_actions: int
+    completed_actions: int = 0
+    processed_ids: List[str] = []
+    failed_ids: List[str] = []
+    errors: Dict[str, str] = {}
+    error: Optional[str] = None  # Why the whole job failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None  # Last progress report from the worker
+    finished_at: Optional[datetime] = None
+
+
 class SyncChange(BaseModel):
     type: str  # product, stock, sale, invoice
     entity_id: int
     data: Dict[str, Any]
     updated_at: datetime
     action: str  # created, updated, deleted
+    seq: Optional[int] = None  # Change-log position (cursor pulls only)
+    fields: Optional[List[str]] = None  # Partial update: only these data keys changed
 
 
 class SyncPullResponse(BaseModel):
     server_time: datetime
     changes: List[SyncChange]
     has_more: bool = False
+    cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
 
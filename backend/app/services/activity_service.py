@@ -2,7 +2,7 @@
 Enhanced activity logging service
 """
 from sqlmodel import Session
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from app.models.activity_log import ActivityLog
 
@@ -15,7 +15,8 @@ def log_activity(
     user_id: Optional[int] = None,
     entity_type: Optional[str] = None,
     entity_id: Optional[int] = None,
-    meta_data: Optional[Dict[str, Any]] = None
+    meta_data: Optional[Dict[str, Any]] = None,
+    commit: bool = True
 ) -> ActivityLog:
     """
     Log an activity
@@ -29,7 +30,8 @@ def log_activity(
         entity_type: Type of entity affected (invoice, item, stock, etc.)
         entity_id: ID of entity affected
         meta_data: Additional metadata
-        
+        commit: Commit immediately (False = add to the caller's transaction)
+    
     Returns:
         ActivityLog object
     """
@@ -44,11 +46,32 @@ def log_activity(
         timestamp=datetime.utcnow()
     )
     session.add(activity)
-    session.commit()
-    session.refresh(activity)
+    if commit:
+        session.commit()
+        session.refresh(activity)
     return activity
 
 
+def log_activities(
+    session: Session,
+    activities: List[Dict[str, Any]],
+    commit: bool = True
+) -> List[ActivityLog]:
+    """
+    Log many activities in one batch
+    
+    Each entry holds log_activity's keyword arguments (business_id,
+    action_type, description and the optional ones). The rows are added
+    together and flushed as a single multi-row insert.
+    """
+    now = datetime.utcnow()
+    logs = [ActivityLog(timestamp=now, **activity) for activity in activities]
+    session.add_all(logs)
+    if commit:
+        session.commit()
+    return logs
+
+
 # Convenience functions for common actions
 def log_invoice_created(
     session: Session,
@@ -133,6 +156,25 @@ def log_item_price_changed(
     )
 
 
+def stock_adjusted_activity(
+    business_id: int,
+    product_id: int,
+    product_name: str,
+    adjustment: float,
+    user_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """log_activity arguments for a stock adjustment (see log_activities)"""
+    return {
+        "business_id": business_id,
+        "action_type": "stock_adjusted",
+        "description": f"Adjusted stock of {product_name} by {adjustment:+}",
+        "user_id": user_id,
+        "entity_type": "stock",
+        "entity_id": product_id,
+        "meta_data": {"adjustment": adjustment}
+    }
+
+
 def log_stock_adjusted(
     session: Session,
     business_id: int,
@@ -144,13 +186,7 @@ def log_stock_adjusted(
     """Log stock adjustment"""
     return log_activity(
         session=session,
-        business_id=business_id,
-        action_type="stock_adjusted",
-        description=f"Adjusted stock of {product_name} by {adjustment:+}",
-        user_id=user_id,
-        entity_type="stock",
-        entity_id=product_id,
-        meta_data={"adjustment": adjustment}
+        **stock_adjusted_activity(business_id, product_id, product_name, adjustment, user_id)
     )
 
 
@@ -159,7 +195,8 @@ def log_purchase_created(
     business_id: int,
     purchase_id: int,
     purchase_number: str,
-    user_id: Optional[int] = None
+    user_id: Optional[int] = None,
+    commit: bool = True
 ):
     """Log purchase creation"""
     return log_activity(
@@ -170,7 +207,8 @@ def log_purchase_created(
         user_id=user_id,
         entity_type="purchase",
         entity_id=purchase_id,
-        meta_data={"purchase_number": purchase_number}
+        meta_data={"purchase_number": purchase_number},
+        commit=commit
     )
 
 
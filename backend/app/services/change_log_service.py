@@ -0,0 +1,201 @@
+"""
+Change log service: the per-business change feed read by /sync/pull
+
+Writers call record_change()/record_changes() inside the transaction that
+changes the entity. The entries are inserted without a seq; numbering is
+the last step before the commit (a before_commit hook), from the same
+atomic DocumentSequence upsert used for document numbers. Sequences are
+therefore gapless per business, and because the sequence row stays locked
+from numbering until the commit, changes become visible in seq order - a
+reader that has seen seq N can never later find a committed change below
+N. Pulls are simply "seq > cursor ORDER BY seq LIMIT n".
+
+The sequence row is only held for that final step, not for the writer's
+whole transaction: concurrent checkouts, purchases, imports and sync pushes
+of a business don't queue behind each other's change-log entries, and the
+change log is always the last shared row a transaction locks.
+
+In-process caches that mirror these entities register a commit listener:
+it gets the business and the changed entity ids once the transaction that
+recorded them has committed (e.g. the product search index).
+"""
+import base64
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select, func
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from app.models.change_log import ChangeLog
+from app.services.document_numbering import allocate_sequence
+
+# Entity types
+CHANGE_PRODUCT = "product"
+CHANGE_STOCK = "stock"
+CHANGE_SALE = "sale"
+
+# DocumentSequence doc_type/period holding each business's last seq
+CHANGE_LOG_SEQUENCE = "changelog"
+CHANGE_LOG_PERIOD = ""
+
+CURSOR_VERSION = "v1"
+
+# session.info key collecting {business_id: {entity_type: {entity_id}}} until commit
+PENDING_CHANGES_KEY = "change_log_pending"
+
+# session.info key of the businesses with entries still to be numbered at commit
+UNSEQUENCED_KEY = "change_log_unsequenced"
+
+_commit_listeners: List[Callable[[int, Dict[str, Set[int]]], None]] = []
+
+
+def add_commit_listener(callback: Callable[[int, Dict[str, Set[int]]], None]) -> None:
+    """Call callback(business_id, {entity_type: entity_ids}) after each commit that recorded changes"""
+    _commit_listeners.append(callback)
+
+
+@event.listens_for(OrmSession, "before_commit")
+def _assign_sequences(session) -> None:
+    """
+    Number this transaction's new entries, right before it commits
+    
+    Entries rolled back with a savepoint are simply gone, so only the rows
+    that will commit take a seq. Businesses are numbered in id order.
+    """
+    if session.in_nested_transaction():
+        return  # Releasing a savepoint; the outer commit numbers the entries
+    business_ids = session.info.pop(UNSEQUENCED_KEY, None)
+    if not business_ids:
+        return
+    
+    session.flush()
+    table = ChangeLog.__table__
+    for business_id in sorted(business_ids):
+        unsequenced = (table.c.business_id == business_id, table.c.seq.is_(None))
+        count = session.execute(select(func.count()).select_from(table).where(*unsequenced)).scalar_one()
+        if not count:
+            continue
+        
+        first_seq = allocate_sequence(session, business_id, CHANGE_LOG_SEQUENCE, CHANGE_LOG_PERIOD, count) - count + 1
+        numbered = (
+            select(table.c.id, (func.row_number().over(order_by=table.c.id) + (first_seq - 1)).label("seq"))
+            .where(*unsequenced)
+            .subquery()
+        )
+        session.execute(update(table).where(table.c.id == numbered.c.id).values(seq=numbered.c.seq))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _notify_commit_listeners(session) -> None:
+    pending = session.info.pop(PENDING_CHANGES_KEY, None)
+    if not pending:
+        return
+    for business_id, entities in pending.items():
+        for callback in _commit_listeners:
+            try:
+                callback(business_id, entities)
+            except Exception as e:
+                # Listeners only drop caches; never fail the committed write
+                print(f"Change log commit listener failed: {e}")
+
+
+def record_changes(
+    session: Session,
+    business_id: int,
+    changes: List[Tuple],
+    device_id: Optional[str] = None
+) -> List[ChangeLog]:
+    """
+    Append entries, numbered when the transaction commits
+    
+    Each change is (entity_type, entity_id, action) or
+    (entity_type, entity_id, action, fields) where fields lists the changed
+    model fields. device_id tags entries with the device that pushed them so
+    that device's pulls can leave them out. Joins the caller's transaction
+    (never commits); the returned entries have no seq until it commits.
+    """
+    if not changes:
+        return []
+    
+    entries = [
+        ChangeLog(
+            business_id=business_id,
+            entity_type=change[0],
+            entity_id=change[1],
+            action=change[2],
+            fields=list(change[3]) if len(change) > 3 and change[3] is not None else None,
+            device_id=device_id
+        )
+        for change in changes
+    ]
+    session.add_all(entries)
+    session.info.setdefault(UNSEQUENCED_KEY, set()).add(business_id)
+    
+    if _commit_listeners:
+        # Rolled-back changes may linger until the next commit; listeners
+        # then only refresh a little more than needed
+        pending = session.info.setdefault(PENDING_CHANGES_KEY, {}).setdefault(business_id, {})
+        for change in changes:
+            pending.setdefault(change[0], set()).add(change[1])
+    return entries
+
+
+def record_change(
+    session: Session,
+    business_id: int,
+    entity_type: str,
+    entity_id: int,
+    action: str = "updated",
+    fields: Optional[Sequence[str]] = None,
+    device_id: Optional[str] = None
+) -> ChangeLog:
+    """Append a single entry (joins the caller's transaction)"""
+    return record_changes(session, business_id, [(entity_type, entity_id, action, fields)], device_id)[0]
+
+
+def get_change_page(
+    session: Session,
+    business_id: int,
+    after_seq: int,
+    limit: int
+) -> Tuple[List[ChangeLog], bool]:
+    """Entries after a seq, oldest first; returns (entries, has_more)"""
+    statement = (
+        select(ChangeLog)
+        .where(ChangeLog.business_id == business_id, ChangeLog.seq > after_seq)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+    )
+    entries = list(session.exec(statement).all())
+    return entries[:limit], len(entries) > limit
+
+
+def get_head_seq(session: Session, business_id: int) -> int:
+    """Latest committed seq of a business (0 when it has no changes yet)"""
+    statement = select(func.max(ChangeLog.seq)).where(ChangeLog.business_id == business_id)
+    return session.exec(statement).one() or 0
+
+
+def encode_cursor(business_id: int, seq: int) -> str:
+    """Opaque pull cursor for a change-log position"""
+    raw = f"{CURSOR_VERSION}:{business_id}:{seq}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], business_id: int) -> int:
+    """
+    Change-log position from a cursor (0 for none)
+    
+    Raises ValueError for malformed cursors or cursors of another business.
+    """
+    if not cursor:
+        return 0
+    
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, cursor_business_id, seq = base64.urlsafe_b64decode(padded).decode().split(":")
+        cursor_business_id, seq = int(cursor_business_id), int(seq)
+    except Exception:
+        raise ValueError("Invalid sync cursor")
+    
+    if version != CURSOR_VERSION or cursor_business_id != business_id or seq < 0:
+        raise ValueError("Invalid sync cursor")
+    return seq
@@ -2,7 +2,7 @@
 Conflict resolution service for concurrent operations
 """
 from sqlmodel import Session
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from app.models.sync_error import SyncError
 
@@ -22,32 +22,27 @@ def resolve_stock_conflict(
     Strategy: Last write wins, but log conflicts
     """
     from app.models.product import Product
+    from app.services.inventory_service import calculate_stock
     
-    # Get product with lock
-    from sqlmodel import select
-    statement = select(Product).where(
-        Product.id == product_id,
-        Product.business_id == business_id
-    ).with_for_update()
-    
-    product = session.exec(statement).first()
-    
-    if not product:
+    product = session.get(Product, product_id)
+    if not product or product.business_id != business_id:
         return False, "Product not found"
     
-    # Check if stock is sufficient
-    if product.current_stock < requested_quantity:
+    # Advisory check only - the sale itself takes stock with a conditional
+    # decrement, so no lock is held here
+    available = calculate_stock(session, product_id)
+    if available < requested_quantity:
         # Log conflict
         log_sync_error(
             session,
             business_id,
             user_id,
             "conflict",
-            f"Insufficient stock: requested {requested_quantity}, available {product.current_stock}",
-            {"product_id": product_id, "requested": requested_quantity, "available": product.current_stock},
+            f"Insufficient stock: requested {requested_quantity}, available {available}",
+            {"product_id": product_id, "requested": requested_quantity, "available": available},
             device_id
         )
-        return False, f"Insufficient stock. Available: {product.current_stock}"
+        return False, f"Insufficient stock. Available: {available}"
     
     return True, None
 
@@ -123,3 +118,15 @@ def log_sync_error(
     
     return error
 
+
+def log_sync_errors(session: Session, errors: List[Dict[str, Any]]) -> List[SyncError]:
+    """
+    Log many sync errors in the caller's transaction (never commits)
+    
+    Each dict holds SyncError fields; rows go out in one flush, so a push
+    reporting many conflicts costs one batched INSERT instead of a commit
+    per error.
+    """
+    rows = [SyncError(**error) for error in errors]
+    session.add_all(rows)
+    return rows
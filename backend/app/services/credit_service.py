@@ -13,12 +13,14 @@ def add_credit_entry(
     session: Session,
     business_id: int,
     user_id: int,
-    credit_data: CreditEntryCreate
+    credit_data: CreditEntryCreate,
+    commit: bool = True
 ) -> CustomerCreditEntry:
     """
     Add a credit entry (sale on credit) and update customer balance
     
-    This is atomic - balance update happens in the same transaction
+    This is atomic - balance update happens in the same transaction.
+    Pass commit=False to make the entry part of the caller's transaction.
     """
     customer = session.get(Customer, credit_data.customer_id)
     if not customer or customer.business_id != business_id:
@@ -50,8 +52,9 @@ def add_credit_entry(
     
     session.add(credit_entry)
     session.add(customer)
-    session.commit()
-    session.refresh(credit_entry)
+    if commit:
+        session.commit()
+        session.refresh(credit_entry)
     
     return credit_entry
 
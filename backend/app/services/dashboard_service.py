@@ -131,9 +131,11 @@ def get_top_products_7_days(session: Session, business_id: int, limit: int = 5)
                 "quantity_sold": 0.0,
                 "revenue": 0.0  # We don't have revenue from movements, but can estimate
             }
-        product_sales[product.id]["quantity_sold"] += movement.quantity
+        # POS checkout stores sales as negative quantities, quick sell as positive
+        quantity = abs(movement.quantity)
+        product_sales[product.id]["quantity_sold"] += quantity
         # Estimate revenue using selling price
-        product_sales[product.id]["revenue"] += movement.quantity * product.selling_price
+        product_sales[product.id]["revenue"] += quantity * product.selling_price
     
     # Sort by quantity sold and return top N
     sorted_products = sorted(
@@ -1,11 +1,14 @@
 """
 Event service for real-time sync events
 """
-from sqlmodel import Session
-from typing import Dict, Any, Optional
+from sqlmodel import Session, select, func
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from app.models.sync_event import SyncEvent
 
+# Server event loop (bound at startup) for broadcasts from worker threads
+_event_loop = None
+
 
 def emit_sync_event(
     session: Session,
@@ -14,12 +17,17 @@ def emit_sync_event(
     payload: Dict[str, Any],
     branch_id: Optional[int] = None,
     user_id: Optional[int] = None,
-    device_id: Optional[str] = None
+    device_id: Optional[str] = None,
+    commit: bool = True
 ) -> SyncEvent:
     """
     Emit a sync event for real-time propagation
     
-    Events are stored in DB and should be broadcast via WebSocket/Redis
+    Events are stored in DB and should be broadcast via WebSocket/Redis.
+    
+    With commit=False the event only joins the caller's transaction and is
+    NOT broadcast - call publish_sync_event() once the caller has committed,
+    so clients never hear about data that could still be rolled back.
     """
     event = SyncEvent(
         business_id=business_id,
@@ -31,25 +39,91 @@ def emit_sync_event(
     )
     
     session.add(event)
+    if not commit:
+        return event
+    
     session.commit()
     session.refresh(event)
     
-    # Broadcast via WebSocket (non-blocking)
+    publish_sync_event(business_id, event_type, payload, branch_id=branch_id, event_id=event.id)
+    
+    return event
+
+
+def bind_event_loop(loop) -> None:
+    """Remember the server's event loop so worker threads can broadcast"""
+    global _event_loop
+    _event_loop = loop
+
+
+def publish_sync_event(
+    business_id: int,
+    event_type: str,
+    payload: Dict[str, Any],
+    branch_id: Optional[int] = None,
+    event_id: Optional[int] = None
+) -> None:
+    """
+    Broadcast an already-committed sync event via WebSocket (non-blocking)
+    
+    Safe to call from the event loop, from threadpool/outbox worker threads
+    (hands off to the bound loop) and from plain scripts. Product and stock
+    events also refresh this worker's search index.
+    """
+    try:
+        from app.services.search_index import on_sync_event
+        
+        on_sync_event(business_id, event_type, payload)
+    except Exception as e:
+        print(f"Failed to update search index: {e}")
+    
     try:
         from app.api.websocket import broadcast_sync_event
         import asyncio
         
-        # Run async broadcast in background
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            asyncio.create_task(broadcast_sync_event(business_id, event_type, payload))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        broadcast = broadcast_sync_event(
+            business_id,
+            event_type,
+            payload,
+            branch_id=branch_id,
+            event_id=event_id
+        )
+        if loop:
+            loop.create_task(broadcast)
+        elif _event_loop and _event_loop.is_running():
+            asyncio.run_coroutine_threadsafe(broadcast, _event_loop)
         else:
-            loop.run_until_complete(broadcast_sync_event(business_id, event_type, payload))
+            asyncio.run(broadcast)
     except Exception as e:
         # Don't fail if WebSocket broadcast fails
         print(f"Failed to broadcast sync event: {e}")
-    
-    return event
+
+
+def get_events_after(
+    session: Session,
+    business_id: int,
+    after_event_id: int,
+    limit: int
+) -> List[SyncEvent]:
+    """Events of a business with id > after_event_id, oldest first (uses ix_syncevent_business_id_id)"""
+    statement = (
+        select(SyncEvent)
+        .where(SyncEvent.business_id == business_id, SyncEvent.id > after_event_id)
+        .order_by(SyncEvent.id)
+        .limit(limit)
+    )
+    return list(session.exec(statement).all())
+
+
+def get_latest_event_id(session: Session, business_id: int) -> int:
+    """Id of the newest event of a business (0 if none)"""
+    statement = select(func.max(SyncEvent.id)).where(SyncEvent.business_id == business_id)
+    return session.exec(statement).one() or 0
 
 
 # Event type constants
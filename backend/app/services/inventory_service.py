@@ -1,14 +1,22 @@
-from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel import Session, select, update, func, case
+from sqlalchemy import Float, Integer, column, values
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from app.models.product import Product
 from app.models.inventory_stock import StockItem
 from app.models.inventory_movement import InventoryMovement
 from app.schemas.product import ProductCreate
 from app.schemas.inventory_movement import InventoryMovementCreate
-from app.services.activity_service import log_item_created, log_stock_adjusted
+from app.services.activity_service import log_item_created, log_activities, stock_adjusted_activity
+from app.services.change_log_service import record_change, record_changes, CHANGE_PRODUCT, CHANGE_STOCK
+from app.services.event_service import EVENT_STOCK_UPDATED
+from app.services.outbox_service import enqueue_product_events, notify_outbox
 
 
+# Rows per round trip when streaming large listings
+ROWS_PER_FETCH = 1000
+
 # Movement types that add to inventory
 ADD_MOVEMENT_TYPES = {"purchase_add", "adjustment_up", "return_in"}
 
@@ -18,6 +26,27 @@ SUBTRACT_MOVEMENT_TYPES = {"sale", "adjustment_down", "return_out"}
 ALL_MOVEMENT_TYPES = ADD_MOVEMENT_TYPES | SUBTRACT_MOVEMENT_TYPES
 
 
+# Product columns a catalog client may select with ?fields=
+PRODUCT_FIELDS = [
+    "id",
+    "business_id",
+    "branch_id",
+    "name",
+    "sku",
+    "barcode",
+    "category",
+    "unit_of_measure",
+    "buying_price",
+    "selling_price",
+    "low_stock_threshold",
+    "reorder_quantity",
+    "supplier_id",
+    "is_active",
+    "created_at",
+    "updated_at",
+]
+
+
 def add_product(session: Session, business_id: int, product_data: ProductCreate, user_id: Optional[int] = None) -> Product:
     """Create a new product"""
     product = Product(**product_data.model_dump(), business_id=business_id)
@@ -32,6 +61,10 @@ def add_product(session: Session, business_id: int, product_data: ProductCreate,
         location="main"
     )
     session.add(stock_item)
+    record_changes(session, business_id, [
+        (CHANGE_PRODUCT, product.id, "created"),
+        (CHANGE_STOCK, product.id, "created")
+    ])
     session.commit()
     
     # Log activity
@@ -50,73 +83,337 @@ def record_movement(
     session: Session,
     product_id: int,
     movement_data: InventoryMovementCreate,
-    user_id: Optional[int] = None
+    user_id: Optional[int] = None,
+    location: str = "main"
 ) -> InventoryMovement:
-    """Record an inventory movement and update stock"""
-    # Validate movement type
-    if movement_data.movement_type not in ALL_MOVEMENT_TYPES:
-        raise ValueError(f"Invalid movement_type: {movement_data.movement_type}")
+    """
+    Record an inventory movement and update stock in one transaction
     
+    Subtractions are clamped at zero (the movement keeps the requested
+    quantity); use decrement_stock where insufficient stock must fail.
+    """
     # Verify product exists
     product = session.get(Product, product_id)
     if not product:
         raise ValueError(f"Product {product_id} not found")
     
-    # Create movement record
-    movement = InventoryMovement(
-        product_id=product_id,
-        movement_type=movement_data.movement_type,
-        quantity=movement_data.quantity,
-        reference=movement_data.reference,
-        user_id=user_id
-    )
-    session.add(movement)
-    session.commit()
+    movement = record_movements(session, product.business_id, [{
+        "product_id": product_id,
+        "movement_type": movement_data.movement_type,
+        "quantity": movement_data.quantity,
+        "reference": movement_data.reference,
+        "location": location
+    }], user_id=user_id)[0]
     session.refresh(movement)
+    return movement
+
+
+def record_movements(
+    session: Session,
+    business_id: int,
+    movements: List[Dict[str, Any]],
+    user_id: Optional[int] = None,
+    branch_id: Optional[int] = None,
+    commit: bool = True,
+    clamp: bool = True
+) -> List[InventoryMovement]:
+    """
+    Record many inventory movements and apply them to stock in bulk
     
-    # Update stock item
-    # Find or create stock item for the product (default location: "main")
-    statement = select(StockItem).where(
-        StockItem.product_id == product_id,
-        StockItem.location == "main"
+    movements: List of {product_id, movement_type, quantity, reference,
+    location} with positive quantities (the type gives the direction);
+    reference and location ("main") are optional.
+    
+    The number of round trips does not grow with the number of lines:
+    products are checked with one IN query, the movements are written as
+    one multi-row INSERT, stock gets one set-based UPDATE per location with
+    the net change per product, and adjustments are logged as one batch.
+    Subtractions are clamped at zero like record_movement unless clamp is
+    False (stock-take approval, whose deltas must land exactly). commit=False
+    joins the caller's transaction; call notify_outbox() after committing
+    so the STOCK_UPDATED events go out right away.
+    """
+    if not movements:
+        return []
+    
+    records = apply_movements(session, business_id, movements, user_id=user_id, branch_id=branch_id, clamp=clamp)
+    
+    product_ids = sorted({movement["product_id"] for movement in movements})
+    record_changes(session, business_id, [(CHANGE_STOCK, product_id, "updated") for product_id in product_ids])
+    enqueue_stock_events(session, business_id, product_ids, branch_id=branch_id, user_id=user_id)
+    
+    adjustments = [movement for movement in movements if movement["movement_type"] in {"adjustment_up", "adjustment_down"}]
+    if adjustments:
+        names = dict(session.exec(
+            select(Product.id, Product.name).where(Product.id.in_({movement["product_id"] for movement in adjustments}))
+        ).all())
+        log_activities(session, [
+            stock_adjusted_activity(
+                business_id,
+                movement["product_id"],
+                names[movement["product_id"]],
+                movement["quantity"] if movement["movement_type"] == "adjustment_up" else -movement["quantity"],
+                user_id
+            )
+            for movement in adjustments
+        ], commit=False)
+    
+    if commit:
+        session.commit()
+        notify_outbox()
+    else:
+        session.flush()
+    return records
+
+
+def enqueue_stock_events(
+    session: Session,
+    business_id: int,
+    product_ids: List[int],
+    branch_id: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> None:
+    """Queue a STOCK_UPDATED event per product with its main-location level (joins the caller's transaction)"""
+    levels = get_stock_levels(session, product_ids, location="main")
+    enqueue_product_events(session, business_id, EVENT_STOCK_UPDATED, [
+        {"product_id": product_id, "stock": levels.get(product_id, 0.0)} for product_id in product_ids
+    ], branch_id=branch_id, user_id=user_id)
+
+
+def apply_movements(
+    session: Session,
+    business_id: int,
+    movements: List[Dict[str, Any]],
+    user_id: Optional[int] = None,
+    branch_id: Optional[int] = None,
+    clamp: bool = True
+) -> List[InventoryMovement]:
+    """
+    Add movements to the session and apply their net change to stock
+    
+    The stock half of record_movements, for callers that must allocate a
+    document number after taking the stock rows (create_purchase). Joins
+    the caller's transaction; the caller records the changes.
+    """
+    for movement in movements:
+        if movement["movement_type"] not in ALL_MOVEMENT_TYPES:
+            raise ValueError(f"Invalid movement_type: {movement['movement_type']}")
+    
+    product_ids = sorted({movement["product_id"] for movement in movements})
+    found = set(session.exec(
+        select(Product.id).where(Product.id.in_(product_ids), Product.business_id == business_id)
+    ).all())
+    for product_id in product_ids:
+        if product_id not in found:
+            raise ValueError(f"Product {product_id} not found")
+    
+    now = datetime.utcnow()
+    records = [
+        InventoryMovement(
+            product_id=movement["product_id"],
+            branch_id=branch_id,
+            movement_type=movement["movement_type"],
+            quantity=movement["quantity"],
+            reference=movement.get("reference"),
+            user_id=user_id,
+            created_at=now
+        )
+        for movement in movements
+    ]
+    session.add_all(records)
+    
+    # Net change per location and product
+    deltas: Dict[str, Dict[int, float]] = {}
+    for movement in movements:
+        sign = 1 if movement["movement_type"] in ADD_MOVEMENT_TYPES else -1
+        location_deltas = deltas.setdefault(movement.get("location") or "main", {})
+        location_deltas[movement["product_id"]] = location_deltas.get(movement["product_id"], 0.0) + sign * movement["quantity"]
+    
+    for location, location_deltas in deltas.items():
+        _apply_location_deltas(session, location, location_deltas, now, clamp=clamp)
+    return records
+
+
+def _apply_location_deltas(
+    session: Session,
+    location: str,
+    deltas: Dict[int, float],
+    now: datetime,
+    clamp: bool = True
+):
+    """Add net deltas to one location's stock rows (clamped at zero if clamp), creating missing rows"""
+    table = StockItem.__table__
+    product_ids = sorted(deltas)
+    
+    # Rows must exist before the UPDATE; existing ones are left alone
+    session.execute(
+        insert(table)
+        .values([
+            {"product_id": product_id, "location": location, "quantity": 0.0, "last_updated": now}
+            for product_id in product_ids
+        ])
+        .on_conflict_do_nothing(index_elements=["product_id", "location"])
     )
-    stock_item = session.exec(statement).first()
     
-    if not stock_item:
-        stock_item = StockItem(
-            product_id=product_id,
-            quantity=0.0,
-            location="main"
+    changes = values(
+        column("product_id", Integer),
+        column("delta", Float),
+        name="changes"
+    ).data([(product_id, deltas[product_id]) for product_id in product_ids])
+    new_quantity = table.c.quantity + changes.c.delta
+    if clamp:
+        new_quantity = case((changes.c.delta < 0, func.greatest(new_quantity, 0.0)), else_=new_quantity)
+    session.execute(
+        update(table)
+        .where(table.c.product_id == changes.c.product_id, table.c.location == location)
+        .values(quantity=new_quantity, last_updated=now)
+    )
+
+
+def decrement_stock(
+    session: Session,
+    product_id: int,
+    quantity: float,
+    location: str = "main"
+) -> Optional[float]:
+    """
+    Take quantity off a location's stock only if that much is on hand
+    
+    One conditional "UPDATE ... SET quantity = quantity - n WHERE quantity
+    >= n RETURNING quantity": the check and the write are a single
+    statement, so concurrent sellers can't oversell or lose an update and
+    nothing is read under SELECT ... FOR UPDATE first. The row stays locked
+    only until the caller commits. Joins the caller's transaction.
+    
+    Returns the new quantity, or None (nothing changed) when stock is short.
+    """
+    return session.execute(
+        update(StockItem)
+        .where(
+            StockItem.product_id == product_id,
+            StockItem.location == location,
+            StockItem.quantity >= quantity
         )
-        session.add(stock_item)
-    
-    # Update quantity based on movement type
-    if movement_data.movement_type in ADD_MOVEMENT_TYPES:
-        stock_item.quantity += movement_data.quantity
-    elif movement_data.movement_type in SUBTRACT_MOVEMENT_TYPES:
-        stock_item.quantity -= movement_data.quantity
-        # Prevent negative stock (optional - you might want to allow this)
-        if stock_item.quantity < 0:
-            stock_item.quantity = 0
-    
-    stock_item.last_updated = datetime.utcnow()
-    session.add(stock_item)
-    session.commit()
-    session.refresh(stock_item)
-    
-    # Log activity for stock adjustments
-    if movement_data.movement_type in {"adjustment_up", "adjustment_down"}:
-        adjustment_amount = movement_data.quantity if movement_data.movement_type == "adjustment_up" else -movement_data.quantity
-        log_stock_adjusted(
-            session=session,
-            business_id=product.business_id,
+        .values(quantity=StockItem.quantity - quantity, last_updated=datetime.utcnow())
+        .returning(StockItem.quantity)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+
+def add_stock(
+    session: Session,
+    product_id: int,
+    delta: float,
+    location: str = "main"
+) -> float:
+    """
+    Add a signed delta to a location's stock, creating the row if needed
+    
+    A single INSERT ... ON CONFLICT (product_id, location) DO UPDATE, so it
+    never reads first. Joins the caller's transaction; returns the new
+    quantity.
+    """
+    table = StockItem.__table__
+    now = datetime.utcnow()
+    return session.execute(
+        insert(table)
+        .values(product_id=product_id, location=location, quantity=delta, last_updated=now)
+        .on_conflict_do_update(
+            index_elements=["product_id", "location"],
+            set_={"quantity": table.c.quantity + delta, "last_updated": now}
+        )
+        .returning(table.c.quantity)
+    ).scalar_one()
+
+
+def apply_stock_delta(
+    session: Session,
+    product_id: int,
+    delta: float,
+    client_movement_id: Optional[str] = None,
+    location: str = "main",
+    movement_type: Optional[str] = None,
+    branch_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    reference: Optional[str] = None
+) -> Optional[float]:
+    """
+    Apply a signed stock change once per client movement id
+    
+    Deltas commute like a counter: the movement is inserted with ON CONFLICT
+    DO NOTHING on client_movement_id (a replay is a no-op) and the stock row
+    is bumped with a single add_stock upsert, so
+    concurrent terminals never read-modify-write or take SELECT ... FOR
+    UPDATE locks. Stock may go negative; the caller decides how to report it.
+    Joins the caller's transaction (never commits).
+    
+    Returns the location's new quantity, or None if the movement was
+    already applied.
+    """
+    if movement_type is None:
+        movement_type = "adjustment_up" if delta >= 0 else "adjustment_down"
+    now = datetime.utcnow()
+    
+    movement_id = session.execute(
+        insert(InventoryMovement.__table__)
+        .values(
             product_id=product_id,
-            product_name=product.name,
-            adjustment=adjustment_amount,
-            user_id=user_id
+            branch_id=branch_id,
+            movement_type=movement_type,
+            quantity=delta,  # Signed, like POS sale movements
+            reference=reference,
+            user_id=user_id,
+            client_movement_id=client_movement_id,
+            created_at=now
         )
+        .on_conflict_do_nothing(index_elements=["client_movement_id"])
+        .returning(InventoryMovement.__table__.c.id)
+    ).scalar_one_or_none()
+    if movement_id is None:
+        return None
     
-    return movement
+    return add_stock(session, product_id, delta, location)
+
+
+def get_catalog_version(session: Session, business_id: int) -> Tuple[int, Optional[datetime]]:
+    """Product count and newest updated_at of a business (one aggregate query)"""
+    count, last_updated = session.exec(
+        select(func.count(Product.id), func.max(Product.updated_at)).where(Product.business_id == business_id)
+    ).one()
+    return count, last_updated
+
+
+def list_product_page(
+    session: Session,
+    business_id: int,
+    fields: List[str],
+    after: Optional[int] = None,
+    limit: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    One page of the catalog as plain dicts of the requested columns
+    
+    Keyset pagination on id: only `fields` (names from PRODUCT_FIELDS) are
+    selected, and rows come back as dicts without building Product objects.
+    Returns (rows, next_after); next_after is the id to pass as `after` for
+    the following page, or None on the last one (or without a limit).
+    """
+    columns = [getattr(Product, field) for field in fields]
+    if "id" not in fields:
+        columns.append(Product.id)
+    
+    statement = select(*columns).where(Product.business_id == business_id).order_by(Product.id)
+    if after is not None:
+        statement = statement.where(Product.id > after)
+    if limit:
+        statement = statement.limit(limit + 1)
+    
+    rows = [row._mapping for row in session.exec(statement).all()]
+    next_after = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_after = rows[-1]["id"]
+    return [{field: row[field] for field in fields} for row in rows], next_after
 
 
 def calculate_stock(session: Session, product_id: int, location: str = "main") -> float:
@@ -133,23 +430,81 @@ def calculate_stock(session: Session, product_id: int, location: str = "main") -
     return stock_item.quantity
 
 
-def list_stock(session: Session, business_id: int, location: Optional[str] = None) -> List[StockItem]:
-    """List all stock items for a business, optionally filtered by location"""
-    # Get all products for the business
-    product_statement = select(Product).where(Product.business_id == business_id)
-    products = session.exec(product_statement).all()
-    product_ids = [p.id for p in products]
-    
+def get_stock_levels(
+    session: Session,
+    product_ids: List[int],
+    location: Optional[str] = None
+) -> Dict[int, float]:
+    """On-hand quantity per product, summed across locations unless one is given (one grouped query)"""
     if not product_ids:
-        return []
+        return {}
     
-    # Get stock items for these products
-    statement = select(StockItem).where(StockItem.product_id.in_(product_ids))
+    statement = (
+        select(StockItem.product_id, func.sum(StockItem.quantity))
+        .where(StockItem.product_id.in_(product_ids))
+        .group_by(StockItem.product_id)
+    )
+    if location:
+        statement = statement.where(StockItem.location == location)
+    return {product_id: quantity or 0.0 for product_id, quantity in session.exec(statement).all()}
+
+
+def list_stock(session: Session, business_id: int, location: Optional[str] = None) -> List[StockItem]:
+    """List all stock items for a business, optionally filtered by location"""
+    statement = (
+        select(StockItem)
+        .join(Product, Product.id == StockItem.product_id)
+        .where(Product.business_id == business_id)
+    )
+    if location:
+        statement = statement.where(StockItem.location == location)
+    return list(session.exec(statement).all())
+
+
+def iter_stock_listing(
+    session: Session,
+    business_id: int,
+    location: Optional[str] = None,
+    low_stock: Optional[bool] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stock rows with their product details, ordered by stock item id
     
+    One StockItem-Product join; rows are fetched ROWS_PER_FETCH at a time
+    through a server-side cursor and yielded as plain dicts shaped like
+    StockItemWithProduct, so memory stays flat however large the tenant.
+    `after` is a keyset cursor (the last id seen). low_stock=True keeps
+    rows at or below the product's low-stock threshold, False the rest.
+    """
+    statement = (
+        select(
+            StockItem.id,
+            StockItem.product_id,
+            StockItem.quantity,
+            StockItem.location,
+            StockItem.last_updated,
+            Product.name.label("product_name"),
+            Product.sku.label("product_sku"),
+            Product.unit_of_measure,
+        )
+        .join(Product, Product.id == StockItem.product_id)
+        .where(Product.business_id == business_id)
+        .order_by(StockItem.id)
+    )
     if location:
         statement = statement.where(StockItem.location == location)
+    if low_stock is not None:
+        is_low = StockItem.quantity <= func.coalesce(Product.low_stock_threshold, 0.0)
+        statement = statement.where(is_low if low_stock else ~is_low)
+    if after is not None:
+        statement = statement.where(StockItem.id > after)
+    if limit:
+        statement = statement.limit(limit)
     
-    return list(session.exec(statement).all())
+    for row in session.exec(statement.execution_options(yield_per=ROWS_PER_FETCH)):
+        yield dict(row._mapping)
 
 
 def get_product_movements(
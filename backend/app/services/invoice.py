@@ -51,7 +51,7 @@ def create_invoice(
     total = subtotal_after_discount + tax
     
     # Generate invoice number
-    invoice_number = generate_invoice_number(session, business_id)
+    invoice_number = generate_invoice_number(session, business_id, commit=False)
     
     # Determine payment mode and initial status
     payment_mode = invoice_data.payment_mode or "cash"
@@ -13,12 +13,14 @@ def add_loyalty_entry(
     session: Session,
     business_id: int,
     user_id: int,
-    loyalty_data: LoyaltyEntryCreate
+    loyalty_data: LoyaltyEntryCreate,
+    commit: bool = True
 ) -> CustomerLoyaltyEntry:
     """
     Add a loyalty entry (earned or redeemed) and update customer points
     
-    This is atomic - points update happens in the same transaction
+    This is atomic - points update happens in the same transaction.
+    Pass commit=False to make the entry part of the caller's transaction.
     """
     customer = session.get(Customer, loyalty_data.customer_id)
     if not customer or customer.business_id != business_id:
@@ -55,8 +57,9 @@ def add_loyalty_entry(
     
     session.add(loyalty_entry)
     session.add(customer)
-    session.commit()
-    session.refresh(loyalty_entry)
+    if commit:
+        session.commit()
+        session.refresh(loyalty_entry)
     
     return loyalty_entry
 
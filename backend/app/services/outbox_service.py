@@ -0,0 +1,300 @@
+"""
+Transactional outbox service
+
+Side effects of a business transaction (activity log, loyalty points, credit
+ledger, sync events) are written as OutboxMessage rows in that same
+transaction. Background workers then apply them with retries, so the
+request that caused them returns as soon as its own data is committed and
+a failing side effect is retried or parked as "failed" - never dropped.
+"""
+from sqlalchemy import delete
+from sqlmodel import Session, select
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.db.session import engine
+from app.models.outbox import OutboxMessage
+
+# Topics
+OUTBOX_ACTIVITY_LOG = "activity_log"
+OUTBOX_CREDIT_ENTRY = "credit_entry"
+OUTBOX_LOYALTY_ACCRUAL = "loyalty_accrual"
+OUTBOX_SYNC_EVENT = "sync_event"
+
+# A handler applies one message inside the worker's transaction. It may
+# return a callable that must only run after that transaction commits
+# (e.g. a WebSocket broadcast).
+OutboxHandler = Callable[[Session, OutboxMessage], Optional[Callable[[], None]]]
+
+_handlers: Dict[str, OutboxHandler] = {}
+
+# Set by the worker pool so enqueuers can wake it instead of waiting a poll
+_wake_callback: Optional[Callable[[], None]] = None
+
+
+def outbox_handler(topic: str):
+    """Register the handler for an outbox topic"""
+    def decorator(func: OutboxHandler) -> OutboxHandler:
+        _handlers[topic] = func
+        return func
+    return decorator
+
+
+def enqueue_outbox_message(
+    session: Session,
+    business_id: int,
+    topic: str,
+    payload: Dict[str, Any]
+) -> OutboxMessage:
+    """
+    Add a side effect to the caller's transaction (never commits)
+    
+    Call notify_outbox() after the commit to have it applied right away.
+    """
+    if topic not in _handlers:
+        raise ValueError(f"Unknown outbox topic: {topic}")
+    
+    message = OutboxMessage(business_id=business_id, topic=topic, payload=payload)
+    session.add(message)
+    return message
+
+
+def enqueue_product_events(
+    session: Session,
+    business_id: int,
+    event_type: str,
+    payloads: List[Dict[str, Any]],
+    branch_id: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> None:
+    """
+    Queue one sync event per product, each payload naming its product_id (never commits)
+    
+    Per-product STOCK_UPDATED / PRODUCT_* events are what the WebSocket
+    layer coalesces, so a long cart, a stock take or an import reaches each
+    room as a few batch frames rather than one frame per product.
+    """
+    for payload in payloads:
+        enqueue_outbox_message(session, business_id, OUTBOX_SYNC_EVENT, {
+            "event_type": event_type,
+            "payload": payload,
+            "branch_id": branch_id,
+            "user_id": user_id
+        })
+
+
+def set_outbox_wake_callback(callback: Optional[Callable[[], None]]) -> None:
+    """Install the function that wakes the worker pool (thread-safe)"""
+    global _wake_callback
+    _wake_callback = callback
+
+
+def notify_outbox() -> None:
+    """Wake the outbox workers after committing new messages"""
+    if _wake_callback:
+        _wake_callback()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff capped at 5 minutes"""
+    return timedelta(seconds=min(2 ** attempts, 300))
+
+
+def claim_outbox_batch(session: Session, limit: int) -> List[OutboxMessage]:
+    """
+    Lock a batch of due messages
+    
+    SKIP LOCKED lets several workers (and several app instances) drain the
+    outbox concurrently without ever picking the same message.
+    """
+    statement = (
+        select(OutboxMessage)
+        .where(
+            OutboxMessage.status == "pending",
+            OutboxMessage.available_at <= datetime.utcnow()
+        )
+        .order_by(OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(session.exec(statement).all())
+
+
+def process_outbox_batch(limit: Optional[int] = None) -> int:
+    """
+    Apply one batch of pending messages; returns how many were claimed
+    
+    Each message runs in a savepoint, so a failing handler only rolls back
+    its own work. Successful side effects and their "done" marks commit
+    together, so a message is never applied twice.
+    """
+    limit = limit or settings.OUTBOX_BATCH_SIZE
+    after_commit: List[Callable[[], None]] = []
+    
+    with Session(engine) as session:
+        messages = claim_outbox_batch(session, limit)
+        if not messages:
+            return 0
+        
+        for message in messages:
+            message.attempts += 1
+            try:
+                handler = _handlers.get(message.topic)
+                if not handler:
+                    raise ValueError(f"No handler for outbox topic: {message.topic}")
+                
+                with session.begin_nested():
+                    callback = handler(session, message)
+                
+                if callback:
+                    after_commit.append(callback)
+                message.status = "done"
+                message.processed_at = datetime.utcnow()
+                message.last_error = None
+            except Exception as e:
+                message.last_error = str(e)
+                if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    message.status = "failed"
+                    print(
+                        f"Outbox message {message.id} ({message.topic}) failed permanently "
+                        f"after {message.attempts} attempts: {e}"
+                    )
+                else:
+                    message.available_at = datetime.utcnow() + _retry_delay(message.attempts)
+            
+            session.add(message)
+        
+        session.commit()
+    
+    for callback in after_commit:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Outbox post-commit callback failed: {e}")
+    
+    return len(messages)
+
+
+def prune_outbox(retention_days: Optional[int] = None, batch_size: int = 5000) -> int:
+    """
+    Delete "done" messages processed more than retention_days ago
+    
+    Failed messages are kept for inspection. Deletes run in batches of
+    batch_size, each its own transaction, so a large backlog doesn't hold
+    locks for long. Returns how many rows were deleted.
+    """
+    retention_days = settings.OUTBOX_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+    
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    batch = (
+        select(OutboxMessage.id)
+        .where(
+            OutboxMessage.status == "done",
+            # available_at <= processed_at, so this only lets the status index narrow the scan
+            OutboxMessage.available_at < cutoff,
+            OutboxMessage.processed_at < cutoff
+        )
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    
+    deleted = 0
+    with Session(engine) as session:
+        while True:
+            result = session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(batch)))
+            session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+
+
+# Built-in handlers
+
+
+@outbox_handler(OUTBOX_ACTIVITY_LOG)
+def _apply_activity_log(session: Session, message: OutboxMessage):
+    from app.services.activity_service import log_activity
+    
+    payload = message.payload
+    log_activity(
+        session=session,
+        business_id=message.business_id,
+        action_type=payload["action_type"],
+        description=payload["description"],
+        user_id=payload.get("user_id"),
+        entity_type=payload.get("entity_type"),
+        entity_id=payload.get("entity_id"),
+        meta_data=payload.get("meta_data"),
+        commit=False
+    )
+
+
+@outbox_handler(OUTBOX_CREDIT_ENTRY)
+def _apply_credit_entry(session: Session, message: OutboxMessage):
+    from app.services.credit_service import add_credit_entry
+    from app.schemas.customer import CreditEntryCreate
+    
+    payload = message.payload
+    add_credit_entry(
+        session,
+        message.business_id,
+        payload["user_id"],
+        CreditEntryCreate(**payload["entry"]),
+        commit=False
+    )
+
+
+@outbox_handler(OUTBOX_LOYALTY_ACCRUAL)
+def _apply_loyalty_accrual(session: Session, message: OutboxMessage):
+    from app.services.loyalty_service import add_loyalty_entry, calculate_loyalty_points
+    from app.schemas.customer import LoyaltyEntryCreate
+    
+    payload = message.payload
+    points = calculate_loyalty_points(payload["amount"])
+    if points <= 0:
+        return None
+    
+    add_loyalty_entry(
+        session,
+        message.business_id,
+        payload["user_id"],
+        LoyaltyEntryCreate(
+            customer_id=payload["customer_id"],
+            entry_type="earned",
+            points=points,
+            sale_id=payload.get("sale_id"),
+            notes=payload.get("notes")
+        ),
+        commit=False
+    )
+
+
+@outbox_handler(OUTBOX_SYNC_EVENT)
+def _apply_sync_event(session: Session, message: OutboxMessage):
+    from app.services.event_service import emit_sync_event, publish_sync_event
+    
+    payload = message.payload
+    event = emit_sync_event(
+        session,
+        message.business_id,
+        payload["event_type"],
+        payload["payload"],
+        branch_id=payload.get("branch_id"),
+        user_id=payload.get("user_id"),
+        device_id=payload.get("device_id"),
+        commit=False
+    )
+    # Assign the event id now so the broadcast carries it (resumable streams)
+    session.flush()
+    
+    business_id = message.business_id
+    event_id = event.id
+    return lambda: publish_sync_event(
+        business_id,
+        payload["event_type"],
+        payload["payload"],
+        branch_id=payload.get("branch_id"),
+        event_id=event_id
+    )
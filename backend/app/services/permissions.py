@@ -50,6 +50,18 @@ PERMISSIONS = {
 }
 
 
+# Cost and profit fields hidden from users without view_cost_prices
+SENSITIVE_FIELDS = [
+    "buying_price",
+    "cost_price",
+    "purchase_price",
+    "profit",
+    "profit_margin",
+    "valuation",
+    "total_cost",
+]
+
+
 def has_permission(user: User, permission: str) -> bool:
     """
     Check if user has a specific permission
@@ -157,18 +169,8 @@ def filter_sensitive_data(data: dict, user: User, show_sensitive: bool = False)
         return data  # Owner can see everything if toggle is on
     
     # Remove sensitive fields for non-owners
-    sensitive_fields = [
-        "buying_price",
-        "cost_price",
-        "purchase_price",
-        "profit",
-        "profit_margin",
-        "valuation",
-        "total_cost",
-    ]
-    
     filtered = data.copy()
-    for field in sensitive_fields:
+    for field in SENSITIVE_FIELDS:
         if field in filtered:
             del filtered[field]
     
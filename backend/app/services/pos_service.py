@@ -2,46 +2,104 @@
 POS service for fast checkout and stock management
 """
 from sqlmodel import Session, select, func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from app.models.pos import Sale, SaleItem, POSSession
 from app.models.product import Product
 from app.models.invoice import Invoice, InvoiceItem
 from app.models.inventory_movement import InventoryMovement
-from app.services.invoice import generate_invoice_number
+from app.services.invoice_numbering import generate_invoice_number
+from app.services.inventory_service import decrement_stock, calculate_stock
 from app.services.pdf_templates import generate_invoice_pdf
 from app.services.telegram_notifications import send_telegram_message
-from app.services.activity_service import log_activity
+from app.models.customer import Customer
+from app.services.event_service import EVENT_SALE_CREATED, EVENT_STOCK_UPDATED
+from app.services.change_log_service import record_changes, CHANGE_SALE, CHANGE_STOCK
+from app.services.outbox_service import (
+    enqueue_outbox_message,
+    enqueue_product_events,
+    notify_outbox,
+    OUTBOX_ACTIVITY_LOG,
+    OUTBOX_CREDIT_ENTRY,
+    OUTBOX_LOYALTY_ACCRUAL,
+    OUTBOX_SYNC_EVENT,
+)
 import io
 
 
 def atomic_stock_deduction(session: Session, product_id: int, quantity: int) -> bool:
     """
-    Atomically deduct stock with row-level locking to prevent race conditions
+    Atomically deduct stock with one conditional UPDATE and commit
     
     Returns True if successful, False if insufficient stock
     """
-    # Use SELECT FOR UPDATE to lock the row
-    statement = select(Product).where(Product.id == product_id).with_for_update()
-    product = session.exec(statement).first()
-    
-    if not product:
-        return False
-    
-    if product.current_stock < quantity:
+    if decrement_stock(session, product_id, quantity) is None:
         return False
     
-    # Deduct stock
-    product.current_stock -= quantity
-    session.add(product)
     session.commit()
-    session.refresh(product)
-    
     return True
 
 
-def create_pos_session(session: Session, user_id: int, business_id: int, branch_id: Optional[int] = None) -> POSSession:
-    """Create a new POS session"""
+def aggregate_cart_quantities(items: List[Dict[str, Any]]) -> Dict[int, int]:
+    """Sum requested quantities per product (a cart may list a product more than once)"""
+    requested: Dict[int, int] = {}
+    for item in items:
+        requested[item['product_id']] = requested.get(item['product_id'], 0) + item['quantity']
+    return requested
+
+
+def get_cart_products(session: Session, business_id: int, product_ids: List[int]) -> Dict[int, Product]:
+    """
+    Load all given products with one SELECT (no row locks)
+    
+    Returns a dict of product_id -> Product (missing/foreign products are absent)
+    """
+    if not product_ids:
+        return {}
+    
+    statement = select(Product).where(
+        Product.id.in_(set(product_ids)),
+        Product.business_id == business_id
+    )
+    return {product.id: product for product in session.exec(statement).all()}
+
+
+def deduct_cart_stock(
+    session: Session,
+    products: Dict[int, Product],
+    requested: Dict[int, float],
+    location: str = "main"
+) -> Dict[int, float]:
+    """
+    Take every cart line off stock with conditional UPDATEs; returns the new levels
+    
+    Products are decremented in ascending id order so concurrent checkouts
+    lock stock rows in the same order and cannot deadlock each other. Raises
+    ValueError on the first short product; the caller's transaction then
+    holds partial writes and must be rolled back (a savepoint for sync).
+    """
+    levels = {}
+    for product_id in sorted(requested):
+        product = products.get(product_id)
+        if not product:
+            raise ValueError(f"Product {product_id} not found")
+        
+        quantity = requested[product_id]
+        levels[product_id] = decrement_stock(session, product_id, quantity, location)
+        if levels[product_id] is None:
+            available = calculate_stock(session, product_id, location)
+            raise ValueError(f"Insufficient stock for {product.name}. Available: {available}, Requested: {quantity}")
+    return levels
+
+
+def create_pos_session(
+    session: Session,
+    user_id: int,
+    business_id: int,
+    branch_id: Optional[int] = None,
+    commit: bool = True
+) -> POSSession:
+    """Create a new POS session (commit=False flushes into the caller's transaction)"""
     pos_session = POSSession(
         user_id=user_id,
         business_id=business_id,
@@ -49,8 +107,11 @@ def create_pos_session(session: Session, user_id: int, business_id: int, branch_
         is_active=True
     )
     session.add(pos_session)
-    session.commit()
-    session.refresh(pos_session)
+    if commit:
+        session.commit()
+        session.refresh(pos_session)
+    else:
+        session.flush()
     return pos_session
 
 
@@ -89,63 +150,91 @@ def checkout(
     customer_id: Optional[int] = None,
     discount: float = 0.0,
     notes: Optional[str] = None,
-    branch_id: Optional[int] = None
-) -> Sale:
+    branch_id: Optional[int] = None,
+    device_id: Optional[str] = None,
+    commit: bool = True
+) -> Tuple[Sale, Invoice]:
     """
     Process checkout with atomic stock deduction
     
     This function:
-    1. Validates stock for all items
-    2. Atomically deducts stock
-    3. Creates sale record
-    4. Creates invoice
-    5. Logs inventory movements
-    6. Updates POS session
+    1. Validates products and customer
+    2. Atomically deducts stock (conditional decrements)
+    3. Creates sale record and invoice
+    4. Logs inventory movements
+    5. Updates POS session
+    
+    Everything is written as one unit of work: the sale graph is flushed once
+    and committed once, so a sale is never visible half-written. Shared rows
+    are locked in the order every stock writer uses - stock rows (by product
+    id), then the invoice sequence, and the change-log sequence only while
+    committing - so checkouts, quick sells, purchases and sync pushes can't
+    deadlock. Credit,
+    loyalty, activity log and the SALE_CREATED event are written to the
+    outbox in the same transaction and applied by background workers. With
+    commit=False nothing is committed and the caller owns the transaction
+    (e.g. sync push applying an action) and should call notify_outbox()
+    after its commit. device_id tags the sale's change-log entries with the
+    pushing device (sync push).
+    
+    Returns (sale, invoice)
     """
     # Get or create active POS session
     pos_session = get_active_pos_session(session, user_id, business_id)
     if not pos_session:
-        pos_session = create_pos_session(session, user_id, business_id, branch_id)
+        pos_session = create_pos_session(session, user_id, business_id, branch_id, commit=False)
+    
+    # Load every cart product in one round trip (no locks; stock is taken
+    # with conditional decrements once the cart is validated)
+    requested = aggregate_cart_quantities(items)
+    products = get_cart_products(session, business_id, list(requested.keys()))
+    for product_id in requested:
+        if product_id not in products:
+            raise ValueError(f"Product {product_id} not found")
     
-    # Validate stock and calculate totals
     validated_items = []
     subtotal = 0.0
     
     for item in items:
-        product_id = item['product_id']
         quantity = item['quantity']
         unit_price = item['unit_price']
         
-        # Get product with lock
-        product_statement = select(Product).where(Product.id == product_id).with_for_update()
-        product = session.exec(product_statement).first()
-        
-        if not product:
-            raise ValueError(f"Product {product_id} not found")
-        
-        if product.current_stock < quantity:
-            raise ValueError(f"Insufficient stock for {product.name}. Available: {product.current_stock}, Requested: {quantity}")
-        
         item_subtotal = quantity * unit_price
         subtotal += item_subtotal
         
         validated_items.append({
-            'product': product,
+            'product': products[item['product_id']],
             'quantity': quantity,
             'unit_price': unit_price,
             'subtotal': item_subtotal
         })
     
+    # Credit sales are booked to the customer's ledger asynchronously, so
+    # reject unknown customers now while the cashier can still fix it
+    if payment_method == "credit" and customer_id:
+        customer = session.get(Customer, customer_id)
+        if not customer or customer.business_id != business_id:
+            raise ValueError("Customer not found")
+    
+    # Take the stock first; the rows stay locked until the commit
+    try:
+        stock_levels = deduct_cart_stock(session, products, requested)
+    except ValueError:
+        if commit:
+            session.rollback()
+        raise
+    
     # Calculate totals
     total = subtotal - discount
     tax = 0.0  # Can be calculated based on business settings
+    invoice_number = generate_invoice_number(session, business_id, commit=False)
     
-    # Create sale record
+    # Build the whole sale graph in memory; relationships fill in the foreign keys
     sale = Sale(
         user_id=user_id,
         business_id=business_id,
         branch_id=branch_id,
-        pos_session_id=pos_session.id,
+        pos_session=pos_session,
         subtotal=subtotal,
         discount=discount,
         tax=tax,
@@ -157,46 +246,7 @@ def checkout(
         notes=notes
     )
     session.add(sale)
-    session.commit()
-    session.refresh(sale)
     
-    # Create sale items and deduct stock atomically
-    sale_items = []
-    for item in validated_items:
-        product = item['product']
-        quantity = item['quantity']
-        
-        # Deduct stock
-        product.current_stock -= quantity
-        session.add(product)
-        
-        # Create sale item
-        sale_item = SaleItem(
-            sale_id=sale.id,
-            product_id=product.id,
-            product_name=product.name,
-            quantity=quantity,
-            unit_price=item['unit_price'],
-            subtotal=item['subtotal']
-        )
-        session.add(sale_item)
-        sale_items.append(sale_item)
-        
-        # Log inventory movement
-        movement = InventoryMovement(
-            business_id=business_id,
-            branch_id=branch_id,
-            product_id=product.id,
-            movement_type="sale",
-            quantity=-quantity,  # Negative for sale
-            reference_id=sale.id,
-            reference_type="sale",
-            notes=f"POS sale #{sale.id}"
-        )
-        session.add(movement)
-    
-    # Create invoice
-    invoice_number = generate_invoice_number(business_id)
     invoice = Invoice(
         business_id=business_id,
         branch_id=branch_id,
@@ -212,68 +262,38 @@ def checkout(
         created_by=user_id
     )
     session.add(invoice)
-    session.commit()
-    session.refresh(invoice)
     
-    # Create invoice items
     for item in validated_items:
         product = item['product']
-        invoice_item = InvoiceItem(
-            invoice_id=invoice.id,
+        quantity = item['quantity']
+        
+        session.add(SaleItem(
+            sale=sale,
             product_id=product.id,
             product_name=product.name,
-            quantity=item['quantity'],
+            quantity=quantity,
             unit_price=item['unit_price'],
             subtotal=item['subtotal']
-        )
-        session.add(invoice_item)
-    
-    # Handle credit sales - create credit entry
-    if payment_method == "credit" and customer_id:
-        from app.services.credit_service import add_credit_entry
-        from app.schemas.customer import CreditEntryCreate
+        ))
         
-        try:
-            add_credit_entry(
-                session,
-                business_id,
-                user_id,
-                CreditEntryCreate(
-                    customer_id=customer_id,
-                    amount=total,
-                    sale_id=sale.id,
-                    invoice_id=invoice.id,
-                    reference=invoice_number,
-                    notes=notes
-                )
-            )
-        except Exception as e:
-            # Log error but don't fail the sale
-            print(f"Failed to create credit entry: {e}")
-    
-    # Handle loyalty points (earn points for all sales)
-    if customer_id and payment_method != "credit":
-        from app.services.loyalty_service import add_loyalty_entry, calculate_loyalty_points
-        from app.schemas.customer import LoyaltyEntryCreate
+        InvoiceItem(
+            invoice=invoice,
+            product_id=product.id,
+            product_name=product.name,
+            quantity=quantity,
+            unit_price=item['unit_price'],
+            subtotal=item['subtotal']
+        )
         
-        try:
-            points = calculate_loyalty_points(total)
-            if points > 0:
-                add_loyalty_entry(
-                    session,
-                    business_id,
-                    user_id,
-                    LoyaltyEntryCreate(
-                        customer_id=customer_id,
-                        entry_type="earned",
-                        points=points,
-                        sale_id=sale.id,
-                        notes=f"Points earned from sale"
-                    )
-                )
-        except Exception as e:
-            # Log error but don't fail the sale
-            print(f"Failed to add loyalty points: {e}")
+        # Log inventory movement
+        session.add(InventoryMovement(
+            product_id=product.id,
+            branch_id=branch_id,
+            movement_type="sale",
+            quantity=-quantity,  # Negative for sale
+            reference=invoice_number,
+            user_id=user_id
+        ))
     
     # Update POS session totals
     pos_session.total_sales += total
@@ -289,40 +309,75 @@ def checkout(
         pos_session.credit_total += total
     
     session.add(pos_session)
-    session.commit()
-    session.refresh(sale)
     
-    # Log activity
-    log_activity(
-        session=session,
-        user_id=user_id,
-        action_type="pos_sale_completed",
-        entity_type="sale",
-        entity_id=sale.id,
-        description=f"POS sale completed: {total} {payment_method}"
+    # Single flush: sale/invoice ids are needed by the outbox messages below
+    session.flush()
+    
+    # Delta-sync feed: the sale and every product whose stock moved
+    # (numbered when the transaction commits)
+    record_changes(
+        session,
+        business_id,
+        [(CHANGE_SALE, sale.id, "created")]
+        + [(CHANGE_STOCK, item['product'].id, "updated") for item in validated_items],
+        device_id=device_id
     )
     
-    # Emit sync event for real-time updates
-    try:
-        from app.services.event_service import emit_sync_event, EVENT_SALE_CREATED
-        emit_sync_event(
-            session,
-            business_id,
-            EVENT_SALE_CREATED,
-            {
+    # Side effects go to the outbox in this same transaction and are applied
+    # by the outbox workers, so the cashier only waits for stock and money
+    if payment_method == "credit" and customer_id:
+        enqueue_outbox_message(session, business_id, OUTBOX_CREDIT_ENTRY, {
+            "user_id": user_id,
+            "entry": {
+                "customer_id": customer_id,
+                "amount": total,
                 "sale_id": sale.id,
-                "total": total,
-                "payment_method": payment_method,
-                "items_count": len(sale_items)
-            },
-            branch_id=branch_id,
-            user_id=user_id
-        )
-    except Exception as e:
-        # Don't fail sale if event emission fails
-        print(f"Failed to emit sync event: {e}")
+                "invoice_id": invoice.id,
+                "reference": invoice_number,
+                "notes": notes
+            }
+        })
+    
+    # Earn loyalty points for all non-credit sales
+    if customer_id and payment_method != "credit":
+        enqueue_outbox_message(session, business_id, OUTBOX_LOYALTY_ACCRUAL, {
+            "user_id": user_id,
+            "customer_id": customer_id,
+            "amount": total,
+            "sale_id": sale.id,
+            "notes": "Points earned from sale"
+        })
     
-    return sale
+    enqueue_outbox_message(session, business_id, OUTBOX_ACTIVITY_LOG, {
+        "user_id": user_id,
+        "action_type": "pos_sale_completed",
+        "entity_type": "sale",
+        "entity_id": sale.id,
+        "description": f"POS sale completed: {total} {payment_method}"
+    })
+    
+    enqueue_outbox_message(session, business_id, OUTBOX_SYNC_EVENT, {
+        "event_type": EVENT_SALE_CREATED,
+        "payload": {
+            "sale_id": sale.id,
+            "total": total,
+            "payment_method": payment_method,
+            "items_count": len(validated_items)
+        },
+        "branch_id": branch_id,
+        "user_id": user_id
+    })
+    
+    # One STOCK_UPDATED per product, merged by the WebSocket coalescer
+    enqueue_product_events(session, business_id, EVENT_STOCK_UPDATED, [
+        {"product_id": product_id, "stock": stock_levels[product_id]} for product_id in sorted(stock_levels)
+    ], branch_id=branch_id, user_id=user_id)
+    
+    if commit:
+        session.commit()
+        notify_outbox()
+    
+    return sale, invoice
 
 
 async def send_pos_notification(
@@ -350,7 +405,7 @@ Items: {len(sale.items)}
 
 Invoice: #{invoice.invoice_number}
 """
-        
+
         # Send message (would need bot token and chat_id)
         # For now, just return True
         # In production, use Telegram Bot API to send message + PDF
@@ -1,42 +1,22 @@
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from app.models.purchase import Purchase
 from app.models.purchase_item import PurchaseItem
 from app.models.supplier import Supplier
 from app.models.product import Product
-from app.models.inventory_movement import InventoryMovement
-from app.models.inventory_stock import StockItem
 from app.schemas.purchase import PurchaseCreate
 from app.services.supplier_service import get_supplier
-from app.services.inventory_service import record_movement
-from app.schemas.inventory_movement import InventoryMovementCreate
+from app.services.inventory_service import apply_movements, enqueue_stock_events, record_movements
+from app.services.outbox_service import notify_outbox
+from app.services.change_log_service import record_changes, CHANGE_STOCK
+from app.services.activity_service import log_purchase_created
+from app.services.document_numbering import DOC_PURCHASE, next_document_number
 
 
 def generate_purchase_number(session: Session, business_id: int) -> str:
-    """Generate unique purchase number: PUR-YYYYMMDD-####"""
-    today = datetime.utcnow().strftime("%Y%m%d")
-    prefix = f"PUR-{today}-"
-    
-    # Find the highest number for today
-    statement = select(Purchase).where(
-        Purchase.business_id == business_id,
-        Purchase.purchase_number.like(f"{prefix}%")
-    ).order_by(Purchase.purchase_number.desc())
-    
-    last_purchase = session.exec(statement).first()
-    
-    if last_purchase:
-        # Extract the number part and increment
-        try:
-            last_num = int(last_purchase.purchase_number.split("-")[-1])
-            next_num = last_num + 1
-        except (ValueError, IndexError):
-            next_num = 1
-    else:
-        next_num = 1
-    
-    return f"{prefix}{next_num:04d}"
+    """Generate unique purchase number: PUR-{business_id}-YYYYMMDD-####"""
+    return next_document_number(session, business_id, DOC_PURCHASE)
 
 
 def create_purchase(
@@ -51,16 +31,20 @@ def create_purchase(
     if not supplier:
         raise ValueError(f"Supplier {purchase_data.supplier_id} not found or doesn't belong to business")
     
-    # Validate products and calculate totals
+    # Validate products (one IN query) and calculate totals
+    product_ids = {item_data.product_id for item_data in purchase_data.items}
+    owners = dict(session.exec(
+        select(Product.id, Product.business_id).where(Product.id.in_(product_ids))
+    ).all())
+    
     subtotal = 0.0
     items_data = []
     
     for item_data in purchase_data.items:
         # Verify product exists and belongs to business
-        product = session.get(Product, item_data.product_id)
-        if not product:
+        if item_data.product_id not in owners:
             raise ValueError(f"Product {item_data.product_id} not found")
-        if product.business_id != business_id:
+        if owners[item_data.product_id] != business_id:
             raise ValueError(f"Product {item_data.product_id} doesn't belong to business")
         
         item_total = item_data.quantity * item_data.unit_cost
@@ -77,8 +61,26 @@ def create_purchase(
     tax = subtotal * 0.15
     total = subtotal + tax
     
-    # Generate purchase number
-    purchase_number = generate_purchase_number(session, business_id)
+    # A received purchase takes its stock rows before the purchase number,
+    # the lock order every stock writer uses (see pos_service.checkout).
+    # Nothing is flushed until the movements have their reference.
+    with session.no_autoflush:
+        movements = []
+        if purchase_data.status == "received":
+            movements = apply_movements(
+                session,
+                business_id,
+                [
+                    {"product_id": item["product_id"], "movement_type": "purchase_add", "quantity": item["quantity"]}
+                    for item in items_data
+                ],
+                user_id=user_id
+            )
+        
+        # Generate purchase number
+        purchase_number = generate_purchase_number(session, business_id)
+        for movement in movements:
+            movement.reference = purchase_number
     
     # Create purchase
     purchase = Purchase(
@@ -94,47 +96,57 @@ def create_purchase(
         created_by=user_id,
     )
     session.add(purchase)
-    session.commit()
-    session.refresh(purchase)
+    session.flush()
     
-    # Create purchase items and inventory movements
-    for item_data in items_data:
-        # Create purchase item
-        purchase_item = PurchaseItem(
-            purchase_id=purchase.id,
-            **item_data
-        )
-        session.add(purchase_item)
-        
-        # If status is "received", create inventory movement and update stock
-        if purchase.status == "received":
-            movement_data = InventoryMovementCreate(
-                movement_type="purchase_add",
-                quantity=item_data["quantity"],
-                reference=purchase_number,
-            )
-            record_movement(
-                session,
-                item_data["product_id"],
-                movement_data,
-                user_id=user_id
-            )
+    # Purchase, items, stock and activity log are committed together
+    session.add_all([PurchaseItem(purchase_id=purchase.id, **item_data) for item_data in items_data])
     
-    session.commit()
-    session.refresh(purchase)
+    # Change-log entries and STOCK_UPDATED events for the stock taken above
+    if movements:
+        record_changes(session, business_id, [
+            (CHANGE_STOCK, product_id, "updated") for product_id in sorted(product_ids)
+        ])
+        enqueue_stock_events(session, business_id, sorted(product_ids), user_id=user_id)
     
-    # Log activity
     log_purchase_created(
         session=session,
         business_id=business_id,
         purchase_id=purchase.id,
         purchase_number=purchase_number,
-        user_id=user_id
+        user_id=user_id,
+        commit=False
     )
     
+    session.commit()
+    notify_outbox()
+    session.refresh(purchase)
     return purchase
 
 
+def record_purchase_movements(
+    session: Session,
+    purchase: Purchase,
+    items: List[Dict[str, Any]],
+    user_id: Optional[int] = None
+) -> None:
+    """Add a purchase's lines to stock with one bulk movement (joins the caller's transaction)"""
+    record_movements(
+        session,
+        purchase.business_id,
+        [
+            {
+                "product_id": item["product_id"],
+                "movement_type": "purchase_add",
+                "quantity": item["quantity"],
+                "reference": purchase.purchase_number,
+            }
+            for item in items
+        ],
+        user_id=user_id,
+        commit=False
+    )
+
+
 def get_purchase(session: Session, purchase_id: int, business_id: int) -> Optional[Purchase]:
     """Get a purchase by ID, ensuring it belongs to the business"""
     from sqlmodel import select
@@ -176,26 +188,17 @@ def mark_purchase_received(
     if purchase.status == "received":
         return purchase  # Already received
     
-    # Update status
+    # Status and stock change in one transaction
     purchase.status = "received"
     session.add(purchase)
-    session.commit()
-    
-    # Create inventory movements for each item
-    for item in purchase.items:
-        movement_data = InventoryMovementCreate(
-            movement_type="purchase_add",
-            quantity=item.quantity,
-            reference=purchase.purchase_number,
-        )
-        record_movement(
-            session,
-            item.product_id,
-            movement_data,
-            user_id=user_id
-        )
+    record_purchase_movements(
+        session,
+        purchase,
+        [{"product_id": item.product_id, "quantity": item.quantity} for item in purchase.items],
+        user_id=user_id
+    )
     
     session.commit()
+    notify_outbox()
     session.refresh(purchase)
     return purchase
-
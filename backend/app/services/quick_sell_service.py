@@ -2,19 +2,16 @@ from sqlmodel import Session, select
 from typing import Optional
 from datetime import datetime
 from app.models.product import Product
-from app.models.inventory_stock import StockItem
 from app.models.invoice import Invoice, InvoiceItem
+from app.models.inventory_movement import InventoryMovement
 from app.models.stock import LegacyStockItem
 from app.models.business import Business
-from app.services.inventory_service import record_movement
-from app.schemas.inventory_movement import InventoryMovementCreate
+from app.services.inventory_service import decrement_stock, calculate_stock
 from app.services.activity_service import log_activity
-
-
-def generate_invoice_number(business_id: int) -> str:
-    """Generate unique invoice number"""
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    return f"INV-{business_id}-{timestamp}"
+from app.services.change_log_service import record_change, CHANGE_STOCK
+from app.services.event_service import EVENT_STOCK_UPDATED
+from app.services.outbox_service import enqueue_product_events, notify_outbox
+from app.services.invoice_numbering import generate_invoice_number
 
 
 def quick_sell(
@@ -37,17 +34,14 @@ def quick_sell(
     if not product.is_active:
         raise ValueError("Product is not active")
     
-    # Check stock availability
-    stock_statement = select(StockItem).where(
-        StockItem.product_id == product_id,
-        StockItem.location == "main"
-    )
-    stock_item = session.exec(stock_statement).first()
-    
-    current_stock = stock_item.quantity if stock_item else 0.0
-    
-    if current_stock < quantity:
-        raise ValueError(f"Insufficient stock. Available: {current_stock}, Requested: {quantity}")
+    # Take the stock first with a conditional decrement; everything below
+    # joins the same transaction and is committed once
+    remaining = decrement_stock(session, product_id, quantity)
+    if remaining is None:
+        available = calculate_stock(session, product_id)
+        session.rollback()
+        raise ValueError(f"Insufficient stock. Available: {available}, Requested: {quantity}")
+    current_stock = remaining + quantity
     
     # Get or create LegacyStockItem for invoice system
     # Find existing LegacyStockItem with matching name or create one
@@ -68,8 +62,7 @@ def quick_sell(
             category=product.category
         )
         session.add(legacy_stock_item)
-        session.commit()
-        session.refresh(legacy_stock_item)
+        session.flush()
     
     # Calculate invoice totals
     unit_price = product.selling_price
@@ -81,7 +74,7 @@ def quick_sell(
     # Create invoice
     invoice = Invoice(
         business_id=business_id,
-        invoice_number=generate_invoice_number(business_id),
+        invoice_number=generate_invoice_number(session, business_id, commit=False),
         customer_name=customer_name,
         customer_phone=None,
         subtotal=subtotal,
@@ -90,8 +83,7 @@ def quick_sell(
         status="paid",  # Quick sell is immediately paid
     )
     session.add(invoice)
-    session.commit()
-    session.refresh(invoice)
+    session.flush()
     
     # Create invoice item
     invoice_item = InvoiceItem(
@@ -103,18 +95,18 @@ def quick_sell(
     )
     session.add(invoice_item)
     
-    # Record inventory movement to deduct stock
-    movement_data = InventoryMovementCreate(
+    # Record the inventory movement for the stock taken above
+    session.add(InventoryMovement(
+        product_id=product_id,
         movement_type="sale",
-        quantity=quantity,
+        quantity=quantity,  # Positive, as record_movement stores it (the type gives the direction)
         reference=invoice.invoice_number,
-    )
-    record_movement(
-        session,
-        product_id,
-        movement_data,
         user_id=user_id
-    )
+    ))
+    record_change(session, business_id, CHANGE_STOCK, product_id)
+    enqueue_product_events(session, business_id, EVENT_STOCK_UPDATED, [
+        {"product_id": product_id, "stock": remaining}
+    ], user_id=user_id)
     
     # Log activity
     log_activity(
@@ -132,10 +124,12 @@ def quick_sell(
             "product_name": product.name,
             "quantity": quantity,
             "total": total
-        }
+        },
+        commit=False
     )
     
     session.commit()
+    notify_outbox()
     session.refresh(invoice)
     
     return invoice
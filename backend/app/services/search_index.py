@@ -0,0 +1,411 @@
+"""
+In-process product search index for POS and stock search
+
+Each business's active catalog is indexed in memory the first time it is
+searched: an exact map of SKUs and barcodes (scanner input), sorted name,
+word and code lists for prefix matching and trigram postings for
+substring matches. Entries carry price and main-location stock, so a
+search only touches the database to refresh stock that changed.
+
+Freshness comes from the change log: once a transaction that recorded
+product changes commits, the business's index is dropped; stock-only
+changes just mark those products' stock for a one-query refresh on the
+next search. PRODUCT_* and STOCK_UPDATED broadcasts do the same, and a
+TTL bounds anything missed. With SEARCH_INDEX=redis every worker keeps its
+own index but invalidations are shared through per-business generation
+counters in Redis.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models.product import Product
+from app.services.change_log_service import add_commit_listener, CHANGE_PRODUCT, CHANGE_STOCK
+from app.services.inventory_service import get_stock_levels
+
+KEY_PREFIX = "sosy:search:"
+
+# Words of a name: letters/digits of any script (Amharic names included)
+WORD_RE = re.compile(r"[^\W_]+")
+
+# Sorted keys are split into runs of this many positions, each kept in rank order
+RUN_SIZE = 256
+
+
+def normalize(text: Optional[str]) -> str:
+    return (text or "").casefold().strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _name_match(position: int) -> str:
+    return "name"
+
+
+class SortedKeys:
+    """
+    (key, position) pairs sorted by key, for prefix lookups
+    
+    A prefix is a contiguous slice of the keys; prefix() returns its
+    positions lazily in ascending (rank) order by merging the pre-sorted
+    runs it covers, so even a one-letter prefix spanning most of the
+    catalog yields its best few positions without sorting them all.
+    """
+    
+    def __init__(self, pairs: List[Tuple[str, int]]):
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        self.runs = [sorted(self.positions[i:i + RUN_SIZE]) for i in range(0, len(pairs), RUN_SIZE)]
+    
+    def bounds(self, prefix: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self.keys, prefix)
+        return start, bisect.bisect_left(self.keys, prefix + "\U0010ffff", start)
+    
+    def prefix(self, prefix: str) -> Iterator[int]:
+        """Positions whose key starts with prefix, ascending (duplicates possible)"""
+        start, end = self.bounds(prefix)
+        first_run, last_run = -(-start // RUN_SIZE), end // RUN_SIZE
+        if first_run >= last_run:
+            return iter(sorted(self.positions[start:end]))
+        
+        runs = self.runs[first_run:last_run]
+        head = self.positions[start:first_run * RUN_SIZE]
+        tail = self.positions[last_run * RUN_SIZE:end]
+        return heapq.merge(sorted(head), sorted(tail), *runs)
+    
+    def slice(self, prefix: str) -> List[int]:
+        """Positions whose key starts with prefix, unordered"""
+        start, end = self.bounds(prefix)
+        return self.positions[start:end]
+
+
+class ProductIndex:
+    """
+    Search structures of one business's active products
+    
+    Entries are stored in tie-break order (shorter name first, then
+    alphabetical), so a position doubles as its rank and every match tier
+    is ranked by ordering plain ints. Built once and never restructured;
+    only the stock of an entry is patched in place.
+    """
+    
+    def __init__(self, products: Iterable[Product], stock_levels: Dict[int, float]):
+        ranked = sorted(((normalize(product.name), product) for product in products), key=lambda item: (len(item[0]), item[0]))
+        
+        self.entries: List[Dict[str, Any]] = []
+        self.positions: Dict[int, int] = {}
+        self.haystacks: List[str] = []
+        self.codes: Dict[str, List[int]] = {}
+        self.trigrams: Dict[str, Set[int]] = {}
+        names: List[Tuple[str, int]] = []
+        words: List[Tuple[str, int]] = []
+        code_keys: List[Tuple[str, int]] = []
+        
+        for position, (name, product) in enumerate(ranked):
+            self.positions[product.id] = position
+            self.entries.append({
+                "id": product.id,
+                "name": product.name,
+                "sku": product.sku,
+                "barcode": product.barcode,
+                "unit": product.unit_of_measure,
+                "selling_price": product.selling_price,
+                "buying_price": product.buying_price,
+                "current_stock": stock_levels.get(product.id, 0.0),
+                "low_stock_threshold": product.low_stock_threshold,
+            })
+            
+            names.append((name, position))
+            words.extend((word, position) for word in set(WORD_RE.findall(name)))
+            
+            codes = [code for code in (normalize(product.sku), normalize(product.barcode)) if code]
+            for code in codes:
+                self.codes.setdefault(code, []).append(position)
+                code_keys.append((code, position))
+            
+            haystack = "\n".join([name] + codes)
+            self.haystacks.append(haystack)
+            for gram in trigrams(haystack):
+                self.trigrams.setdefault(gram, set()).add(position)
+        
+        self.names = SortedKeys(names)
+        self.words = SortedKeys(words)
+        self.code_keys = SortedKeys(code_keys)
+        
+        self.built_at = time.monotonic()
+        self.generation = None
+        self.stock_generation = None
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def set_stock(self, stock_levels: Dict[int, float], product_ids: Optional[Iterable[int]] = None):
+        """Patch stock of the given products (all when None) from stock_levels"""
+        for product_id in self.positions if product_ids is None else product_ids:
+            position = self.positions.get(product_id)
+            if position is not None:
+                self.entries[position]["current_stock"] = stock_levels.get(product_id, 0.0)
+    
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Best matches for query, each a copy of the entry plus match_type
+        
+        Tiers, best first: exact SKU/barcode, name starting with the query,
+        SKU/barcode starting with it, names whose words start with every
+        query word, then the query anywhere in name/SKU/barcode (3+
+        characters, via trigrams). Within a tier shorter names win. Tiers
+        are walked lazily in order and the walk stops at limit.
+        """
+        q = normalize(query)
+        if not q or limit < 1:
+            return []
+        
+        found: Dict[int, str] = {}
+        
+        def code_match(position: int) -> str:
+            return "sku" if q in normalize(self.entries[position]["sku"]) else "barcode"
+        
+        def any_match(position: int) -> str:
+            return "name" if q in self.haystacks[position].split("\n", 1)[0] else code_match(position)
+        
+        def take(candidates: Iterable[int], match_type: Callable[[int], str], accept=None) -> bool:
+            for position in candidates:
+                if position in found or (accept is not None and not accept(position)):
+                    continue
+                found[position] = match_type(position)
+                if len(found) >= limit:
+                    return True
+            return False
+        
+        done = (
+            take(self.codes.get(q, ()), code_match)
+            or take(self.names.prefix(q), _name_match)
+            or take(self.code_keys.prefix(q), code_match)
+            or take(self._word_prefix_matches(WORD_RE.findall(q)), _name_match)
+        )
+        if not done and len(q) >= 3:
+            postings = sorted((self.trigrams.get(gram, set()) for gram in trigrams(q)), key=len)
+            haystacks = self.haystacks
+            take(sorted(postings[0].intersection(*postings[1:])), any_match, lambda position: q in haystacks[position])
+        
+        return [dict(self.entries[position], match_type=match_type) for position, match_type in found.items()]
+    
+    def _word_prefix_matches(self, terms: List[str]) -> Iterable[int]:
+        """Positions of names with a word starting with each term, ascending"""
+        terms = list(dict.fromkeys(terms))
+        if len(terms) == 1:
+            return self.words.prefix(terms[0])
+        if not terms:
+            return ()
+        
+        ranges = sorted((self.words.slice(term) for term in terms), key=len)
+        return sorted(set(ranges[0]).intersection(*ranges[1:]))
+
+
+class SearchIndexRegistry:
+    """
+    Per-business indexes of this process, built lazily (LRU + TTL)
+    
+    Safe to share between threadpool threads: lookups hold a short lock,
+    builds run under a per-business lock so concurrent keystrokes build
+    once, and an invalidation that lands during a build keeps the stale
+    result from being cached.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_businesses: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_businesses = max_businesses
+        self.stats = {"builds": 0, "searches": 0, "invalidations": 0, "stock_refreshes": 0, "errors": 0}
+        self._indexes: "OrderedDict[int, ProductIndex]" = OrderedDict()
+        self._stale_stock: Dict[int, Optional[Set[int]]] = {}
+        self._building: Dict[int, Optional[Set[int]]] = {}
+        self._versions: Dict[int, int] = {}
+        self._build_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis
+            
+            self._redis = redis.Redis.from_url(redis_url, decode_responses=True, socket_timeout=0.5)
+    
+    def search(self, session: Session, business_id: int, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        index = self.get(session, business_id)
+        self.stats["searches"] += 1
+        return index.search(query, limit)
+    
+    def get(self, session: Session, business_id: int) -> ProductIndex:
+        """The business's index, built or refreshed first if needed"""
+        generations = self._shared_generations(business_id)
+        with self._lock:
+            index = self._indexes.get(business_id)
+            if index is not None and (
+                index.built_at + self.ttl_seconds < time.monotonic()
+                or (generations and generations[0] != index.generation)
+            ):
+                self._indexes.pop(business_id)
+                index = None
+            if index is None:
+                build_lock = self._build_locks.setdefault(business_id, threading.Lock())
+            else:
+                self._indexes.move_to_end(business_id)
+                stale = self._stale_stock.pop(business_id, set())
+                if generations and generations[1] != index.stock_generation:
+                    stale = None
+        
+        if index is None:
+            with build_lock:
+                return self._build(session, business_id, generations)
+        
+        if stale is None or stale:
+            self._refresh_stock(session, index, stale)
+            if generations:
+                index.stock_generation = generations[1]
+        return index
+    
+    def _build(self, session: Session, business_id: int, generations: Optional[Tuple[str, str]]) -> ProductIndex:
+        with self._lock:
+            # Another thread may have finished the build while we waited
+            index = self._indexes.get(business_id)
+            if index is not None:
+                return index
+            version = self._versions.get(business_id, 0)
+            self._stale_stock.pop(business_id, None)
+            self._building[business_id] = set()
+        
+        try:
+            products = session.exec(
+                select(Product).where(Product.business_id == business_id, Product.is_active == True)
+            ).all()
+            stock_levels = get_stock_levels(session, [product.id for product in products], location="main")
+            index = ProductIndex(products, stock_levels)
+        except Exception:
+            with self._lock:
+                self._building.pop(business_id, None)
+            raise
+        if generations:
+            index.generation, index.stock_generation = generations
+        self.stats["builds"] += 1
+        
+        with self._lock:
+            # Stock that changed while building is refreshed on the next search
+            changed_while_building = self._building.pop(business_id, set())
+            if self._versions.get(business_id, 0) == version:
+                self._indexes[business_id] = index
+                if changed_while_building is None or changed_while_building:
+                    self._stale_stock[business_id] = changed_while_building
+                while len(self._indexes) > self.max_businesses:
+                    self._indexes.popitem(last=False)
+        return index
+    
+    def _refresh_stock(self, session: Session, index: ProductIndex, product_ids: Optional[Set[int]]):
+        ids = list(index.positions) if product_ids is None else [pid for pid in product_ids if pid in index.positions]
+        index.set_stock(get_stock_levels(session, ids, location="main"), ids)
+        self.stats["stock_refreshes"] += 1
+    
+    def invalidate(self, business_id: int, share: bool = True):
+        """Drop a business's index (its catalog changed)"""
+        with self._lock:
+            self._indexes.pop(business_id, None)
+            self._stale_stock.pop(business_id, None)
+            self._versions[business_id] = self._versions.get(business_id, 0) + 1
+            self.stats["invalidations"] += 1
+        if share:
+            self._bump(business_id, "gen")
+    
+    def mark_stock_changed(self, business_id: int, product_ids: Optional[Iterable[int]] = None, share: bool = True):
+        """Refresh these products' stock (all when None) on the next search"""
+        with self._lock:
+            pending = self._building if business_id in self._building else self._stale_stock
+            if business_id in self._indexes or pending is self._building:
+                stale = pending.get(business_id, set())
+                if product_ids is None or stale is None:
+                    pending[business_id] = None
+                else:
+                    pending[business_id] = stale | set(product_ids)
+        if share:
+            self._bump(business_id, "stockgen")
+    
+    def on_changes(self, business_id: int, entities: Dict[str, Set[int]]):
+        """Change log commit listener"""
+        if entities.get(CHANGE_PRODUCT):
+            self.invalidate(business_id)
+        elif entities.get(CHANGE_STOCK):
+            self.mark_stock_changed(business_id, entities[CHANGE_STOCK])
+    
+    def _shared_generations(self, business_id: int) -> Optional[Tuple[str, str]]:
+        if self._redis is None:
+            return None
+        try:
+            catalog, stock = self._redis.mget(f"{KEY_PREFIX}gen:{business_id}", f"{KEY_PREFIX}stockgen:{business_id}")
+            return catalog or "0", stock or "0"
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Search index generation read failed: {e}")
+            return None
+    
+    def _bump(self, business_id: int, kind: str):
+        if self._redis is None:
+            return
+        try:
+            value = self._redis.incr(f"{KEY_PREFIX}{kind}:{business_id}")
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Search index invalidation failed: {e}")
+            return
+        
+        # This process already applied the change: adopt the new generation
+        # if it was current, so it doesn't refresh again for its own write
+        with self._lock:
+            index = self._indexes.get(business_id)
+            if kind == "stockgen" and index is not None and index.stock_generation == str(value - 1):
+                index.stock_generation = str(value)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[SearchIndexRegistry]:
+    """The configured registry, or None when SEARCH_INDEX is "off" """
+    global _registry
+    if settings.SEARCH_INDEX == "off":
+        return None
+    
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SearchIndexRegistry(
+                    settings.SEARCH_INDEX_TTL_SECONDS,
+                    settings.SEARCH_INDEX_MAX_BUSINESSES,
+                    settings.REDIS_URL if settings.SEARCH_INDEX == "redis" else None
+                )
+    return _registry
+
+
+def _on_commit(business_id: int, entities: Dict[str, Set[int]]):
+    registry = get_search_index()
+    if registry is not None:
+        registry.on_changes(business_id, entities)
+
+
+def on_sync_event(business_id: int, event_type: str, payload: Dict[str, Any]):
+    """Apply a broadcast PRODUCT_* / STOCK_UPDATED event (see event_service.publish_sync_event)"""
+    registry = get_search_index()
+    if registry is None:
+        return
+    if event_type.startswith("PRODUCT_"):
+        registry.invalidate(business_id)
+    elif event_type == "STOCK_UPDATED":
+        product_id = payload.get("product_id") if isinstance(payload, dict) else None
+        registry.mark_stock_changed(business_id, [product_id] if product_id else None)
+
+
+add_commit_listener(_on_commit)
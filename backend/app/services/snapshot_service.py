@@ -0,0 +1,214 @@
+"""
+Bootstrap snapshots for the first sync of a new terminal
+
+A snapshot is a gzipped JSON file per business holding the catalog, stock
+levels and customers, plus the change-log cursor it was taken at. A new
+device downloads it once (GET /sync/snapshot) and then pulls incrementally
+from the embedded cursor instead of paging through live tables.
+
+The head seq is read before the tables, so anything committed while the
+snapshot is written is at worst sent again by the first pull (changes are
+idempotent on the client); nothing can be missed.
+
+Files live in SYNC_SNAPSHOT_DIR/<business_id>/ next to a latest.json
+manifest; the previous SYNC_SNAPSHOT_KEEP files are kept so downloads in
+progress survive a regeneration.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+from sqlmodel import Session, select, func
+from app.core.config import settings
+from app.db.session import engine
+from app.models.business import Business
+from app.models.customer import Customer
+from app.models.inventory_stock import StockItem
+from app.models.product import Product
+from app.services.change_log_service import get_head_seq, encode_cursor
+from app.services.sync_service import product_change_data
+
+# Bump when the file layout changes; clients reject versions they don't know
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_NAME = "latest.json"
+ROWS_PER_FETCH = 1000
+
+
+def snapshot_dir(business_id: int) -> Path:
+    return Path(settings.SYNC_SNAPSHOT_DIR) / str(business_id)
+
+
+def get_latest_snapshot(business_id: int) -> Optional[Dict[str, Any]]:
+    """Manifest of the newest snapshot (with its absolute "path"), or None"""
+    directory = snapshot_dir(business_id)
+    try:
+        with open(directory / MANIFEST_NAME, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    manifest["path"] = str(directory / manifest["file"])
+    return manifest if os.path.exists(manifest["path"]) else None
+
+
+def customer_snapshot_data(customer: Customer) -> Dict[str, Any]:
+    """Customer payload sent to clients"""
+    return {
+        "id": customer.id,
+        "name": customer.name,
+        "phone": customer.phone,
+        "email": customer.email,
+        "address": customer.address,
+        "balance": customer.balance,
+        "loyalty_points": customer.loyalty_points,
+    }
+
+
+def _write_rows(f, key: str, rows) -> int:
+    """Write `"key": [row, ...]` one row at a time; returns the row count"""
+    f.write(f',"{key}":[')
+    count = 0
+    for row in rows:
+        if count:
+            f.write(",")
+        f.write(json.dumps(row, separators=(",", ":"), default=str))
+        count += 1
+    f.write("]")
+    return count
+
+
+def write_snapshot(session: Session, business_id: int, force: bool = False) -> Dict[str, Any]:
+    """
+    Write a snapshot of a business and point the manifest at it
+    
+    Skipped (returning the existing manifest) when nothing was logged since
+    the last snapshot, unless force is set. Rows are streamed from the
+    database into the gzip file, so memory stays flat with catalog size.
+    """
+    seq = get_head_seq(session, business_id)
+    latest = get_latest_snapshot(business_id)
+    if latest and not force and latest["seq"] == seq and latest["format_version"] == SNAPSHOT_FORMAT_VERSION:
+        return latest
+    
+    generated_at = datetime.utcnow()
+    cursor = encode_cursor(business_id, seq)
+    directory = snapshot_dir(business_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = f"snapshot-v{SNAPSHOT_FORMAT_VERSION}-{seq}-{generated_at.strftime('%Y%m%d%H%M%S')}.json.gz"
+    
+    stock_levels = dict(session.exec(
+        select(StockItem.product_id, func.sum(StockItem.quantity))
+        .join(Product, Product.id == StockItem.product_id)
+        .where(Product.business_id == business_id)
+        .group_by(StockItem.product_id)
+    ).all())
+    product_statement = (
+        select(Product)
+        .where(Product.business_id == business_id, Product.is_active == True)
+        .order_by(Product.id)
+        .execution_options(yield_per=ROWS_PER_FETCH)
+    )
+    customer_statement = (
+        select(Customer)
+        .where(Customer.business_id == business_id, Customer.is_active == True)
+        .order_by(Customer.id)
+        .execution_options(yield_per=ROWS_PER_FETCH)
+    )
+    
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "business_id": business_id,
+        "generated_at": generated_at.isoformat(),
+        "seq": seq,
+        "cursor": cursor,
+    }
+    counts = {}
+    product_ids = []
+    
+    def product_rows():
+        for product in session.exec(product_statement):
+            product_ids.append(product.id)
+            yield product_change_data(product, stock_levels.get(product.id) or 0.0)
+    
+    # Unique temp names: two workers may write the same business at once
+    raw = tempfile.NamedTemporaryFile(dir=directory, prefix=f".{filename}.", suffix=".tmp", delete=False)
+    tmp_path = Path(raw.name)
+    try:
+        with raw, gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(json.dumps(header, separators=(",", ":"))[:-1])
+            counts["products"] = _write_rows(f, "products", product_rows())
+            counts["stock"] = _write_rows(f, "stock", (
+                {"product_id": product_id, "stock": stock_levels.get(product_id) or 0.0}
+                for product_id in product_ids
+            ))
+            counts["customers"] = _write_rows(f, "customers", (
+                customer_snapshot_data(customer) for customer in session.exec(customer_statement)
+            ))
+            f.write("}")
+        
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        os.chmod(tmp_path, 0o644)  # NamedTemporaryFile creates 0600
+        os.replace(tmp_path, directory / filename)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    manifest = {
+        **header,
+        "file": filename,
+        "size": os.path.getsize(directory / filename),
+        "sha256": digest.hexdigest(),
+        "counts": counts,
+    }
+    raw = tempfile.NamedTemporaryFile(
+        "w", dir=directory, prefix=f".{MANIFEST_NAME}.", suffix=".tmp", encoding="utf-8", delete=False
+    )
+    try:
+        with raw as f:
+            json.dump(manifest, f)
+        os.chmod(raw.name, 0o644)
+        os.replace(raw.name, directory / MANIFEST_NAME)
+    except Exception:
+        Path(raw.name).unlink(missing_ok=True)
+        raise
+    
+    _prune_snapshots(directory, keep=max(1, settings.SYNC_SNAPSHOT_KEEP))
+    manifest["path"] = str(directory / filename)
+    return manifest
+
+
+def _prune_snapshots(directory: Path, keep: int):
+    """Delete all but the newest `keep` snapshot files"""
+    files = sorted(directory.glob("snapshot-*.json.gz"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            path.unlink()
+        except OSError as e:
+            print(f"Failed to remove old snapshot {path}: {e}")
+
+
+def generate_all_snapshots() -> int:
+    """Refresh snapshots of every business (blocking); returns how many were written"""
+    written = 0
+    with Session(engine) as session:
+        business_ids = session.exec(select(Business.id)).all()
+    
+    for business_id in business_ids:
+        # Fresh session per business so one failure doesn't poison the rest
+        with Session(engine) as session:
+            try:
+                before = get_latest_snapshot(business_id)
+                manifest = write_snapshot(session, business_id)
+                if not before or before["file"] != manifest["file"]:
+                    written += 1
+            except Exception as e:
+                print(f"Failed to write sync snapshot for business {business_id}: {e}")
+    return written
@@ -4,6 +4,8 @@ Stock search service with debouncing and highlighting
 from sqlmodel import Session, select, or_
 from app.models.product import Product
 from app.models.inventory_stock import StockItem
+from app.services.inventory_service import get_stock_levels
+from app.services.search_index import get_search_index
 from typing import List, Dict, Any
 import re
 
@@ -17,6 +19,10 @@ def search_products(
     """
     Search products by name, SKU, or barcode
     
+    Served from the in-memory search index (ranked: exact SKU/barcode,
+    then prefixes, then substrings) unless SEARCH_INDEX is "off", in which
+    case it falls back to an ILIKE query.
+    
     Args:
         session: Database session
         business_id: Business ID
@@ -24,11 +30,20 @@ def search_products(
         limit: Maximum results
         
     Returns:
-        List of products with highlighted matches
+        List of products with highlighted matches, best first
     """
     if not query or len(query.strip()) < 1:
         return []
     
+    index = get_search_index()
+    if index is not None:
+        results = index.search(session, business_id, query, limit)
+        for result in results:
+            result["highlighted_name"] = (
+                highlight_text(result["name"], query.strip()) if result["match_type"] == "name" else result["name"]
+            )
+        return results
+    
     query_lower = query.lower().strip()
     
     # Build search conditions
@@ -44,15 +59,10 @@ def search_products(
     
     statement = select(Product).where(*conditions).limit(limit)
     products = session.exec(statement).all()
+    stock_levels = get_stock_levels(session, [product.id for product in products], location="main")
     
-    # Get stock quantities
     results = []
     for product in products:
-        # Get current stock
-        stock_statement = select(StockItem).where(StockItem.product_id == product.id)
-        stock_item = session.exec(stock_statement).first()
-        current_stock = stock_item.quantity if stock_item else 0.0
-        
         # Find match type and highlight
         match_type = None
         highlighted_name = product.name
@@ -74,7 +84,7 @@ def search_products(
             "unit": product.unit_of_measure,
             "selling_price": product.selling_price,
             "buying_price": product.buying_price,
-            "current_stock": current_stock,
+            "current_stock": stock_levels.get(product.id, 0.0),
             "low_stock_threshold": product.low_stock_threshold,
             "match_type": match_type,
         })
@@ -1,13 +1,14 @@
 """
 Stock Take service for inventory counting and shrinkage management
 """
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select, func, update
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from app.models.stock_take import StockTakeSession, StockTakeLine, StockAdjustment
 from app.models.product import Product
-from app.models.inventory_movement import InventoryMovement
 from app.services.activity_service import log_activity
+from app.services.inventory_service import record_movements, get_stock_levels, calculate_stock
+from app.services.outbox_service import notify_outbox
 
 
 def create_stock_take_session(
@@ -32,6 +33,7 @@ def create_stock_take_session(
     # Log activity
     log_activity(
         session=session,
+        business_id=stock_take.business_id,
         user_id=user_id,
         action_type="stock_take_started",
         entity_type="stock_take_session",
@@ -81,7 +83,7 @@ def add_stock_take_counts(
             line = StockTakeLine(
                 session_id=session_id,
                 product_id=product_id,
-                expected_qty=product.current_stock,
+                expected_qty=calculate_stock(session, product_id),
                 counted_by=user_id
             )
         
@@ -140,13 +142,22 @@ def approve_stock_take(
     """
     Approve stock take and apply adjustments
     
-    Creates StockAdjustment records and updates product stock
+    Creates StockAdjustment records and updates product stock. The session
+    is claimed first with a conditional UPDATE (review -> approved): a
+    concurrent approval waits on that row and then finds it approved, so
+    the differences are applied exactly once.
     """
     stock_take = session.get(StockTakeSession, session_id)
     if not stock_take:
         raise ValueError("Stock take session not found")
     
-    if stock_take.status != "review":
+    claimed = session.execute(
+        update(StockTakeSession)
+        .where(StockTakeSession.id == session_id, StockTakeSession.status == "review")
+        .values(status="approved")
+        .returning(StockTakeSession.id)
+    ).scalar_one_or_none()
+    if claimed is None:
         raise ValueError("Stock take must be in review status")
     
     # Get all lines with differences
@@ -157,27 +168,47 @@ def approve_stock_take(
     )
     lines = session.exec(lines_statement).all()
     
-    # Apply adjustments
+    # Lines of products that still belong to the business
+    product_ids = set(session.exec(
+        select(Product.id).where(
+            Product.id.in_([line.product_id for line in lines]),
+            Product.business_id == stock_take.business_id
+        )
+    ).all())
+    lines = [line for line in lines if line.product_id in product_ids]
+    
+    # Apply the counted differences as deltas in one bulk movement, so sales
+    # made between the count and the approval are not overwritten. Unclamped:
+    # each row moves by exactly line.difference, so previous_qty below is
+    # new_qty - difference even if sales took the level under the loss
+    record_movements(
+        session,
+        stock_take.business_id,
+        [
+            {
+                "product_id": line.product_id,
+                "movement_type": "adjustment_up" if line.difference > 0 else "adjustment_down",
+                "quantity": abs(line.difference),
+                "reference": f"stock_take:{session_id}",
+            }
+            for line in lines
+        ],
+        user_id=user_id,
+        branch_id=stock_take.branch_id,
+        commit=False,
+        clamp=False
+    )
+    # The stock rows stay locked by that update until the commit
+    new_levels = get_stock_levels(session, list(product_ids), location="main")
+    
     adjustments = []
     for line in lines:
-        product = session.get(Product, line.product_id)
-        if not product:
-            continue
-        
-        previous_qty = product.current_stock
-        new_qty = line.counted_qty
-        
-        # Update product stock
-        product.current_stock = new_qty
-        product.updated_at = datetime.utcnow()
-        session.add(product)
-        
-        # Create adjustment record
+        new_qty = new_levels.get(line.product_id, 0.0)
         adjustment = StockAdjustment(
             business_id=stock_take.business_id,
             branch_id=stock_take.branch_id,
-            product_id=product.id,
-            previous_qty=previous_qty,
+            product_id=line.product_id,
+            previous_qty=new_qty - line.difference,
             new_qty=new_qty,
             difference=line.difference,
             reason="stock_take",
@@ -187,21 +218,8 @@ def approve_stock_take(
             notes=notes or line.notes,
             adjusted_by=user_id
         )
-        session.add(adjustment)
         adjustments.append(adjustment)
-        
-        # Create inventory movement
-        movement = InventoryMovement(
-            business_id=stock_take.business_id,
-            branch_id=stock_take.branch_id,
-            product_id=product.id,
-            movement_type="adjustment",
-            quantity=line.difference,
-            reference_id=session_id,
-            reference_type="stock_take",
-            notes=f"Stock take adjustment: {line.difference_type}"
-        )
-        session.add(movement)
+    session.add_all(adjustments)
     
     # Update session status
     stock_take.status = "approved"
@@ -211,11 +229,13 @@ def approve_stock_take(
     session.add(stock_take)
     
     session.commit()
+    notify_outbox()
     session.refresh(stock_take)
     
     # Log activity
     log_activity(
         session=session,
+        business_id=stock_take.business_id,
         user_id=user_id,
         action_type="stock_take_approved",
         entity_type="stock_take_session",
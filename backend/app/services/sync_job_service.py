@@ -0,0 +1,218 @@
+"""
+Background sync push jobs
+
+A large /sync/push can be accepted as a SyncPushJob instead of being
+applied inside the request: the client gets 202 and a job id right away and
+polls for per-action results while the worker pool applies the actions
+(app/core/sync_push_worker.py). Actions stay idempotent by action_id, so a
+job picked up again after a worker died simply skips what was already done.
+"""
+import hashlib
+import uuid
+from sqlmodel import Session, select, or_, and_
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.db.session import engine
+from app.models.sync import SyncPushJob
+from app.services.sync_service import process_sync_actions, update_sync_state
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Set by the worker pool so new jobs start without waiting a poll
+_wake_callback: Optional[Callable[[], None]] = None
+
+
+def set_sync_push_wake_callback(callback: Optional[Callable[[], None]]) -> None:
+    """Install the function that wakes the worker pool (thread-safe)"""
+    global _wake_callback
+    _wake_callback = callback
+
+
+def notify_sync_push_jobs() -> None:
+    """Wake the push workers after committing a new job"""
+    if _wake_callback:
+        _wake_callback()
+
+
+def push_fingerprint(actions: List[Dict[str, Any]]) -> str:
+    """Identity of a push: hash of its action ids in order"""
+    return hashlib.sha256("\n".join(str(action["id"]) for action in actions).encode()).hexdigest()
+
+
+def create_push_job(
+    session: Session,
+    user_id: int,
+    business_id: int,
+    actions: List[Dict[str, Any]],
+    device_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> Tuple[SyncPushJob, bool]:
+    """
+    Queue a push, or return the job it duplicates; returns (job, created)
+    
+    With an Idempotency-Key the same key always maps to the same job.
+    Without one, a retry of a push that is still queued or running (same
+    action ids) gets the existing job instead of a second copy.
+    """
+    fingerprint = push_fingerprint(actions)
+    existing = _find_duplicate_job(session, user_id, fingerprint, idempotency_key)
+    if existing:
+        return existing, False
+    
+    job = SyncPushJob(
+        job_id=uuid.uuid4().hex,
+        user_id=user_id,
+        business_id=business_id,
+        device_id=device_id,
+        idempotency_key=idempotency_key,
+        fingerprint=fingerprint,
+        actions=jsonable_encoder(actions),
+        total_actions=len(actions)
+    )
+    session.add(job)
+    try:
+        session.commit()
+    except IntegrityError:
+        # Concurrent retry with the same Idempotency-Key won the insert
+        session.rollback()
+        return _find_duplicate_job(session, user_id, fingerprint, idempotency_key), False
+    
+    session.refresh(job)
+    notify_sync_push_jobs()
+    return job, True
+
+
+def _find_duplicate_job(
+    session: Session,
+    user_id: int,
+    fingerprint: str,
+    idempotency_key: Optional[str]
+) -> Optional[SyncPushJob]:
+    statement = select(SyncPushJob).where(SyncPushJob.user_id == user_id)
+    if idempotency_key:
+        statement = statement.where(SyncPushJob.idempotency_key == idempotency_key)
+    else:
+        statement = statement.where(
+            SyncPushJob.fingerprint == fingerprint,
+            SyncPushJob.status.in_([JOB_QUEUED, JOB_RUNNING])
+        )
+    return session.exec(statement.order_by(SyncPushJob.id.desc())).first()
+
+
+def get_push_job(session: Session, job_id: str, user_id: int) -> Optional[SyncPushJob]:
+    """A user's job by its public id"""
+    return session.exec(
+        select(SyncPushJob).where(SyncPushJob.job_id == job_id, SyncPushJob.user_id == user_id)
+    ).first()
+
+
+def claim_push_job(session: Session) -> Optional[SyncPushJob]:
+    """
+    Mark the oldest runnable job as running and commit
+    
+    Runnable means queued, or running without a heartbeat for
+    SYNC_PUSH_JOB_STALE_MINUTES (its worker is presumed dead; a live worker
+    refreshes heartbeat_at after every chunk). SKIP LOCKED keeps concurrent
+    workers from claiming the same job.
+    """
+    stale_before = datetime.utcnow() - timedelta(minutes=settings.SYNC_PUSH_JOB_STALE_MINUTES)
+    statement = (
+        select(SyncPushJob)
+        .where(or_(
+            SyncPushJob.status == JOB_QUEUED,
+            and_(SyncPushJob.status == JOB_RUNNING, SyncPushJob.heartbeat_at < stale_before)
+        ))
+        .order_by(SyncPushJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = session.exec(statement).first()
+    if job is None:
+        return None
+    
+    job.status = JOB_RUNNING
+    job.attempts += 1
+    job.started_at = job.heartbeat_at = datetime.utcnow()
+    session.add(job)
+    session.commit()
+    return job
+
+
+def process_next_push_job() -> bool:
+    """Claim and run one job (blocking); returns False when none was runnable"""
+    with Session(engine) as session:
+        job = claim_push_job(session)
+        if job is None:
+            return False
+        
+        if job.attempts > settings.SYNC_PUSH_JOB_MAX_ATTEMPTS:
+            job.status = JOB_FAILED
+            job.finished_at = datetime.utcnow()
+            job.last_error = job.last_error or "Worker stopped while processing the job"
+            session.add(job)
+            session.commit()
+            return True
+        
+        def record_progress(done: int):
+            job.completed_actions = done
+            job.heartbeat_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+        
+        try:
+            processed_ids, failed_ids, errors = process_sync_actions(
+                session,
+                job.user_id,
+                job.business_id,
+                job.actions,
+                device_id=job.device_id,
+                on_chunk=record_progress
+            )
+            update_sync_state(session, job.user_id, job.device_id)
+            
+            job.status = JOB_DONE
+            job.completed_actions = len(processed_ids) + len(failed_ids)
+            job.processed_ids = processed_ids
+            job.failed_ids = failed_ids
+            job.errors = errors
+            job.last_error = None
+            job.finished_at = datetime.utcnow()
+        except Exception as e:
+            session.rollback()
+            print(f"Sync push job {job.job_id} attempt {job.attempts} failed: {e}")
+            job.last_error = str(e)
+            if job.attempts >= settings.SYNC_PUSH_JOB_MAX_ATTEMPTS:
+                job.status = JOB_FAILED
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = JOB_QUEUED
+        
+        session.add(job)
+        session.commit()
+    return True
+
+
+def push_job_status(job: SyncPushJob) -> Dict[str, Any]:
+    """Status payload polled by the client"""
+    finished = job.status in (JOB_DONE, JOB_FAILED)
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "success": job.status == JOB_DONE and not job.failed_ids if finished else None,
+        "total_actions": job.total_actions,
+        "completed_actions": job.completed_actions,
+        "processed_ids": job.processed_ids or [],
+        "failed_ids": job.failed_ids or [],
+        "errors": job.errors or {},
+        "error": job.last_error if job.status == JOB_FAILED else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "heartbeat_at": job.heartbeat_at,
+        "finished_at": job.finished_at
+    }
@@ -2,21 +2,45 @@
 Sync service for offline-first multi-device synchronization
 """
 from sqlmodel import Session, select, func
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
 from app.models.sync import SyncState, SyncAction
 from app.models.product import Product
-from app.models.pos import Sale
+from app.models.pos import Sale, SaleItem
 from app.models.invoice import Invoice
 from app.models.inventory_movement import InventoryMovement
 from app.services.pos_service import checkout as pos_checkout
+from app.services.outbox_service import notify_outbox
+from app.services.inventory_service import apply_stock_delta, get_stock_levels, ALL_MOVEMENT_TYPES
+from app.services.conflict_resolution import log_sync_errors
+from app.core.sync_cache import get_delta_cache
+from app.services.change_log_service import (
+    CHANGE_PRODUCT,
+    CHANGE_STOCK,
+    CHANGE_SALE,
+    get_change_page,
+    get_head_seq,
+    record_change,
+    encode_cursor,
+    decode_cursor
+)
 
 
 def get_or_create_sync_state(session: Session, user_id: int, device_id: Optional[str] = None) -> SyncState:
-    """Get or create sync state for user/device"""
+    """
+    Get or create sync state for user/device
+    
+    Each device keeps its own checkpoint; requests without a device_id share
+    the user's device-less row.
+    """
     statement = select(SyncState).where(SyncState.user_id == user_id)
     if device_id:
         statement = statement.where(SyncState.device_id == device_id)
+    else:
+        statement = statement.where(SyncState.device_id.is_(None))
     
     sync_state = session.exec(statement).first()
     
@@ -47,121 +71,320 @@ def process_sync_actions(
     session: Session,
     user_id: int,
     business_id: int,
-    actions: List[Dict[str, Any]]
+    actions: List[Dict[str, Any]],
+    chunk_size: Optional[int] = None,
+    device_id: Optional[str] = None,
+    on_chunk: Optional[Callable[[int], None]] = None
 ) -> Tuple[List[str], List[str], Dict[str, str]]:
     """
     Process sync actions from client
     
+    Actions are applied in order in chunks of `chunk_size`, one transaction
+    per chunk with a savepoint per action, so a bad action only rolls back
+    itself and a long push costs one commit per chunk rather than per
+    action. A chunk shares one query for already-known action_ids
+    (idempotency), the change-log numbering (taken at its commit), the
+    outbox wakeup and the delta-cache invalidation. Changes are tagged with
+    the pushing device_id so its own pulls don't echo them back. on_chunk
+    is called with the number of actions done so far after each chunk.
+    
     Returns: (processed_ids, failed_ids, errors)
     """
+    chunk_size = chunk_size or settings.SYNC_PUSH_CHUNK_SIZE
     processed_ids = []
     failed_ids = []
     errors = {}
     
+    for start in range(0, len(actions), chunk_size):
+        chunk = actions[start:start + chunk_size]
+        for action_id, error in _process_action_chunk(session, user_id, business_id, chunk, device_id):
+            if error is None:
+                processed_ids.append(action_id)
+            else:
+                failed_ids.append(action_id)
+                errors[action_id] = error
+        
+        if on_chunk:
+            on_chunk(len(processed_ids) + len(failed_ids))
+    
+    return processed_ids, failed_ids, errors
+
+
+def _process_action_chunk(
+    session: Session,
+    user_id: int,
+    business_id: int,
+    actions: List[Dict[str, Any]],
+    device_id: Optional[str] = None
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Apply one chunk of actions in one transaction; returns (action_id, error) pairs
+    
+    An action is claimed by writing its SyncAction row inside the action's
+    savepoint (see _claim_sync_action), so a concurrent push of the same
+    action_id (e.g. a client retry) waits for this chunk and then skips it
+    instead of applying it twice. A failed action's savepoint is rolled
+    back and its failure recorded in the chunk's transaction. Conflicts
+    reported by a successful action (e.g. stock driven negative) are
+    written to SyncError in its savepoint.
+    
+    Stock rows and document sequences taken by the chunk's sales stay
+    locked until the chunk commits. Should that deadlock with a live
+    checkout, Postgres aborts one side: if it is the action, only its
+    savepoint rolls back and it is reported failed, to be retried on the
+    next push.
+    """
+    action_ids = [action_data['id'] for action_data in actions]
+    known = dict(session.exec(
+        select(SyncAction.action_id, SyncAction.status).where(SyncAction.action_id.in_(action_ids))
+    ).all())
+    
+    results = []
     for action_data in actions:
         action_id = action_data['id']
         action_type = action_data['type']
         payload = action_data['payload']
         
+        if known.get(action_id) == "processed":
+            results.append((action_id, None))
+            continue
+        
+        error = None
+        conflicts = []
         try:
-            # Check if already processed (idempotency)
-            existing = session.exec(
-                select(SyncAction).where(SyncAction.action_id == action_id)
-            ).first()
-            
-            if existing and existing.status == "processed":
-                processed_ids.append(action_id)
-                continue
-            
-            # Create sync action record
-            sync_action = SyncAction(
+            with session.begin_nested():
+                # Not claimed when a concurrent push applied it first
+                if _claim_sync_action(session, user_id, action_id, action_type, payload, action_id in known):
+                    apply_sync_action(
+                        session, user_id, business_id, action_type, payload, device_id, conflicts
+                    )
+                    _finish_sync_action(session, action_id)
+                    if conflicts:
+                        log_sync_errors(session, [
+                            {**conflict, "business_id": business_id, "user_id": user_id,
+                             "device_id": device_id, "sync_action_id": action_id}
+                            for conflict in conflicts
+                        ])
+        except Exception as e:
+            # Failed actions are retried on the next push; keep a single row per action_id
+            error = str(e)
+            _finish_sync_action(session, action_id, error, user_id, action_type, payload)
+        
+        known[action_id] = "processed" if error is None else "failed"
+        results.append((action_id, error))
+    
+    session.commit()
+    notify_outbox()
+    
+    # Other devices' next pull rebuilds the delta instead of reusing a cached page
+    cache = get_delta_cache()
+    if cache:
+        cache.invalidate(business_id)
+    return results
+
+
+def _claim_sync_action(
+    session: Session,
+    user_id: int,
+    action_id: str,
+    action_type: str,
+    payload: Dict[str, Any],
+    known: bool
+) -> bool:
+    """
+    Mark an action as being applied by this transaction; False if it is already done
+    
+    New action_ids are inserted with ON CONFLICT DO NOTHING, previously
+    failed ones are flipped back to pending only while still failed. Either
+    statement waits on a concurrent push holding the same row and then sees
+    its committed outcome, so exactly one of them applies the action.
+    """
+    table = SyncAction.__table__
+    if not known:
+        claimed = session.execute(
+            insert(table)
+            .values(
                 user_id=user_id,
                 action_id=action_id,
                 action_type=action_type,
                 payload=payload,
-                status="pending"
+                status="pending",
+                created_at=datetime.utcnow()
             )
-            session.add(sync_action)
-            session.commit()
-            
-            # Process based on type
-            if action_type == "sale":
-                # Process POS sale
-                result = pos_checkout(
-                    session=session,
-                    user_id=user_id,
-                    business_id=business_id,
-                    items=payload.get('items', []),
-                    payment_method=payload.get('payment_method', 'cash'),
-                    customer_name=payload.get('customer_name'),
-                    customer_phone=payload.get('customer_phone'),
-                    discount=payload.get('discount', 0.0),
-                    notes=payload.get('notes')
-                )
-                sync_action.status = "processed"
-                sync_action.processed_at = datetime.utcnow()
-                
-            elif action_type == "stock_update":
-                # Update stock level (last-write-wins)
-                product_id = payload.get('product_id')
-                new_stock = payload.get('stock')
-                
-                product = session.get(Product, product_id)
-                if product and product.business_id == business_id:
-                    product.current_stock = new_stock
-                    product.updated_at = datetime.utcnow()
-                    session.add(product)
-                    sync_action.status = "processed"
-                    sync_action.processed_at = datetime.utcnow()
-                else:
-                    raise ValueError(f"Product {product_id} not found")
-                    
-            elif action_type == "product_update":
-                # Update product (last-write-wins)
-                product_id = payload.get('product_id')
-                updates = payload.get('updates', {})
-                
-                product = session.get(Product, product_id)
-                if product and product.business_id == business_id:
-                    # Apply updates
-                    for key, value in updates.items():
-                        if hasattr(product, key) and key not in ['id', 'business_id', 'created_at']:
-                            setattr(product, key, value)
-                    product.updated_at = datetime.utcnow()
-                    session.add(product)
-                    sync_action.status = "processed"
-                    sync_action.processed_at = datetime.utcnow()
-                else:
-                    raise ValueError(f"Product {product_id} not found")
-            
-            else:
-                raise ValueError(f"Unknown action type: {action_type}")
-            
-            session.add(sync_action)
-            session.commit()
-            processed_ids.append(action_id)
-            
-        except Exception as e:
-            session.rollback()
-            failed_ids.append(action_id)
-            errors[action_id] = str(e)
-            
-            # Mark action as failed
-            try:
-                sync_action = SyncAction(
-                    user_id=user_id,
-                    action_id=action_id,
-                    action_type=action_type,
-                    payload=payload,
-                    status="failed",
-                    error_message=str(e)
-                )
-                session.add(sync_action)
-                session.commit()
-            except:
-                pass
+            .on_conflict_do_nothing(index_elements=["action_id"])
+            .returning(table.c.id)
+        ).scalar_one_or_none()
+        if claimed is not None:
+            return True
     
-    return processed_ids, failed_ids, errors
+    return session.execute(
+        update(table)
+        .where(table.c.action_id == action_id, table.c.status == "failed")
+        .values(status="pending", error_message=None)
+        .returning(table.c.id)
+    ).scalar_one_or_none() is not None
+
+
+def _finish_sync_action(
+    session: Session,
+    action_id: str,
+    error: Optional[str] = None,
+    user_id: Optional[int] = None,
+    action_type: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None
+) -> None:
+    """Record an action's outcome (a failure is written after its savepoint rolled back)"""
+    table = SyncAction.__table__
+    if error is None:
+        session.execute(
+            update(table)
+            .where(table.c.action_id == action_id)
+            .values(status="processed", error_message=None, processed_at=datetime.utcnow())
+        )
+        return
+    
+    # Never downgrade an action a concurrent push has processed meanwhile
+    session.execute(
+        insert(table)
+        .values(
+            user_id=user_id,
+            action_id=action_id,
+            action_type=action_type,
+            payload=payload,
+            status="failed",
+            error_message=error,
+            created_at=datetime.utcnow()
+        )
+        .on_conflict_do_update(
+            index_elements=["action_id"],
+            set_={"status": "failed", "error_message": error, "processed_at": None},
+            where=table.c.status != "processed"
+        )
+    )
+
+
+def apply_sync_action(
+    session: Session,
+    user_id: int,
+    business_id: int,
+    action_type: str,
+    payload: Dict[str, Any],
+    device_id: Optional[str] = None,
+    conflicts: Optional[List[Dict[str, Any]]] = None
+) -> None:
+    """
+    Apply one client action inside the caller's transaction (never commits)
+    
+    Conflicts worth reporting are appended to `conflicts` as SyncError
+    fields (error_type, error_msg, payload).
+    """
+    if conflicts is None:
+        conflicts = []
+    
+    if action_type == "sale":
+        # Process POS sale
+        pos_checkout(
+            session=session,
+            user_id=user_id,
+            business_id=business_id,
+            items=payload.get('items', []),
+            payment_method=payload.get('payment_method', 'cash'),
+            customer_name=payload.get('customer_name'),
+            customer_phone=payload.get('customer_phone'),
+            discount=payload.get('discount', 0.0),
+            notes=payload.get('notes'),
+            device_id=device_id,
+            commit=False
+        )
+    
+    elif action_type == "stock_delta":
+        # Signed stock change tied to a client movement id; deltas from
+        # several offline terminals commute, and a replay is a no-op
+        product_id = payload.get('product_id')
+        movement_id = payload.get('movement_id')
+        if not movement_id:
+            raise ValueError("stock_delta requires a movement_id")
+        delta = float(payload.get('delta', 0))
+        movement_type = payload.get('movement_type')
+        if movement_type is not None and movement_type not in ALL_MOVEMENT_TYPES:
+            raise ValueError(f"Invalid movement_type: {movement_type}")
+        
+        product = session.get(Product, product_id)
+        if not product or product.business_id != business_id:
+            raise ValueError(f"Product {product_id} not found")
+        
+        quantity = apply_stock_delta(
+            session,
+            product.id,
+            delta,
+            client_movement_id=movement_id,
+            location=payload.get('location') or "main",
+            movement_type=movement_type,
+            branch_id=payload.get('branch_id'),
+            user_id=user_id,
+            reference=payload.get('reference')
+        )
+        if quantity is None:
+            # Already applied by an earlier push
+            return
+        
+        record_change(session, business_id, CHANGE_STOCK, product.id, device_id=device_id)
+        if quantity < 0:
+            conflicts.append({
+                "error_type": "negative_stock",
+                "error_msg": f"Stock of {product.name} is {quantity} after delta {delta}",
+                "payload": {"product_id": product.id, "movement_id": movement_id, "delta": delta, "quantity": quantity}
+            })
+    
+    elif action_type == "stock_update":
+        # Absolute stock level (legacy clients, last-write-wins): applied as
+        # the delta from the current level so it is a tracked movement too
+        product_id = payload.get('product_id')
+        new_stock = float(payload.get('stock', 0))
+        
+        product = session.get(Product, product_id)
+        if not product or product.business_id != business_id:
+            raise ValueError(f"Product {product_id} not found")
+        
+        # Read the location the delta is applied to (other locations keep their stock)
+        current = get_stock_levels(session, [product.id], location="main").get(product.id, 0.0)
+        apply_stock_delta(session, product.id, new_stock - current, user_id=user_id, reference="sync stock_update")
+        record_change(session, business_id, CHANGE_STOCK, product.id, device_id=device_id)
+        
+        # The client overwrote a level that moved since it last saw it
+        base_stock = payload.get('base_stock')
+        if base_stock is not None and float(base_stock) != current:
+            conflicts.append({
+                "error_type": "conflict",
+                "error_msg": f"Stock of {product.name} changed on the server ({base_stock} -> {current}) "
+                             f"before being overwritten with {new_stock}",
+                "payload": {"product_id": product.id, "base_stock": base_stock, "server_stock": current, "stock": new_stock}
+            })
+    
+    elif action_type == "product_update":
+        # Update product (last-write-wins)
+        product_id = payload.get('product_id')
+        updates = payload.get('updates', {})
+        
+        product = session.get(Product, product_id)
+        if product and product.business_id == business_id:
+            # Apply updates
+            applied = []
+            for key, value in updates.items():
+                if hasattr(product, key) and key not in ['id', 'business_id', 'created_at']:
+                    setattr(product, key, value)
+                    applied.append(key)
+            product.updated_at = datetime.utcnow()
+            session.add(product)
+            record_change(session, business_id, CHANGE_PRODUCT, product.id, fields=applied, device_id=device_id)
+        else:
+            raise ValueError(f"Product {product_id} not found")
+    
+    else:
+        raise ValueError(f"Unknown action type: {action_type}")
+    
+    # Surface constraint errors inside the action's savepoint
+    session.flush()
 
 
 def get_sync_changes(
@@ -171,13 +394,16 @@ def get_sync_changes(
     since: Optional[datetime] = None
 ) -> List[Dict[str, Any]]:
     """
-    Get changes since last sync (delta sync)
+    Get changes since last sync (legacy timestamp delta sync)
     
     Returns changes for:
     - Products (created/updated)
     - Stock levels (updated)
     - Sales (created)
-    - Invoices (created)
+    
+    Built from a fixed number of set-based queries (products, latest
+    movement per product, stock totals, sales, sale items) however many
+    entities changed.
     """
     changes = []
     
@@ -192,58 +418,41 @@ def get_sync_changes(
     )
     products = session.exec(product_statement).all()
     
+    # Stock changes: latest movement time per product of this business
+    movement_statement = (
+        select(InventoryMovement.product_id, func.max(InventoryMovement.created_at))
+        .join(Product, Product.id == InventoryMovement.product_id)
+        .where(
+            Product.business_id == business_id,
+            InventoryMovement.created_at >= since
+        )
+        .group_by(InventoryMovement.product_id)
+    )
+    moved = dict(session.exec(movement_statement).all())
+    
+    # Current stock for every product we report, in one grouped query
+    stock_levels = get_stock_levels(session, list({p.id for p in products} | set(moved)))
+    
     for product in products:
         changes.append({
             "type": "product",
             "entity_id": product.id,
-            "data": {
-                "id": product.id,
-                "name": product.name,
-                "sale_price": product.sale_price,
-                "current_stock": product.current_stock,
-                "sku": product.sku,
-                "barcode": product.barcode,
-                "unit": product.unit,
-                "min_stock": product.min_stock,
-            },
+            "data": product_change_data(product, stock_levels.get(product.id, 0.0)),
             "updated_at": product.updated_at,
             "action": "updated" if product.created_at < since else "created"
         })
     
-    # Stock changes (from inventory movements)
-    # Filter movements through products that belong to this business
-    movement_statement = select(InventoryMovement).join(Product).where(
-        Product.business_id == business_id,
-        InventoryMovement.created_at >= since
-    )
-    movements = session.exec(movement_statement).all()
-    
-    # Group by product and get latest stock
-    product_stocks = {}
-    for movement in movements:
-        if movement.product_id not in product_stocks:
-            product_stocks[movement.product_id] = {
-                "product_id": movement.product_id,
-                "updated_at": movement.created_at
-            }
-        else:
-            if movement.created_at > product_stocks[movement.product_id]["updated_at"]:
-                product_stocks[movement.product_id]["updated_at"] = movement.created_at
-    
-    # Get current stock for changed products
-    for product_id, stock_info in product_stocks.items():
-        product = session.get(Product, product_id)
-        if product:
-            changes.append({
-                "type": "stock",
-                "entity_id": product_id,
-                "data": {
-                    "product_id": product_id,
-                    "stock": product.current_stock,
-                },
-                "updated_at": stock_info["updated_at"],
-                "action": "updated"
-            })
+    for product_id, updated_at in moved.items():
+        changes.append({
+            "type": "stock",
+            "entity_id": product_id,
+            "data": {
+                "product_id": product_id,
+                "stock": stock_levels.get(product_id, 0.0),
+            },
+            "updated_at": updated_at,
+            "action": "updated"
+        })
     
     # Sales (created)
     sale_statement = select(Sale).where(
@@ -252,31 +461,12 @@ def get_sync_changes(
     ).order_by(Sale.created_at.desc()).limit(100)  # Limit to prevent huge payloads
     
     sales = session.exec(sale_statement).all()
+    sale_items = get_sale_items(session, [sale.id for sale in sales])
     for sale in sales:
-        # Get sale items
-        sale_items = session.exec(
-            select(SaleItem).where(SaleItem.sale_id == sale.id)
-        ).all()
-        
         changes.append({
             "type": "sale",
             "entity_id": sale.id,
-            "data": {
-                "id": sale.id,
-                "total": sale.total,
-                "payment_method": sale.payment_method,
-                "created_at": sale.created_at.isoformat(),
-                "items": [
-                    {
-                        "product_id": item.product_id,
-                        "product_name": item.product_name,
-                        "quantity": item.quantity,
-                        "unit_price": item.unit_price,
-                        "subtotal": item.subtotal
-                    }
-                    for item in sale_items
-                ]
-            },
+            "data": sale_change_data(sale, sale_items.get(sale.id, [])),
             "updated_at": sale.created_at,
             "action": "created"
         })
@@ -286,3 +476,238 @@ def get_sync_changes(
     
     return changes
 
+
+def get_sync_changes_page(
+    session: Session,
+    business_id: int,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    device_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    One page of the change log after `cursor` (cursor-based delta sync)
+    
+    Entries for the same entity within the page collapse into one change
+    carrying the entity's current state. Pass the returned cursor to get the
+    next page; keep pulling while has_more is true.
+    
+    Updated products whose log entries name the changed fields carry only
+    those fields (listed in the change's "fields"); otherwise the full
+    payload is sent and "fields" is None.
+    
+    With device_id, entries that device pushed itself are skipped (an entity
+    also changed by someone else in the page is still sent, in its current
+    state). The cursor still advances past them, so a page may come back
+    empty with has_more true.
+    
+    The database work is shared by all devices of the business through the
+    delta cache (get_delta_page); only the per-device filtering runs here.
+    
+    Returns: {"changes": [...], "cursor": str, "seq": int, "has_more": bool}
+    Raises ValueError for an invalid cursor.
+    """
+    limit = min(limit or settings.SYNC_PULL_PAGE_SIZE, settings.SYNC_PULL_MAX_PAGE_SIZE)
+    after_seq = decode_cursor(cursor, business_id)
+    page = get_delta_page(session, business_id, after_seq, limit)
+    entries, payloads = page["entries"], page["payloads"]
+    
+    # Latest entry per entity (dict keeps first-seen order, so re-insert to move to the end)
+    latest: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    created = set()
+    # Union of changed fields per entity; None once any entry changed everything
+    changed_fields: Dict[Tuple[str, int], Optional[set]] = {}
+    for entry in entries:
+        if device_id and entry["device_id"] == device_id:
+            continue
+        key = (entry["entity_type"], entry["entity_id"])
+        latest.pop(key, None)
+        latest[key] = entry
+        if entry["action"] == "created":
+            created.add(key)
+        
+        entry_fields = set(entry["fields"]) if entry["fields"] is not None else None
+        if key not in changed_fields:
+            changed_fields[key] = entry_fields
+        elif changed_fields[key] is not None:
+            changed_fields[key] = changed_fields[key] | entry_fields if entry_fields is not None else None
+    
+    changes = []
+    for (entity_type, entity_id), entry in latest.items():
+        action = entry["action"]
+        if action != "deleted" and (entity_type, entity_id) in created:
+            action = "created"
+        
+        fields = None
+        payload = payloads.get(f"{entity_type}:{entity_id}")
+        if payload is None:
+            # Gone since the change was logged
+            data = {"id": entity_id}
+            action = "deleted"
+        elif entity_type == CHANGE_PRODUCT and action == "updated" and changed_fields.get((entity_type, entity_id)) is not None:
+            # Only what changed; clients merge it into their copy
+            fields = sorted({
+                PRODUCT_PAYLOAD_FIELDS[field]
+                for field in changed_fields[(entity_type, entity_id)]
+                if field in PRODUCT_PAYLOAD_FIELDS
+            })
+            data = {"id": entity_id, **{field: payload[field] for field in fields}}
+        else:
+            # Cached payloads are shared between requests - never hand them out
+            data = dict(payload)
+        
+        changes.append({
+            "type": entity_type,
+            "entity_id": entity_id,
+            "data": data,
+            "updated_at": datetime.fromisoformat(entry["created_at"]),
+            "action": action,
+            "seq": entry["seq"],
+            "fields": fields
+        })
+    
+    last_seq = entries[-1]["seq"] if entries else after_seq
+    return {
+        "changes": changes,
+        "cursor": encode_cursor(business_id, last_seq),
+        "seq": last_seq,
+        "has_more": page["has_more"]
+    }
+
+
+def get_delta_page(session: Session, business_id: int, after_seq: int, limit: int) -> Dict[str, Any]:
+    """
+    Device-independent part of a pull page, through the delta cache
+    
+    Pages are keyed by (after_seq, limit, head seq of the business): once a
+    new change is logged the head moves and older pages are never served
+    again, and sync pushes also invalidate the business explicitly. A pull
+    that is caught up costs a single head query.
+    """
+    cache = get_delta_cache()
+    if cache is None:
+        return build_delta_page(session, business_id, after_seq, limit)
+    
+    head_seq = get_head_seq(session, business_id)
+    if after_seq >= head_seq:
+        return {"entries": [], "payloads": {}, "has_more": False}
+    
+    key = f"{after_seq}:{limit}:{head_seq}"
+    page = cache.get(business_id, key)
+    if page is None:
+        page = build_delta_page(session, business_id, after_seq, limit)
+        cache.set(business_id, key, page)
+    return page
+
+
+def build_delta_page(session: Session, business_id: int, after_seq: int, limit: int) -> Dict[str, Any]:
+    """
+    Change-log entries after a seq plus the current payload of every entity
+    they touch, loaded with one query per entity type
+    
+    JSON-serializable: {"entries": [...], "payloads": {"type:id": data},
+    "has_more": bool}. Entities that no longer exist have no payload.
+    """
+    entries, has_more = get_change_page(session, business_id, after_seq, limit)
+    
+    product_ids = list({entry.entity_id for entry in entries if entry.entity_type in (CHANGE_PRODUCT, CHANGE_STOCK)})
+    sale_ids = list({entry.entity_id for entry in entries if entry.entity_type == CHANGE_SALE})
+    
+    products = {
+        product.id: product
+        for product in session.exec(
+            select(Product).where(Product.business_id == business_id, Product.id.in_(product_ids))
+        ).all()
+    } if product_ids else {}
+    stock_levels = get_stock_levels(session, list(products))
+    sales = {
+        sale.id: sale
+        for sale in session.exec(
+            select(Sale).where(Sale.business_id == business_id, Sale.id.in_(sale_ids))
+        ).all()
+    } if sale_ids else {}
+    sale_items = get_sale_items(session, list(sales))
+    
+    payloads = {}
+    for entry in entries:
+        key = f"{entry.entity_type}:{entry.entity_id}"
+        if key in payloads:
+            continue
+        if entry.entity_type == CHANGE_PRODUCT and entry.entity_id in products:
+            payloads[key] = product_change_data(products[entry.entity_id], stock_levels.get(entry.entity_id, 0.0))
+        elif entry.entity_type == CHANGE_STOCK and entry.entity_id in products:
+            payloads[key] = {"product_id": entry.entity_id, "stock": stock_levels.get(entry.entity_id, 0.0)}
+        elif entry.entity_type == CHANGE_SALE and entry.entity_id in sales:
+            payloads[key] = sale_change_data(sales[entry.entity_id], sale_items.get(entry.entity_id, []))
+    
+    return {
+        "entries": [
+            {
+                "seq": entry.seq,
+                "entity_type": entry.entity_type,
+                "entity_id": entry.entity_id,
+                "action": entry.action,
+                "fields": entry.fields,
+                "device_id": entry.device_id,
+                "created_at": entry.created_at.isoformat()
+            }
+            for entry in entries
+        ],
+        "payloads": payloads,
+        "has_more": has_more
+    }
+
+
+def get_sale_items(session: Session, sale_ids: List[int]) -> Dict[int, List[SaleItem]]:
+    """Sale items grouped by sale (one IN query)"""
+    if not sale_ids:
+        return {}
+    
+    grouped: Dict[int, List[SaleItem]] = {}
+    for item in session.exec(select(SaleItem).where(SaleItem.sale_id.in_(sale_ids))).all():
+        grouped.setdefault(item.sale_id, []).append(item)
+    return grouped
+
+
+# Product model field -> key in the product change payload
+PRODUCT_PAYLOAD_FIELDS = {
+    "name": "name",
+    "selling_price": "sale_price",
+    "sku": "sku",
+    "barcode": "barcode",
+    "unit_of_measure": "unit",
+    "low_stock_threshold": "min_stock",
+}
+
+
+def product_change_data(product: Product, stock: float) -> Dict[str, Any]:
+    """Product payload sent to clients"""
+    return {
+        "id": product.id,
+        "name": product.name,
+        "sale_price": product.sale_price,
+        "current_stock": stock,
+        "sku": product.sku,
+        "barcode": product.barcode,
+        "unit": product.unit,
+        "min_stock": product.min_stock,
+    }
+
+
+def sale_change_data(sale: Sale, items: List[SaleItem]) -> Dict[str, Any]:
+    """Sale payload sent to clients"""
+    return {
+        "id": sale.id,
+        "total": sale.total,
+        "payment_method": sale.payment_method,
+        "created_at": sale.created_at.isoformat(),
+        "items": [
+            {
+                "product_id": item.product_id,
+                "product_name": item.product_name,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "subtotal": item.subtotal
+            }
+            for item in items
+        ]
+    }
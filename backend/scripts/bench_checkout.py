@@ -0,0 +1,111 @@
+"""
+Checkout latency benchmark
+
+Two modes:
+
+* cart sizes (default): runs POS checkout with growing carts and reports
+  latency, SQL statements and commits per checkout. With one product query
+  and one conditional stock UPDATE per line these grow only slowly.
+* concurrent load (--concurrency N): N terminals check out random carts over
+  a shared catalog at the same time and the p50/p95/p99 latency and
+  throughput are reported. Each checkout is a single transaction, so tail
+  latency is bounded by one fsync instead of five.
+
+Usage (from backend/):
+    python -m scripts.bench_checkout --sizes 1 5 10 20 40 --runs 30
+    python -m scripts.bench_checkout --concurrency 16 --checkouts 50 --cart-size 5
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlmodel import Session
+from app.db.session import engine
+from app.services.pos_service import checkout
+from scripts.bench_utils import seed_business, seed_products, count_statements, summarize
+
+
+def _seed(product_count):
+    with Session(engine) as session:
+        business = seed_business(session, "Checkout benchmark")
+        products = seed_products(session, business.id, product_count)
+        return business.user_id, business.id, [p.id for p in products]
+
+
+def run_cart_sizes(sizes, runs):
+    user_id, business_id, product_ids = _seed(max(sizes))
+    
+    print(f"{'cart':>6} {'stmts':>7} {'commits':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for size in sizes:
+        # Reverse order on purpose: stock row locking must not depend on cart order
+        items = [
+            {"product_id": pid, "quantity": 1, "unit_price": 15.0}
+            for pid in reversed(product_ids[:size])
+        ]
+        samples = []
+        statements = commits = 0
+        for _ in range(runs):
+            with Session(engine) as session:
+                with count_statements() as counter:
+                    started = time.perf_counter()
+                    checkout(session, user_id, business_id, items, payment_method="cash")
+                    samples.append((time.perf_counter() - started) * 1000)
+                statements, commits = counter["statements"], counter["commits"]
+        
+        stats = summarize(samples)
+        print(
+            f"{size:>6} {statements:>7} {commits:>8} {stats['mean']:>9.2f} {stats['p50']:>9.2f} "
+            f"{stats['p95']:>9.2f} {stats['p99']:>9.2f}"
+        )
+
+
+def run_concurrent(concurrency, checkouts, cart_size, catalog_size):
+    user_id, business_id, product_ids = _seed(catalog_size)
+    
+    def terminal(seed):
+        rng = random.Random(seed)
+        samples = []
+        for _ in range(checkouts):
+            items = [
+                {"product_id": pid, "quantity": 1, "unit_price": 15.0}
+                for pid in rng.sample(product_ids, cart_size)
+            ]
+            with Session(engine) as session:
+                started = time.perf_counter()
+                checkout(session, user_id, business_id, items, payment_method="cash")
+                samples.append((time.perf_counter() - started) * 1000)
+        return samples
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(terminal, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    samples = [sample for terminal_samples in results for sample in terminal_samples]
+    stats = summarize(samples)
+    print(f"terminals={concurrency} checkouts={len(samples)} cart_size={cart_size} catalog={catalog_size}")
+    print(f"throughput: {len(samples) / elapsed:.1f} checkouts/s")
+    print(
+        f"latency ms: mean={stats['mean']:.2f} p50={stats['p50']:.2f} p95={stats['p95']:.2f} "
+        f"p99={stats['p99']:.2f} max={stats['max']:.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 20, 40], help="Cart sizes to test")
+    parser.add_argument("--runs", type=int, default=30, help="Checkouts per cart size")
+    parser.add_argument("--concurrency", type=int, default=0, help="Concurrent terminals (enables load mode)")
+    parser.add_argument("--checkouts", type=int, default=50, help="Checkouts per terminal in load mode")
+    parser.add_argument("--cart-size", type=int, default=5, help="Cart size in load mode")
+    parser.add_argument("--catalog-size", type=int, default=200, help="Products to pick from in load mode")
+    args = parser.parse_args()
+    
+    if args.concurrency:
+        run_concurrent(args.concurrency, args.checkouts, args.cart_size, args.catalog_size)
+    else:
+        run_cart_sizes(args.sizes, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Product search index benchmark (no database)
+
+Builds app.services.search_index.ProductIndex over --products synthetic
+products and times queries of each kind a cashier types: a scanned barcode,
+a SKU prefix, a name word prefix, two word prefixes and a substring from the
+middle of a name. Each is compared with a linear scan doing what the ILIKE
+fallback does ('%q%' on name, SKU and barcode), which is the floor of the
+old per-keystroke query before any database round trip.
+
+Usage (from backend/):
+    python -m scripts.bench_search_index --products 50000 --queries 2000
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+from app.services.search_index import ProductIndex
+from scripts.bench_utils import summarize
+
+WORDS = [
+    "coca", "cola", "pepsi", "fanta", "sprite", "water", "highland", "ambo", "milk", "bread",
+    "sugar", "salt", "rice", "pasta", "macaroni", "oil", "teff", "flour", "coffee", "tea",
+    "soap", "omo", "detergent", "tissue", "candle", "match", "battery", "biscuit", "chocolate", "juice",
+    "በርበሬ", "ሽሮ", "ቡና", "ዘይት", "ስኳር",
+]
+SIZES = ["250ml", "330ml", "500ml", "1l", "2l", "1kg", "5kg", "small", "large", "pack"]
+
+
+def make_products(count, seed):
+    rng = random.Random(seed)
+    products = []
+    for n in range(1, count + 1):
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3)) + [rng.choice(SIZES)]).title()
+        products.append(SimpleNamespace(
+            id=n,
+            name=f"{name} {n}",
+            sku=f"SKU-{n:06d}",
+            barcode=f"{rng.randrange(10 ** 12, 10 ** 13)}",
+            unit_of_measure="pcs",
+            selling_price=rng.randint(5, 500),
+            buying_price=rng.randint(3, 400),
+            low_stock_threshold=5.0,
+        ))
+    return products
+
+
+def make_queries(products, count, seed):
+    rng = random.Random(seed)
+    queries = {"barcode": [], "sku prefix": [], "word prefix": [], "two words": [], "substring": []}
+    for _ in range(count):
+        product = rng.choice(products)
+        words = product.name.lower().split()
+        queries["barcode"].append(product.barcode)
+        queries["sku prefix"].append(product.sku[:rng.randint(6, 9)])
+        queries["word prefix"].append(words[0][:rng.randint(2, 4)])
+        queries["two words"].append(f"{words[0][:3]} {words[1][:2]}")
+        word = max(words, key=len)
+        queries["substring"].append(word[1:4] if len(word) > 4 else word)
+    return queries
+
+
+def linear_search(products, query, limit):
+    q = query.lower()
+    results = []
+    for product in products:
+        if q in product.name.lower() or q in product.sku.lower() or q in product.barcode.lower():
+            results.append(product)
+            if len(results) >= limit:
+                break
+    return results
+
+
+def timed(function, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        function(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000, help="Queries per kind")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-linear", action="store_true", help="Skip the linear scan baseline")
+    args = parser.parse_args()
+    
+    products = make_products(args.products, args.seed)
+    started = time.perf_counter()
+    index = ProductIndex(products, {product.id: 10.0 for product in products})
+    print(f"Built index of {len(index)} products in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    print(f"{'query':>12} {'index p50':>10} {'p99 ms':>8} {'scan p50':>10} {'p99 ms':>8}")
+    for kind, queries in make_queries(products, args.queries, args.seed).items():
+        indexed = timed(lambda q: index.search(q, args.limit), queries)
+        line = f"{kind:>12} {indexed['p50']:>10.3f} {indexed['p99']:>8.3f}"
+        if not args.no_linear:
+            scanned = timed(lambda q: linear_search(products, q, args.limit), queries[:200])
+            line += f" {scanned['p50']:>10.3f} {scanned['p99']:>8.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Hot-item stock contention benchmark
+
+N sellers sell one unit at a time of the same few products, each sale in its
+own transaction with --work-ms of other work inside it. Four ways of
+taking the stock are compared:
+
+* unlocked      read the level, check, write it back (no lock): shows the
+                lost updates / oversells the other two must not have
+* locked        SELECT ... FOR UPDATE, check, write, then the other work:
+                the row stays locked for the whole transaction
+* conditional   the other work, then inventory_service.decrement_stock
+                (UPDATE ... WHERE quantity >= n RETURNING) and the commit:
+                the stock statement alone, without a sale around it
+* checkout      the real pos_service.checkout() of a one-line cart: stock
+                rows, then the invoice sequence row that serializes a
+                business's sales, the sale graph and outbox, and the
+                change-log numbering at commit (--work-ms is not added)
+
+For each it reports throughput, latency percentiles, sales accepted and
+rejected as sold out, and whether the final stock matches: oversold means
+more units were sold than were on hand, lost means accepted sales that
+never reached the stock row.
+
+Usage (from backend/):
+    python -m scripts.bench_stock_contention --sellers 4 16 32 --hot-products 1 --stock 500
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlmodel import Session, select
+from app.db.session import engine
+from app.models.inventory_stock import StockItem
+from app.services.inventory_service import decrement_stock, calculate_stock
+from app.services.pos_service import checkout
+from scripts.bench_utils import seed_business, seed_products, summarize
+
+STRATEGIES = ["unlocked", "locked", "conditional", "checkout"]
+
+
+def sell_unlocked(session, business, product_id, work_s):
+    stock_item = session.exec(
+        select(StockItem).where(StockItem.product_id == product_id, StockItem.location == "main")
+    ).first()
+    if stock_item.quantity < 1:
+        return False
+    stock_item.quantity -= 1
+    session.add(stock_item)
+    time.sleep(work_s)
+    session.commit()
+    return True
+
+
+def sell_locked(session, business, product_id, work_s):
+    stock_item = session.exec(
+        select(StockItem)
+        .where(StockItem.product_id == product_id, StockItem.location == "main")
+        .with_for_update()
+    ).first()
+    if stock_item.quantity < 1:
+        session.rollback()
+        return False
+    stock_item.quantity -= 1
+    session.add(stock_item)
+    time.sleep(work_s)
+    session.commit()
+    return True
+
+
+def sell_conditional(session, business, product_id, work_s):
+    time.sleep(work_s)
+    if decrement_stock(session, product_id, 1) is None:
+        session.rollback()
+        return False
+    session.commit()
+    return True
+
+
+def sell_checkout(session, business, product_id, work_s):
+    try:
+        checkout(
+            session,
+            business.user_id,
+            business.id,
+            [{"product_id": product_id, "quantity": 1, "unit_price": 15.0}],
+            payment_method="cash"
+        )
+    except ValueError:
+        return False
+    return True
+
+
+SELLERS = {
+    "unlocked": sell_unlocked,
+    "locked": sell_locked,
+    "conditional": sell_conditional,
+    "checkout": sell_checkout,
+}
+
+
+def run(strategy, sellers, sales_per_seller, business, product_ids, stock, work_ms):
+    with Session(engine) as session:
+        for stock_item in session.exec(select(StockItem).where(StockItem.product_id.in_(product_ids))).all():
+            stock_item.quantity = stock
+            session.add(stock_item)
+        session.commit()
+    
+    sell = SELLERS[strategy]
+    
+    def seller(index):
+        samples, accepted, rejected = [], 0, 0
+        for n in range(sales_per_seller):
+            product_id = product_ids[(index + n) % len(product_ids)]
+            with Session(engine) as session:
+                started = time.perf_counter()
+                if sell(session, business, product_id, work_ms / 1000.0):
+                    accepted += 1
+                else:
+                    rejected += 1
+                samples.append((time.perf_counter() - started) * 1000)
+        return samples, accepted, rejected
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sellers) as pool:
+        results = list(pool.map(seller, range(sellers)))
+    elapsed = time.perf_counter() - started
+    
+    samples = [sample for result in results for sample in result[0]]
+    accepted = sum(result[1] for result in results)
+    rejected = sum(result[2] for result in results)
+    with Session(engine) as session:
+        remaining = sum(calculate_stock(session, product_id) for product_id in product_ids)
+    
+    on_hand = stock * len(product_ids)
+    oversold = max(0, accepted - on_hand)
+    lost = max(0, int(remaining - (on_hand - accepted)))
+    stats = summarize(samples)
+    print(
+        f"{strategy:>12} {sellers:>7} {len(samples) / elapsed:>8.1f} {stats['p50']:>8.2f} {stats['p95']:>8.2f} "
+        f"{stats['p99']:>8.2f} {accepted:>8} {rejected:>8} {oversold:>8} {lost:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sellers", type=int, nargs="+", default=[4, 16, 32], help="Concurrent sellers")
+    parser.add_argument("--sales", type=int, default=50, help="Sale attempts per seller")
+    parser.add_argument("--hot-products", type=int, default=1, help="Products all sellers sell")
+    parser.add_argument("--stock", type=float, default=500, help="Starting stock per hot product")
+    parser.add_argument("--work-ms", type=float, default=5.0, help="Other work inside each sale transaction")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    args = parser.parse_args()
+    
+    with Session(engine) as session:
+        business = seed_business(session, "Stock contention benchmark")
+        product_ids = [p.id for p in seed_products(session, business.id, args.hot_products, stock=args.stock)]
+    
+    print(
+        f"{'strategy':>12} {'sellers':>7} {'sales/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'accepted':>8} {'sold out':>8} {'oversold':>8} {'lost':>6}"
+    )
+    for sellers in args.sellers:
+        for strategy in args.strategies:
+            run(strategy, sellers, args.sales, business, product_ids, args.stock, args.work_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Sync payload size benchmark: today's JSON vs. negotiated encodings
+
+Builds a realistic /sync/pull page (product edits, stock updates, sales)
+and prints the encoded size of each variant relative to full-snapshot JSON:
+
+* json            full product snapshots (what clients got before)
+* json partial    updated products carry only their changed fields
+* msgpack         columnar MessagePack (partial products)
+* ... + gzip/zstd each of the above compressed
+
+Needs no database. msgpack / zstd rows are skipped when those optional
+packages are not installed.
+
+Usage (from backend/):
+    python -m scripts.bench_sync_encoding --changes 100 500 2000
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from app.core import sync_encoding
+from app.core.sync_encoding import columnar_changes, compress
+
+
+def build_page(count, rng):
+    """A pull page: 50% product edits (mostly price), 35% stock, 15% sales"""
+    now = datetime.utcnow()
+    full, partial = [], []
+    for seq in range(1, count + 1):
+        entity_id = rng.randint(1, 50_000)
+        roll = rng.random()
+        base = {"entity_id": entity_id, "updated_at": now - timedelta(seconds=count - seq), "seq": seq}
+        
+        if roll < 0.5:
+            data = {
+                "id": entity_id,
+                "name": f"Product {entity_id} 500g pack",
+                "sale_price": round(rng.uniform(5, 500), 2),
+                "current_stock": float(rng.randint(0, 300)),
+                "sku": f"SKU-{entity_id:06d}",
+                "barcode": f"{rng.randint(10**12, 10**13 - 1)}",
+                "unit": "pcs",
+                "min_stock": 5.0,
+            }
+            changed = ["sale_price"] if rng.random() < 0.8 else ["name", "sale_price"]
+            full.append({**base, "type": "product", "action": "updated", "fields": None, "data": data})
+            partial.append({
+                **base, "type": "product", "action": "updated", "fields": changed,
+                "data": {"id": entity_id, **{field: data[field] for field in changed}}
+            })
+        elif roll < 0.85:
+            change = {
+                **base, "type": "stock", "action": "updated", "fields": None,
+                "data": {"product_id": entity_id, "stock": float(rng.randint(0, 300))}
+            }
+            full.append(change)
+            partial.append(change)
+        else:
+            items = [
+                {
+                    "product_id": rng.randint(1, 50_000),
+                    "product_name": "Product 500g pack",
+                    "quantity": rng.randint(1, 3),
+                    "unit_price": 25.0,
+                    "subtotal": 50.0
+                }
+                for _ in range(rng.randint(1, 5))
+            ]
+            change = {
+                **base, "type": "sale", "action": "created", "fields": None,
+                "data": {
+                    "id": seq,
+                    "total": sum(item["subtotal"] for item in items),
+                    "payment_method": "cash",
+                    "created_at": now.isoformat(),
+                    "items": items
+                }
+            }
+            full.append(change)
+            partial.append(change)
+    return full, partial
+
+
+def envelope(changes):
+    return jsonable_encoder({
+        "server_time": datetime.utcnow(),
+        "changes": changes,
+        "has_more": False,
+        "cursor": "djE6MTI6MTAwMDA"
+    })
+
+
+def variants(full, partial):
+    """(label, uncompressed bytes) for every available encoding"""
+    yield "json", json.dumps(envelope(full), separators=(",", ":")).encode()
+    yield "json partial", json.dumps(envelope(partial), separators=(",", ":")).encode()
+    if sync_encoding.msgpack:
+        content = envelope(partial)
+        content["changes"] = columnar_changes(content["changes"])
+        content["layout"] = "columnar"
+        yield "msgpack", sync_encoding.msgpack.packb(content, use_bin_type=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--changes", type=int, nargs="+", default=[100, 500, 2000], help="Changes per page")
+    args = parser.parse_args()
+    
+    codings = ["identity"] + sync_encoding.available_codings()
+    if not sync_encoding.msgpack:
+        print("msgpack not installed - skipping MessagePack rows")
+    if not sync_encoding.zstandard:
+        print("zstandard not installed - skipping zstd rows")
+    
+    rng = random.Random(7)
+    print(f"{'changes':>8} {'encoding':>24} {'bytes':>10} {'vs json':>8}")
+    for count in args.changes:
+        full, partial = build_page(count, rng)
+        baseline = None
+        for label, body in variants(full, partial):
+            for coding in codings:
+                encoded = body if coding == "identity" else compress(body, coding)
+                baseline = baseline or len(encoded)
+                name = label if coding == "identity" else f"{label} + {coding}"
+                print(f"{count:>8} {name:>24} {len(encoded):>10} {len(encoded) / baseline:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
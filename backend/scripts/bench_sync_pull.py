@@ -0,0 +1,118 @@
+"""
+Sync pull benchmark: query count and latency vs. number of changed entities
+
+For each size N it seeds N products with movements, N/4 sales and the
+matching change-log entries, then times both pull paths:
+
+* legacy: get_sync_changes(since=...) - timestamp scan
+* cursor: get_sync_changes_page() - change log, paged until has_more is false
+  (delta cache off)
+* cached: the same with the delta cache on, as seen by the other devices of
+  the business after the first one built the pages
+
+Both build the delta with set-based queries, so statements per pull should
+stay flat (cursor pulls: a fixed number per page) while N grows; cached
+pulls cost one head query per page.
+
+Usage (from backend/):
+    python -m scripts.bench_sync_pull --sizes 10 100 1000 5000 --runs 10
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from sqlmodel import Session
+from app.core.config import settings
+from app.db.session import engine
+from app.models.pos import Sale, SaleItem
+from app.models.inventory_movement import InventoryMovement
+from app.services.change_log_service import record_changes, CHANGE_SALE, CHANGE_STOCK
+from app.services.sync_service import get_sync_changes, get_sync_changes_page
+from scripts.bench_utils import seed_business, seed_products, count_statements, summarize
+
+
+def seed_changes(size):
+    """A business with `size` changed products and size/4 sales"""
+    with Session(engine) as session:
+        business = seed_business(session, f"Sync pull benchmark {size}")
+        products = seed_products(session, business.id, size)
+        
+        session.add_all([
+            InventoryMovement(product_id=product.id, movement_type="sale", quantity=-1, reference="bench")
+            for product in products
+            for _ in range(3)
+        ])
+        sales = [
+            Sale(business_id=business.id, user_id=business.user_id, total=15.0, payment_method="cash")
+            for _ in range(max(1, size // 4))
+        ]
+        session.add_all(sales)
+        session.flush()
+        session.add_all([
+            SaleItem(
+                sale_id=sale.id,
+                product_id=products[i % len(products)].id,
+                product_name="Bench",
+                quantity=1,
+                unit_price=15.0,
+                subtotal=15.0
+            )
+            for i, sale in enumerate(sales)
+        ])
+        record_changes(
+            session,
+            business.id,
+            [(CHANGE_STOCK, product.id, "updated") for product in products]
+            + [(CHANGE_SALE, sale.id, "created") for sale in sales]
+        )
+        session.commit()
+        return business.user_id, business.id
+
+
+def pull_all_pages(session, business_id, limit):
+    cursor, pages, changes = None, 0, 0
+    while True:
+        page = get_sync_changes_page(session, business_id, cursor=cursor, limit=limit)
+        pages += 1
+        changes += len(page["changes"])
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            return pages, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Changed products")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    
+    print(f"{'entities':>9} {'path':>7} {'changes':>8} {'pages':>6} {'stmts':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in args.sizes:
+        user_id, business_id = seed_changes(size)
+        since = datetime.utcnow() - timedelta(hours=1)
+        
+        for path in ("legacy", "cursor", "cached"):
+            settings.SYNC_DELTA_CACHE = "memory" if path == "cached" else "off"
+            if path == "cached":
+                with Session(engine) as session:
+                    pull_all_pages(session, business_id, args.page_size)
+            samples = []
+            for _ in range(args.runs):
+                with Session(engine) as session:
+                    with count_statements() as counter:
+                        started = time.perf_counter()
+                        if path == "legacy":
+                            changes, pages = len(get_sync_changes(session, user_id, business_id, since)), 1
+                        else:
+                            pages, changes = pull_all_pages(session, business_id, args.page_size)
+                        samples.append((time.perf_counter() - started) * 1000)
+            
+            stats = summarize(samples)
+            print(
+                f"{size:>9} {path:>7} {changes:>8} {pages:>6} {counter['statements']:>6} "
+                f"{stats['p50']:>9.2f} {stats['p95']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Sync push throughput benchmark
+
+Simulates a terminal that was offline for a day and pushes its queued
+actions in one /sync/push: a mix of sales and product updates, with a
+small share of actions that fail. For each push size (and chunk size) it
+reports wall time, actions per second, SQL statements and commits per
+action. A second push of the same actions measures the idempotent replay
+path (one action_id lookup per chunk, nothing re-applied).
+
+Usage (from backend/):
+    python -m scripts.bench_sync_push --actions 100 500 2000 --chunk-sizes 1 50 100 250
+"""
+import argparse
+import random
+import time
+import uuid
+from sqlmodel import Session
+from app.db.session import engine
+from app.services.sync_service import process_sync_actions
+from scripts.bench_utils import seed_business, seed_products, count_statements
+
+
+def build_actions(count, product_ids, failure_rate, rng):
+    """Queued offline actions: mostly sales, some product edits, a few bad ones"""
+    actions = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < failure_rate:
+            actions.append({
+                "id": str(uuid.uuid4()),
+                "type": "product_update",
+                "payload": {"product_id": -1, "updates": {"name": "missing"}}
+            })
+        elif roll < 0.85:
+            actions.append({
+                "id": str(uuid.uuid4()),
+                "type": "sale",
+                "payload": {
+                    "items": [
+                        {"product_id": pid, "quantity": 1, "unit_price": 15.0}
+                        for pid in rng.sample(product_ids, rng.randint(1, 4))
+                    ],
+                    "payment_method": "cash"
+                }
+            })
+        else:
+            product_id = rng.choice(product_ids)
+            actions.append({
+                "id": str(uuid.uuid4()),
+                "type": "product_update",
+                "payload": {"product_id": product_id, "updates": {"selling_price": rng.choice([15.0, 16.0])}}
+            })
+    return actions
+
+
+def timed_push(user_id, business_id, actions, chunk_size):
+    with Session(engine) as session:
+        with count_statements() as counter:
+            started = time.perf_counter()
+            processed, failed, _ = process_sync_actions(
+                session, user_id, business_id, actions, chunk_size=chunk_size
+            )
+            elapsed = time.perf_counter() - started
+    return elapsed, counter, len(processed), len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, nargs="+", default=[100, 500, 2000], help="Push sizes")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1, 100], help="Actions per transaction")
+    parser.add_argument("--catalog-size", type=int, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="Share of actions that fail")
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    with Session(engine) as session:
+        business = seed_business(session, "Sync push benchmark")
+        product_ids = [p.id for p in seed_products(session, business.id, args.catalog_size)]
+        user_id, business_id = business.user_id, business.id
+    
+    print(
+        f"{'actions':>8} {'chunk':>6} {'pass':>7} {'seconds':>8} {'actions/s':>10} "
+        f"{'stmts/act':>10} {'commits':>8} {'ok':>6} {'failed':>7}"
+    )
+    for count in args.actions:
+        for chunk_size in args.chunk_sizes:
+            actions = build_actions(count, product_ids, args.failure_rate, rng)
+            for label in ("first", "replay"):
+                elapsed, counter, ok, failed = timed_push(user_id, business_id, actions, chunk_size)
+                print(
+                    f"{count:>8} {chunk_size:>6} {label:>7} {elapsed:>8.2f} {count / elapsed:>10.1f} "
+                    f"{counter['statements'] / count:>10.2f} {counter['commits']:>8} {ok:>6} {failed:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared helpers for the benchmark scripts (seeding and latency statistics)
+
+Benchmarks run against the database configured in DATABASE_URL and create
+their own throwaway user/business, so they never touch real tenant data.
+"""
+import random
+import statistics
+from contextlib import contextmanager
+from typing import Dict, List, Sequence
+from sqlalchemy import event
+from sqlmodel import Session
+from app.db.session import engine
+from app.models.user import User
+from app.models.business import Business
+from app.models.product import Product
+from app.models.inventory_stock import StockItem
+
+# Benchmarks are noisy enough without SQL echo
+engine.echo = False
+
+
+def seed_business(session: Session, name: str = "Benchmark Shop") -> Business:
+    """Create a throwaway owner + business for a benchmark run"""
+    user = User(
+        telegram_id=-random.randint(10**9, 10**12),
+        first_name="bench",
+        role="owner"
+    )
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    
+    business = Business(user_id=user.id, name=name)
+    session.add(business)
+    session.commit()
+    session.refresh(business)
+    
+    user.business_id = business.id
+    session.add(user)
+    session.commit()
+    return business
+
+
+def seed_products(session: Session, business_id: int, count: int, stock: float = 1_000_000) -> List[Product]:
+    """Create `count` products with a main-location stock row each"""
+    products = [
+        Product(
+            business_id=business_id,
+            name=f"Bench product {i}",
+            sku=f"BENCH-{business_id}-{i}",
+            buying_price=10.0,
+            selling_price=15.0,
+        )
+        for i in range(count)
+    ]
+    session.add_all(products)
+    session.commit()
+    
+    session.add_all([
+        StockItem(product_id=product.id, quantity=stock, location="main")
+        for product in products
+    ])
+    session.commit()
+    return products
+
+
+@contextmanager
+def count_statements():
+    """Count SQL statements and commits sent to the database inside the block"""
+    counter = {"statements": 0, "commits": 0}
+    
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+    
+    def _commit(conn):
+        counter["commits"] += 1
+    
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "commit", _commit)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(engine, "commit", _commit)
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples_ms: Sequence[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(samples_ms),
+        "mean": statistics.fmean(samples_ms) if samples_ms else 0.0,
+        "p50": percentile(samples_ms, 50),
+        "p95": percentile(samples_ms, 95),
+        "p99": percentile(samples_ms, 99),
+        "max": max(samples_ms) if samples_ms else 0.0,
+    }
@@ -0,0 +1,323 @@
+"""
+Sync fleet simulator: many offline terminals reconnecting at once
+
+Seeds --businesses shops, each with a catalog and --devices terminals.
+Every round, each terminal goes offline and queues --actions actions:
+sales, signed stock deltas, price edits and a few legacy absolute
+stock_updates. The actions favour a small set of hot products, so
+terminals collide. Then all terminals reconnect at once ("Saturday
+morning"). Each one pushes its queue and pulls pages until it is caught
+up. Reported:
+
+* push and pull throughput, and p50/p95/p99 request latency
+* failed actions (conflict rate) and the SyncError rows the run produced
+  by type (negative_stock, conflict, ...)
+* pages and changes pulled per device
+
+Needs the database in DATABASE_URL (Postgres). A local uvicorn worker is
+started with the in-memory broker unless --url points at a running server
+that uses the same database and SECRET_KEY.
+
+Usage (from backend/):
+    python -m scripts.sync_fleet_sim --businesses 5 --devices 10 --actions 200 --rounds 2
+    python -m scripts.sync_fleet_sim --devices 50 --push-mode async --concurrency 50
+    python -m scripts.sync_fleet_sim --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlmodel import Session, select, func
+from app.core.security import create_access_token
+from app.db.session import engine
+from app.models.sync_error import SyncError
+from app.models.user import User
+from scripts.bench_utils import seed_business, seed_products, summarize
+from scripts.ws_loadtest import start_local_server
+
+# Share of each action type in an offline queue
+ACTION_MIX = [("sale", 0.5), ("stock_delta", 0.3), ("product_update", 0.15), ("stock_update", 0.05)]
+
+
+class Stats:
+    """Counters shared by all simulated devices"""
+    
+    def __init__(self):
+        self.push_ms: List[float] = []
+        self.pull_ms: List[float] = []
+        self.actions_sent = 0
+        self.actions_processed = 0
+        self.actions_failed = 0
+        self.failure_reasons: Dict[str, int] = {}
+        self.pages = 0
+        self.changes = 0
+        self.http_errors = 0
+
+
+class Device:
+    """One offline-capable terminal with its own queue, cursor and stock view"""
+    
+    def __init__(self, device_id: str, token: str, product_ids: List[int], hot_ids: List[int],
+                 initial_stock: float, rng: random.Random):
+        self.device_id = device_id
+        self.headers = {"Authorization": f"Bearer {token}", "X-Device-ID": device_id}
+        self.product_ids = product_ids
+        self.hot_ids = hot_ids
+        self.rng = rng
+        self.cursor: Optional[str] = None
+        self.stock: Dict[int, float] = {product_id: initial_stock for product_id in product_ids}
+    
+    def pick_product(self, hot_share: float) -> int:
+        return self.rng.choice(self.hot_ids if self.rng.random() < hot_share else self.product_ids)
+    
+    def queue_offline_actions(self, count: int, hot_share: float) -> List[dict]:
+        """What the terminal records while offline"""
+        actions = []
+        for _ in range(count):
+            action_type = self.rng.choices([name for name, _ in ACTION_MIX], [w for _, w in ACTION_MIX])[0]
+            product_id = self.pick_product(hot_share)
+            
+            if action_type == "sale":
+                payload = {
+                    "items": [
+                        {"product_id": pid, "quantity": self.rng.randint(1, 3), "unit_price": 15.0}
+                        for pid in {product_id, self.pick_product(hot_share)}
+                    ],
+                    "payment_method": "cash"
+                }
+            elif action_type == "stock_delta":
+                delta = -self.rng.randint(1, 3) if self.rng.random() < 0.8 else self.rng.randint(5, 20)
+                payload = {
+                    "product_id": product_id,
+                    "delta": delta,
+                    "movement_id": str(uuid.uuid4()),
+                    "movement_type": "sale" if delta < 0 else "adjustment_up"
+                }
+                self.stock[product_id] = self.stock.get(product_id, 0.0) + delta
+            elif action_type == "product_update":
+                payload = {"product_id": product_id, "updates": {"selling_price": self.rng.choice([14.0, 15.0, 16.0])}}
+            else:
+                # Stock count with the level this terminal last saw as its base
+                payload = {
+                    "product_id": product_id,
+                    "stock": float(self.rng.randint(20, 60)),
+                    "base_stock": self.stock.get(product_id, 0.0)
+                }
+            
+            actions.append({
+                "id": str(uuid.uuid4()),
+                "type": action_type,
+                "payload": payload,
+                "created_at": datetime.utcnow().isoformat()
+            })
+        return actions
+    
+    async def push(self, client, actions: List[dict], mode: str, stats: Stats):
+        body = {"device_id": self.device_id, "actions": actions}
+        started = time.perf_counter()
+        try:
+            if mode == "async":
+                response = await client.post(
+                    "/sync/push",
+                    params={"mode": "async"},
+                    json=body,
+                    headers={**self.headers, "Idempotency-Key": str(uuid.uuid4())}
+                )
+                response.raise_for_status()
+                result = await self._wait_for_job(client, response.headers["location"])
+            else:
+                response = await client.post("/sync/push", json=body, headers=self.headers)
+                response.raise_for_status()
+                result = response.json()
+        except Exception as e:
+            stats.http_errors += 1
+            print(f"{self.device_id} push failed: {e}")
+            return
+        
+        stats.push_ms.append((time.perf_counter() - started) * 1000)
+        stats.actions_sent += len(actions)
+        stats.actions_processed += len(result["processed_ids"])
+        stats.actions_failed += len(result["failed_ids"])
+        for error in result["errors"].values():
+            reason = error.split(".")[0][:60]
+            stats.failure_reasons[reason] = stats.failure_reasons.get(reason, 0) + 1
+    
+    async def _wait_for_job(self, client, location: str) -> dict:
+        while True:
+            response = await client.get(location, headers=self.headers)
+            response.raise_for_status()
+            job = response.json()
+            if job["status"] == "done":
+                return job
+            if job["status"] == "failed":
+                raise RuntimeError(f"push job failed: {job['error']}")
+            await asyncio.sleep(0.2)
+    
+    async def pull(self, client, stats: Optional[Stats], page_size: int):
+        """Pull until caught up, folding stock levels into the local view"""
+        while True:
+            params = {"limit": page_size}
+            if self.cursor:
+                params["cursor"] = self.cursor
+            started = time.perf_counter()
+            try:
+                response = await client.get("/sync/pull", params=params, headers=self.headers)
+                response.raise_for_status()
+            except Exception as e:
+                if stats:
+                    stats.http_errors += 1
+                print(f"{self.device_id} pull failed: {e}")
+                return
+            
+            page = response.json()
+            if stats:
+                stats.pull_ms.append((time.perf_counter() - started) * 1000)
+                stats.pages += 1
+                stats.changes += len(page["changes"])
+            for change in page["changes"]:
+                if change["type"] == "stock":
+                    self.stock[change["entity_id"]] = change["data"]["stock"]
+                elif change["type"] == "product" and "current_stock" in change["data"]:
+                    self.stock[change["entity_id"]] = change["data"]["current_stock"]
+            
+            self.cursor = page["cursor"]
+            if not page["has_more"]:
+                return
+
+
+def seed_fleet(args, rng: random.Random) -> Tuple[List[Device], List[int]]:
+    """Businesses with a catalog each, and their terminals"""
+    devices, business_ids = [], []
+    with Session(engine) as session:
+        for b in range(args.businesses):
+            business = seed_business(session, f"Fleet sim shop {b}")
+            product_ids = [
+                product.id
+                for product in seed_products(session, business.id, args.catalog_size, stock=args.initial_stock)
+            ]
+            hot_ids = product_ids[:max(1, args.hot_products)]
+            user = session.get(User, business.user_id)
+            token = create_access_token(
+                {"sub": str(user.id), "telegram_id": str(user.telegram_id)},
+                expires_delta=timedelta(hours=6)
+            )
+            business_ids.append(business.id)
+            devices.extend(
+                Device(f"sim-{business.id}-{d}", token, product_ids, hot_ids, args.initial_stock, rng)
+                for d in range(args.devices)
+            )
+    return devices, business_ids
+
+
+def sync_error_counts(business_ids: List[int], since: datetime) -> Dict[str, int]:
+    with Session(engine) as session:
+        rows = session.exec(
+            select(SyncError.error_type, func.count(SyncError.id))
+            .where(SyncError.business_id.in_(business_ids), SyncError.created_at >= since)
+            .group_by(SyncError.error_type)
+        ).all()
+    return dict(rows)
+
+
+def format_stats(samples_ms: List[float]) -> str:
+    if not samples_ms:
+        return "no samples"
+    stats = summarize(samples_ms)
+    return (
+        f"n={stats['count']} p50={stats['p50']:.1f}ms p95={stats['p95']:.1f}ms "
+        f"p99={stats['p99']:.1f}ms max={stats['max']:.1f}ms"
+    )
+
+
+async def run_round(client, devices: List[Device], args, round_number: int, business_ids: List[int]):
+    stats = Stats()
+    queues = {device.device_id: device.queue_offline_actions(args.actions, args.hot_share) for device in devices}
+    limiter = asyncio.Semaphore(args.concurrency)
+    round_started_at = datetime.utcnow()
+    
+    async def reconnect(device: Device):
+        async with limiter:
+            await device.push(client, queues[device.device_id], args.push_mode, stats)
+            await device.pull(client, stats, args.page_size)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(reconnect(device) for device in devices))
+    elapsed = time.perf_counter() - started
+    
+    errors = sync_error_counts(business_ids, round_started_at)
+    failure_rate = stats.actions_failed / stats.actions_sent * 100 if stats.actions_sent else 0.0
+    print(f"\nround {round_number}: {len(devices)} devices reconnected in {elapsed:.1f}s")
+    print(
+        f"push: {stats.actions_sent} actions, {stats.actions_sent / elapsed:.0f} actions/s, "
+        f"{stats.actions_failed} failed ({failure_rate:.2f}%)"
+    )
+    print("push latency:", format_stats(stats.push_ms))
+    print(
+        f"pull: {stats.pages} pages, {stats.changes} changes "
+        f"({stats.changes / max(1, len(devices)):.0f}/device), {stats.pages / elapsed:.0f} pages/s"
+    )
+    print("pull latency:", format_stats(stats.pull_ms))
+    print(f"SyncError rows: {sum(errors.values())} {errors or ''}")
+    for reason, count in sorted(stats.failure_reasons.items(), key=lambda item: -item[1])[:5]:
+        print(f"  failed: {count} x {reason}")
+    if stats.http_errors:
+        print(f"http errors: {stats.http_errors}")
+
+
+async def run_sim(args, base_url: str):
+    import httpx
+    
+    rng = random.Random(args.seed)
+    devices, business_ids = seed_fleet(args, rng)
+    print(
+        f"fleet: {args.businesses} businesses x {args.devices} devices, {args.catalog_size} products "
+        f"({args.hot_products} hot), {args.actions} actions/device/round, push mode {args.push_mode}"
+    )
+    
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        # Every terminal starts caught up
+        await asyncio.gather(*(device.pull(client, None, args.page_size) for device in devices))
+        for round_number in range(1, args.rounds + 1):
+            await run_round(client, devices, args, round_number, business_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--businesses", type=int, default=5)
+    parser.add_argument("--devices", type=int, default=10, help="Terminals per business")
+    parser.add_argument("--actions", type=int, default=100, help="Offline actions per device per round")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--catalog-size", type=int, default=200)
+    parser.add_argument("--hot-products", type=int, default=10, help="Best sellers every terminal touches")
+    parser.add_argument("--hot-share", type=float, default=0.6, help="Share of actions on hot products")
+    parser.add_argument("--initial-stock", type=float, default=100.0)
+    parser.add_argument("--push-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50, help="Devices syncing at the same time")
+    parser.add_argument("--timeout", type=float, default=120.0, help="HTTP timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="http://host:port of a running server (default: start one locally)")
+    parser.add_argument("--port", type=int, default=8766, help="port for the local server")
+    args = parser.parse_args()
+    
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        server = start_local_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    
+    try:
+        asyncio.run(run_sim(args, base_url))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+WebSocket load test: many simulated terminals against /ws/{business_id}
+
+Opens N terminals spread over M businesses. Every terminal sends heartbeat
+pings and sync_events at a fixed rate, and every sync_event should reach
+all other terminals of the same business. Reported:
+
+* connect time and failed connections
+* delivery latency (sender -> peers) and ping round trip percentiles
+* dropped deliveries (expected - received) and resync_required frames
+* server memory per connection (RSS growth / connections, Linux only)
+
+By default a local uvicorn worker is started with the in-memory broker and
+no background workers (outbox, sync push, snapshots), so no Postgres or
+Redis is needed. Point --url at a
+running server to test a real deployment instead (add --server-pid to get
+memory figures).
+
+Usage (from backend/):
+    python -m scripts.ws_loadtest --terminals 2000 --businesses 50 --duration 30
+    python -m scripts.ws_loadtest --url ws://127.0.0.1:8000 --server-pid 1234
+
+Raise the open-files limit first for large runs (ulimit -n 65536).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+from scripts.bench_utils import summarize
+
+LOADTEST_EVENT = "LOADTEST"
+
+
+class Stats:
+    """Counters shared by all simulated terminals"""
+    
+    def __init__(self):
+        self.connect_ms: List[float] = []
+        self.connect_failures = 0
+        self.delivery_ms: List[float] = []
+        self.ping_ms: List[float] = []
+        self.sent: Dict[int, int] = {}
+        self.received = 0
+        self.resyncs = 0
+        self.disconnects = 0
+
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Resident memory of a process in KB (None where /proc is unavailable)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def start_local_server(port: int) -> subprocess.Popen:
+    """Run one uvicorn worker that needs no external services"""
+    # No background pollers: without a database they would only log
+    # connection errors and skew the latency and memory figures
+    env = dict(
+        os.environ,
+        REALTIME_BROKER="memory",
+        OUTBOX_WORKERS="0",
+        OUTBOX_RETENTION_DAYS="0",
+        SYNC_PUSH_WORKERS="0",
+        SYNC_SNAPSHOT_INTERVAL_MINUTES="0"
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except Exception:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.2)
+    
+    server.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 30s")
+
+
+class Terminal:
+    """One simulated POS terminal"""
+    
+    def __init__(self, terminal_id: int, business_id: int, stats: Stats):
+        self.terminal_id = terminal_id
+        self.business_id = business_id
+        self.stats = stats
+        self.websocket = None
+        self._ping_sent_at: Optional[float] = None
+    
+    async def connect(self, base_url: str, limiter: asyncio.Semaphore) -> bool:
+        import websockets
+        
+        url = f"{base_url}/ws/{self.business_id}?user_id=1&device_id=loadtest-{self.terminal_id}"
+        async with limiter:
+            started = time.perf_counter()
+            try:
+                self.websocket = await websockets.connect(url, ping_interval=None, open_timeout=30)
+            except Exception:
+                self.stats.connect_failures += 1
+                return False
+            self.stats.connect_ms.append((time.perf_counter() - started) * 1000)
+            return True
+    
+    async def receive(self):
+        try:
+            async for raw in self.websocket:
+                frame = json.loads(raw)
+                frame_type = frame.get("type")
+                if frame_type == "batch":
+                    for event in frame.get("events", []):
+                        self._on_event(event)
+                elif frame_type == LOADTEST_EVENT:
+                    self._on_event(frame)
+                elif frame_type == "pong" and self._ping_sent_at is not None:
+                    self.stats.ping_ms.append((time.perf_counter() - self._ping_sent_at) * 1000)
+                    self._ping_sent_at = None
+                elif frame_type == "resync_required":
+                    self.stats.resyncs += 1
+        except Exception:
+            self.stats.disconnects += 1
+    
+    def _on_event(self, event: dict):
+        if event.get("type") != LOADTEST_EVENT:
+            return
+        self.stats.received += 1
+        self.stats.delivery_ms.append((time.time() - event["payload"]["sent_at"]) * 1000)
+    
+    async def run(self, until: float, rate: float, ping_interval: float):
+        """Send sync_events at `rate` per second and a ping every ping_interval"""
+        next_ping = time.time() + random.uniform(0, ping_interval)
+        # Spread terminals out so they don't all fire on the same tick
+        await asyncio.sleep(random.uniform(0, 1 / rate if rate > 0 else 1))
+        
+        while time.time() < until:
+            try:
+                if time.time() >= next_ping and self._ping_sent_at is None:
+                    self._ping_sent_at = time.perf_counter()
+                    await self.websocket.send(json.dumps({"type": "ping"}))
+                    next_ping = time.time() + ping_interval
+                
+                if rate > 0:
+                    await self.websocket.send(json.dumps({
+                        "type": "sync_event",
+                        "event_type": LOADTEST_EVENT,
+                        "payload": {"terminal": self.terminal_id, "sent_at": time.time()}
+                    }))
+                    self.stats.sent[self.business_id] = self.stats.sent.get(self.business_id, 0) + 1
+            except Exception:
+                return
+            
+            await asyncio.sleep(1 / rate if rate > 0 else ping_interval)
+    
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+
+
+async def run_load(args, base_url: str, server_pid: Optional[int]):
+    stats = Stats()
+    terminals = [
+        Terminal(terminal_id, terminal_id % args.businesses + 1, stats)
+        for terminal_id in range(args.terminals)
+    ]
+    
+    rss_before = rss_kb(server_pid) if server_pid else None
+    
+    limiter = asyncio.Semaphore(args.connect_concurrency)
+    started = time.perf_counter()
+    connected = await asyncio.gather(*(terminal.connect(base_url, limiter) for terminal in terminals))
+    connect_seconds = time.perf_counter() - started
+    terminals = [terminal for terminal, ok in zip(terminals, connected) if ok]
+    
+    # Let the server settle before sampling memory
+    await asyncio.sleep(1)
+    rss_after = rss_kb(server_pid) if server_pid else None
+    
+    receivers = [asyncio.create_task(terminal.receive()) for terminal in terminals]
+    until = time.time() + args.duration
+    await asyncio.gather(*(terminal.run(until, args.rate, args.ping_interval) for terminal in terminals))
+    
+    # Give in-flight deliveries time to land
+    await asyncio.sleep(args.drain)
+    
+    for terminal in terminals:
+        await terminal.close()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    
+    per_business = {}
+    for terminal in terminals:
+        per_business[terminal.business_id] = per_business.get(terminal.business_id, 0) + 1
+    expected = sum(
+        sent * (per_business.get(business_id, 0) - 1)
+        for business_id, sent in stats.sent.items()
+    )
+    
+    print(f"terminals: {len(terminals)} connected, {stats.connect_failures} failed, {args.businesses} businesses")
+    print(f"connect: {connect_seconds:.1f}s total", _format_stats(stats.connect_ms))
+    print(f"sent: {sum(stats.sent.values())} sync_events, expected deliveries: {expected}")
+    dropped = max(expected - stats.received, 0)
+    drop_rate = dropped / expected * 100 if expected else 0.0
+    print(f"received: {stats.received}, dropped: {dropped} ({drop_rate:.2f}%), resync_required: {stats.resyncs}")
+    print(f"delivery rate: {stats.received / args.duration:.0f} msg/s")
+    print("delivery latency:", _format_stats(stats.delivery_ms))
+    print("ping rtt:", _format_stats(stats.ping_ms))
+    print(f"unexpected disconnects: {stats.disconnects}")
+    
+    if rss_before is not None and rss_after is not None and terminals:
+        per_connection = (rss_after - rss_before) / len(terminals)
+        print(f"server rss: {rss_before / 1024:.1f} MB -> {rss_after / 1024:.1f} MB ({per_connection:.1f} KB/connection)")
+
+
+def _format_stats(samples_ms: List[float]) -> str:
+    if not samples_ms:
+        return "no samples"
+    stats = summarize(samples_ms)
+    return (
+        f"n={stats['count']} mean={stats['mean']:.2f}ms p50={stats['p50']:.2f}ms "
+        f"p95={stats['p95']:.2f}ms p99={stats['p99']:.2f}ms max={stats['max']:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terminals", type=int, default=500)
+    parser.add_argument("--businesses", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of traffic")
+    parser.add_argument("--rate", type=float, default=0.5, help="sync_events per terminal per second")
+    parser.add_argument("--ping-interval", type=float, default=5.0)
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for late deliveries")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--url", help="ws://host:port of a running server (default: start one locally)")
+    parser.add_argument("--port", type=int, default=8765, help="port for the local server")
+    parser.add_argument("--server-pid", type=int, help="pid of --url server, for memory figures")
+    args = parser.parse_args()
+    
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        sys.exit("ws_loadtest needs the 'websockets' package (installed with uvicorn[standard])")
+    
+    server = None
+    if args.url:
+        base_url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        server = start_local_server(args.port)
+        base_url, server_pid = f"ws://127.0.0.1:{args.port}", server.pid
+    
+    try:
+        asyncio.run(run_load(args, base_url, server_pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Tests for the in-memory product search index (no database)
+"""
+import random
+from types import SimpleNamespace
+import pytest
+from app.services import search_index
+from app.services.search_index import ProductIndex, SearchIndexRegistry, SortedKeys
+
+
+def make_product(id, name, sku=None, barcode=None):
+    return SimpleNamespace(
+        id=id,
+        name=name,
+        sku=sku,
+        barcode=barcode,
+        unit_of_measure="pcs",
+        selling_price=10.0,
+        buying_price=8.0,
+        low_stock_threshold=5.0,
+    )
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Answers the registry's product query; on_exec runs mid-build"""
+    
+    def __init__(self, products, on_exec=None):
+        self.products = products
+        self.on_exec = on_exec
+    
+    def exec(self, statement):
+        if self.on_exec:
+            on_exec, self.on_exec = self.on_exec, None
+            on_exec()
+        return FakeResult(self.products)
+
+
+@pytest.fixture
+def stock_queries(monkeypatch):
+    """Stub stock lookups; records the product ids each one asked for"""
+    queries = []
+    
+    def get_stock_levels(session, product_ids, location="main"):
+        queries.append(set(product_ids))
+        return {product_id: 3.0 for product_id in product_ids}
+    
+    monkeypatch.setattr(search_index, "get_stock_levels", get_stock_levels)
+    return queries
+
+
+# Ranking
+
+
+def test_search_ranks_tiers_best_first():
+    index = ProductIndex([
+        make_product(1, "Water 500ml", sku="W-1"),
+        make_product(2, "Pepsicola", sku="P-1"),
+        make_product(3, "Diet Cola", sku="D-1"),
+        make_product(4, "Soda", sku="COLA-9"),
+        make_product(5, "Cola Zero 500ml", sku="CZ-1"),
+        make_product(6, "Cola", sku="C-1"),
+        make_product(7, "Soft Drink", sku="S-1", barcode="cola"),
+    ], {})
+    
+    results = index.search("cola")
+    
+    assert [(r["id"], r["match_type"]) for r in results] == [
+        (7, "barcode"),  # Exact code
+        (6, "name"),  # Name prefix, shorter name first
+        (5, "name"),
+        (4, "sku"),  # Code prefix
+        (3, "name"),  # Word prefix
+        (2, "name"),  # Substring
+    ]
+
+
+def test_search_stops_at_limit_in_rank_order():
+    index = ProductIndex([make_product(n, "Rice " + "x" * n) for n in range(1, 30)], {})
+    
+    assert [r["id"] for r in index.search("rice", limit=3)] == [1, 2, 3]
+
+
+def test_search_needs_every_query_word():
+    index = ProductIndex([
+        make_product(1, "Coca Cola 330ml"),
+        make_product(2, "Coca Tea"),
+        make_product(3, "Cola Light"),
+    ], {})
+    
+    assert [r["id"] for r in index.search("coc col")] == [1]
+
+
+def test_search_carries_stock_and_set_stock_patches_it():
+    index = ProductIndex([make_product(1, "Sugar 1kg"), make_product(2, "Salt")], {1: 4.0})
+    assert index.search("sugar")[0]["current_stock"] == 4.0
+    assert index.search("salt")[0]["current_stock"] == 0.0
+    
+    index.set_stock({2: 9.0}, [2])
+    
+    assert index.search("salt")[0]["current_stock"] == 9.0
+    assert index.search("sugar")[0]["current_stock"] == 4.0
+
+
+# SortedKeys
+
+
+@pytest.mark.parametrize("run_size", [1, 3, 4, 256])
+def test_sorted_keys_prefix_merges_runs(monkeypatch, run_size):
+    monkeypatch.setattr(search_index, "RUN_SIZE", run_size)
+    rng = random.Random(run_size)
+    pairs = [
+        ("".join(rng.choice("abc") for _ in range(rng.randint(1, 4))), rng.randrange(200))
+        for _ in range(300)
+    ]
+    keys = SortedKeys(list(pairs))
+    
+    for prefix in ["", "a", "b", "ab", "abc", "cab", "ca", "abca", "d"]:
+        expected = sorted(position for key, position in pairs if key.startswith(prefix))
+        assert list(keys.prefix(prefix)) == expected, prefix
+        assert sorted(keys.slice(prefix)) == expected, prefix
+
+
+# Registry
+
+
+def test_registry_caches_the_built_index(stock_queries):
+    registry = SearchIndexRegistry(ttl_seconds=600, max_businesses=10)
+    session = FakeSession([make_product(1, "Bread")])
+    
+    first = registry.get(session, 1)
+    
+    assert registry.get(session, 1) is first
+    assert registry.stats["builds"] == 1
+
+
+def test_invalidate_during_build_is_not_cached(stock_queries):
+    registry = SearchIndexRegistry(ttl_seconds=600, max_businesses=10)
+    session = FakeSession([make_product(1, "Bread")], on_exec=lambda: registry.invalidate(1))
+    
+    index = registry.get(session, 1)
+    
+    # The caller still gets a result, but the next search must rebuild
+    assert index.search("bread")[0]["id"] == 1
+    assert 1 not in registry._indexes
+    assert registry._versions[1] == 1
+    assert registry.get(session, 1) is not index
+    assert registry.stats["builds"] == 2
+
+
+def test_stock_change_during_build_is_refreshed_next(stock_queries):
+    registry = SearchIndexRegistry(ttl_seconds=600, max_businesses=10)
+    session = FakeSession(
+        [make_product(1, "Bread"), make_product(2, "Milk")],
+        on_exec=lambda: registry.mark_stock_changed(1, [2])
+    )
+    
+    index = registry.get(session, 1)
+    
+    assert registry._indexes[1] is index
+    assert registry._stale_stock[1] == {2}
+    
+    assert registry.get(session, 1) is index
+    assert stock_queries[-1] == {2}
+    assert 1 not in registry._stale_stock